@@ -1,23 +1,111 @@
+import os
+
 from flask import Flask
 import dash
 import dash_bootstrap_components as dbc
 
-# spin up Flask server - running Flask server because running Dash through Flask
-server = Flask(__name__)
+# Default settings - override by passing a config dict to create_app or by setting the environment variables
+DEFAULT_CONFIG = {
+    'DEBUG': True,
+
+    # Dataset the dashboard reads - relative to run.py (project root)
+    'DATASET_PATH': os.environ.get('DATASET_PATH', 'ibm_emp_att_dataset.csv'),
+
+    # Rows per chunk to stream the CSV straight into the chart aggregates - for exports too large to hold in memory (0 = read it whole)
+    'DATASET_CHUNKSIZE': int(os.environ.get('DATASET_CHUNKSIZE', 0)),
+
+    # Seconds between checks for a replaced export or new delta batches - picked up without restarting the workers (0 = never)
+    'DATASET_RELOAD_INTERVAL': float(os.environ.get('DATASET_RELOAD_INTERVAL', 0)),
+
+    # Cross-filter mode - the sidebar selections combine into one filter applied to every sidebar chart (needs DATASET_CHUNKSIZE = 0)
+    'DASHBOARD_CROSSFILTER': os.environ.get('DASHBOARD_CROSSFILTER', '').lower() in ('1', 'true', 'yes'),
+
+    # Clientside mode - the checklist charts are sent with the layout & filtered in the browser, no server round trip per click
+    'DASHBOARD_CLIENTSIDE': os.environ.get('DASHBOARD_CLIENTSIDE', '').lower() in ('1', 'true', 'yes'),
+
+    # When to load the data & build the static charts: 'lazy' (first use), 'eager' (at startup) or 'background' (thread at startup)
+    'DASHBOARD_WARMUP': os.environ.get('DASHBOARD_WARMUP', 'lazy'),
+
+    # Callback figure cache - number of figures kept & optional folder shared by all gunicorn workers on the host
+    'FIGURE_CACHE_SIZE': int(os.environ.get('FIGURE_CACHE_SIZE', 256)),
+    'FIGURE_CACHE_DIR': os.environ.get('FIGURE_CACHE_DIR'),
+
+    # Multi-tenant mode - JSON file of {tenant: dataset path}, one per business unit, picked per request by ?tenant= or X-Tenant (unset = one dataset)
+    # TENANT_CACHE_SIZE - tenants kept loaded per worker (least recently used dropped first), TENANT_FIGURE_CACHE_SIZE - figures cached per tenant
+    'TENANTS_PATH': os.environ.get('TENANTS_PATH'),
+    'TENANT_CACHE_SIZE': int(os.environ.get('TENANT_CACHE_SIZE', 32)),
+    'TENANT_FIGURE_CACHE_SIZE': int(os.environ.get('TENANT_FIGURE_CACHE_SIZE', 32)),
+
+    # Attrition risk model - folder of trained versions (python -m emp_attrition.model), loaded at startup for /api/score
+    'MODEL_DIR': os.environ.get('MODEL_DIR', 'models'),
+
+    # /api/score micro-batching - requests waiting at the same time are scored together, up to SCORE_BATCH_ROWS rows
+    # SCORE_BATCH_WAIT - seconds to wait for more requests to join a batch (0 = no waiting, only batch requests already queued)
+    'SCORE_BATCH_WAIT': float(os.environ.get('SCORE_BATCH_WAIT', 0)),
+    'SCORE_BATCH_ROWS': int(os.environ.get('SCORE_BATCH_ROWS', 10000)),
+
+    # Callback & route timings on /metrics (Prometheus text format) - METRICS_SERVER_TIMING also adds a Server-Timing header to responses
+    'METRICS_ENABLED': os.environ.get('METRICS_ENABLED', '1').lower() in ('1', 'true', 'yes'),
+    'METRICS_SERVER_TIMING': os.environ.get('METRICS_SERVER_TIMING', '').lower() in ('1', 'true', 'yes'),
+
+    # Admin token for the sampling profiler on /admin/profile - sent as Authorization: Bearer <token> (unset = endpoint off, answers 404)
+    'PROFILER_TOKEN': os.environ.get('PROFILER_TOKEN'),
+
+    # Response compression (Flask-Compress) - Brotli for browsers that accept it, gzip otherwise
+    # Responses smaller than COMPRESS_MIN_SIZE bytes aren't worth compressing & are sent as they are
+    'COMPRESS_ALGORITHM': ['br', 'gzip'],
+    'COMPRESS_BR_LEVEL': 5,
+    'COMPRESS_LEVEL': 6,
+    'COMPRESS_MIN_SIZE': int(os.environ.get('COMPRESS_MIN_SIZE', 500)),
+    'COMPRESS_MIMETYPES': ['text/html', 'text/css', 'text/javascript', 'application/javascript', 'application/json', 'image/svg+xml', 'image/x-icon', 'image/vnd.microsoft.icon'],
+}
+
+
+# Application factory - builds the Flask server & the Dash app on it
+# Nothing is read or charted here (unless DASHBOARD_WARMUP says so) - the dashboard loads its data on first use
+def create_app(config=None):
+    # spin up Flask server - running Flask server because running Dash through Flask
+    server = Flask(__name__)
+    server.config.update(DEFAULT_CONFIG)
+    server.config.update(config or {})
+
+    # The url_base_pathname is what goes after the last / in the url address
+    app = dash.Dash(
+        __name__, 
+        external_stylesheets=[dbc.themes.BOOTSTRAP], #Used for styling dashboard.py
+        server=server,
+        title='Empl Attrition Analysis', # This is the tab title
+        url_base_pathname='/dashboard/')
+
+    # Helps with debugging - if dashboard doesn't spin up correctly, this should show traceback errors
+    app.config['suppress_callback_exceptions']=True
+
+    # Import the dashboard & routes
+    # Need to specify emp_attrition because run.py is outside/next to the project folder
+    from emp_attrition.dashboard import init_dashboard
+    from emp_attrition.routes import init_routes
+    from emp_attrition.http_cache import init_http_cache
+    from emp_attrition.static_assets import init_static_assets
+    from emp_attrition.scoring import init_scoring
+    from emp_attrition.metrics import init_metrics
+    from emp_attrition.profiler import init_profiler
+    from emp_attrition.tenants import init_tenants
+    init_tenants(app)
+    init_routes(app)  # Before the dashboard - an eager warmup builds the layout's links to these pages
+    init_dashboard(app)
+    init_scoring(app)
+    init_profiler(app)
+    init_static_assets(app)
+
+    # Cache headers, content-hashed static URLs & precompressed static files - the server has all its routes by now
+    init_http_cache(app)
 
-server.config['DEBUG'] = True
+    # Request & callback timings - added last so they run first after each request (sizes are measured before compression)
+    init_metrics(app)
 
-# The url_base_pathname is what goes after the last / in the url address
-app = dash.Dash(
-    __name__, 
-    external_stylesheets=[dbc.themes.BOOTSTRAP], #Used for styling dashboard.py
-    server=server,
-    title='Empl Attrition Analysis', # This is the tab title
-    url_base_pathname='/dashboard/')
+    return app
 
-# Helps with debugging - if dashboard doesn't spin up correctly, this should show traceback errors
-app.config['suppress_callback_exceptions']=True
 
-# Import the routes.py file
-# Need to specify emp_attrition because run.py is outside/next to the project folder
-from emp_attrition import routes
\ No newline at end of file
+# App & server used by run.py and gunicorn (Procfile: emp_attrition:server)
+app = create_app()
+server = app.server
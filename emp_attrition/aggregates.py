@@ -0,0 +1,208 @@
+############################# IMPORT DEPENDENCIES ############################
+
+import flask
+import pandas as pd
+
+from emp_attrition.correlation import add_stats, correlation_stats
+from emp_attrition.data import COLUMN_LABELS
+from emp_attrition.filters import FILTER_DIMENSIONS
+from emp_attrition.metrics import phase
+
+
+############################# ATTRITION COUNT CUBE ############################
+
+# Dimensions counted against Attrition - used by the line charts, the Gender charts & the checklist charts
+# A dimension is a column, or a tuple of columns for charts that break one column out by another (i.e. Education by Gender)
+# To give a new chart its counts, add its column here (cube is built once at load, no extra scan per chart)
+CUBE_DIMENSIONS = ['MonthlyIncome', 'PercentSalaryHike', 'StockOptionLevel', 'YearsSinceLastPromotion', 'YearsAtCompany', 'YearsInCurrentRole',
+                   ('Education', 'Gender'), ('EducationField', 'Gender')] + FILTER_DIMENSIONS
+
+# Module-level aggregates the charts read - one snapshot of a dataset version
+# counts = running counts (added to when new rows arrive), cube = {dimension: table indexed by the dimension's values},
+# pivots = {pivot name: {dropdown value: (value, Attrition, Count) table}}
+# correlation = sufficient statistics of the numeric columns for the heatmap (see correlation.py)
+# Cube table columns: count = number of employees, leavers = number with Attrition = 1, rate = avg rate of attrition
+# A new version is built aside & swapped in whole by publish_aggregates, so a chart never reads half of an update
+AGGREGATES = {'counts': {'cube': {}, 'pivots': {}, 'correlation': None}, 'cube': {}, 'pivots': {}, 'correlation': None}
+
+
+# Make a snapshot the one the charts read - a single assignment, so readers see either the old or the new version
+def publish_aggregates(aggregates):
+    global AGGREGATES
+    AGGREGATES = aggregates
+
+
+# Snapshot the current request reads - its tenant's, when the dashboard has put one on flask.g (see tenants.py), or the published one
+def current_aggregates():
+    aggregates = flask.g.get('aggregates') if flask.has_request_context() else None
+    return aggregates or AGGREGATES
+
+
+# Count employees & leavers for each value of a dimension - one vectorized groupby
+# Values are kept in order of first appearance in the data - the order Plotly Express assigns colors in
+# No rate yet - counts from several chunks of rows can be added together first (see combine_counts)
+def count_attrition(emp_df, dimension):
+    keys = list(dimension) if isinstance(dimension, tuple) else dimension
+    table = emp_df.groupby(keys, observed=True, sort=False)['Attrition'].agg(['count', 'sum'])
+    return table.rename(columns={'sum': 'leavers'})
+
+
+# Add count tables together (i.e. from two chunks of rows) - values keep their order of first appearance
+# Values whose count drops to 0 (every row taken back out) are dropped
+def combine_counts(tables):
+    combined = pd.concat(tables)
+    combined = combined.reset_index().groupby(list(combined.index.names), observed=True, sort=False).sum()
+    return combined[combined['count'] != 0]
+
+
+# Add the avg rate of attrition to a count table
+def add_rate(table):
+    return table.assign(rate=table['leavers'] / table['count'])
+
+
+# Return the cube table for a dimension (count, leavers & rate for each value)
+# Charts read the current request's aggregates (see current_aggregates) - pass a snapshot to read one that isn't published yet
+def attrition_table(dimension, aggregates=None):
+    return (aggregates or current_aggregates())['cube'][dimension]
+
+
+# Headline numbers for the KPI cards - every dimension covers all employees, so YearsAtCompany gives the totals too
+def attrition_totals(aggregates=None):
+    table = attrition_table('YearsAtCompany', aggregates)
+    employees = table['count'].sum()
+    return {
+        'employees': employees,
+        'leavers': table['leavers'].sum(),
+        'avg_years_at_company': (table.index.to_numpy() * table['count']).sum() / employees,
+    }
+
+
+# Return (dimension, Attrition, count) rows for a line chart - Attrition as "No"/"Yes" like the original dataset
+# Only combinations that exist in the data are returned (same as counting each group)
+def attrition_counts(dimension, name='Count', aggregates=None):
+    with phase('aggregate'):
+        table = attrition_table(dimension, aggregates).sort_index()
+        counts = pd.DataFrame({'No': table['count'] - table['leavers'], 'Yes': table['leavers']})
+        counts = counts.rename_axis(columns='Attrition').stack().reset_index(name=name)
+        return counts[counts[name] > 0].reset_index(drop=True)
+
+
+# Return one row per value for a chart - [dimension column(s), Attrition], with coded columns swapped for labels
+# Attrition holds the chosen stat: 'rate' (avg rate of attrition, for bar charts) or 'leavers' (count of attrition, for pie charts)
+# Pass a checklist selection to keep only the selected values
+# Charts get a handful of aggregated rows instead of every employee row, so the figure JSON scales with the number of categories
+def category_attrition(dimension, selection=None, stat='rate', aggregates=None):
+    with phase('aggregate'):
+        table = attrition_table(dimension, aggregates)
+        for level in table.index.names:
+            if level in COLUMN_LABELS:
+                level_arg = {'level': level} if table.index.nlevels > 1 else {}
+                table = table.rename(index=COLUMN_LABELS[level], **level_arg)
+    with phase('filter'):
+        if selection is not None:
+            table = table[table.index.isin(selection)]
+        return table[stat].rename('Attrition').reset_index()
+
+
+############################## PRECOMPUTED PIVOTS #############################
+
+# Dropdown-driven charts register the columns their dropdown can pick - {pivot name: {dropdown value: column}}
+PIVOT_SPECS = {}
+
+
+# Register a dropdown-driven chart - its counts are built with the cube, so the callback only picks a table
+def register_pivot(name, options):
+    PIVOT_SPECS[name] = options
+
+
+# Columns the registered pivots count
+def pivot_columns():
+    return [column for options in PIVOT_SPECS.values() for column in options.values()]
+
+
+# Count a column against Attrition - a Series indexed by (value, Attrition code)
+def count_pivot(emp_df, column):
+    return emp_df.groupby([column, 'Attrition'], observed=True).size()
+
+
+# Turn pivot counts into (value, Attrition, Count) rows - the value column is named after the dropdown option
+# Leavers ("Yes") are listed first in each value so they take the first color & sit at the bottom of stacked bars
+def pivot_counts(counts, name):
+    counts = counts.sort_index(ascending=[True, False]).rename(index=COLUMN_LABELS['Attrition'], level=1)
+    return counts.rename_axis([name, 'Attrition']).reset_index(name='Count')
+
+
+# Return the precomputed table for the option picked in the dropdown
+def pivot_slice(name, value, aggregates=None):
+    with phase('aggregate'):
+        return (aggregates or current_aggregates())['pivots'][name][value]
+
+
+# Return the correlation statistics for the heatmap (None if the snapshot was counted without them)
+def correlation_table(aggregates=None):
+    return (aggregates or current_aggregates())['correlation']
+
+
+############################## BUILD AGGREGATES ##############################
+
+# Count a frame of rows against every cube dimension & registered pivot - {'cube': {...}, 'pivots': {...}, 'correlation': {...}}
+# correlation=False skips the heatmap statistics (i.e. for the cross-filter counts, which never feed the heatmap)
+def count_rows(emp_df, dimensions=CUBE_DIMENSIONS, correlation=True):
+    return {
+        'cube': {dim: count_attrition(emp_df, dim) for dim in dimensions},
+        'pivots': {(name, value): count_pivot(emp_df, column) for name, options in PIVOT_SPECS.items() for value, column in options.items()},
+        'correlation': correlation_stats(emp_df) if correlation else None,
+    }
+
+
+# Add (sign=1) or take out (sign=-1) the counts of some rows - returns new counts, the ones passed in are left as they are
+def add_counts(counts, part, sign=1):
+    cube = dict(counts['cube'])
+    for dim, table in part['cube'].items():
+        cube[dim] = combine_counts([cube[dim], sign * table]) if dim in cube else sign * table
+    pivots = dict(counts['pivots'])
+    for key, series in part['pivots'].items():
+        total = pivots[key].add(sign * series, fill_value=0) if key in pivots else sign * series
+        pivots[key] = total[total != 0].astype('int64')
+    correlation = counts.get('correlation')
+    if part.get('correlation') is not None:
+        correlation = add_stats(correlation, part['correlation'], sign)
+    return {'cube': cube, 'pivots': pivots, 'correlation': correlation}
+
+
+# Turn running counts into the tables the charts read
+def finish_aggregates(counts):
+    pivots = {}
+    for (name, value), series in counts['pivots'].items():
+        pivots.setdefault(name, {})[value] = pivot_counts(series, value)
+    return {
+        'counts': counts,
+        'cube': {dim: add_rate(table) for dim, table in counts['cube'].items()},
+        'pivots': pivots,
+        'correlation': counts.get('correlation'),
+    }
+
+
+# Build the aggregates from the canonical dataframe - one vectorized groupby per dimension & dropdown option
+def build_aggregates(emp_df):
+    return finish_aggregates(count_rows(emp_df))
+
+
+# Build the aggregates in one pass over chunks of rows (see data.read_dataset_chunks)
+# Each chunk is counted, added to the running totals & dropped - the raw rows are never all held in memory
+def build_aggregates_from_chunks(chunks):
+    counts = {'cube': {}, 'pivots': {}, 'correlation': None}
+    for chunk in chunks:
+        counts = add_counts(counts, count_rows(chunk))
+    return finish_aggregates(counts)
+
+
+# Apply a delta batch (see data.read_delta) to a snapshot - only the delta rows are counted, the dataset isn't rescanned
+# Returns a new snapshot - publish it to swap it in
+def update_aggregates(aggregates, added, removed):
+    counts = aggregates['counts']
+    if len(added):
+        counts = add_counts(counts, count_rows(added))
+    if len(removed):
+        counts = add_counts(counts, count_rows(removed), sign=-1)
+    return finish_aggregates(counts)
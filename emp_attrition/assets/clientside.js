@@ -0,0 +1,50 @@
+// Clientside mode (DASHBOARD_CLIENTSIDE) - checklist charts filtered in the browser, see dashboard.py CLIENTSIDE MODE
+// Each chart's figure is built on the server with every category & stored in the layout - ticking a checklist only drops categories here
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    attrition: {
+        // selection = checklist value, stored = {figure: ..., filter: 'traces' | 'labels' | 'y', title: title with {n} (counted pies only)}
+        filter_figure: function(selection, stored) {
+            if (!stored || !selection || selection.length === 0) {
+                return {};  // Same as the server callbacks - an empty checklist clears the chart
+            }
+            var ticked = new Set(selection.map(String));
+            var figure = stored.figure;
+            var data;
+
+            if (stored.filter === 'traces') {
+                // One trace per category (bars colored by category) - keep the ticked ones
+                data = figure.data.filter(function(trace) { return ticked.has(String(trace.name)); });
+            } else {
+                // One trace with a point per category (pie slices, job role bars) - keep the ticked points in every per-point array
+                data = figure.data.map(function(trace) {
+                    var keys = trace[stored.filter] || [];
+                    var keep = keys.map(function(key) { return ticked.has(String(key)); });
+                    var pick = function(values) {
+                        return Array.isArray(values) && values.length === keep.length ? values.filter(function(_, i) { return keep[i]; }) : values;
+                    };
+                    var filtered = {};
+                    Object.keys(trace).forEach(function(name) { filtered[name] = pick(trace[name]); });
+                    if (trace.marker) {
+                        filtered.marker = Object.assign({}, trace.marker, {colors: pick(trace.marker.colors)});
+                    }
+                    return filtered;
+                });
+            }
+            // Category axes list only the ticked categories - otherwise unticked ones keep an empty slot
+            var layout = Object.assign({}, figure.layout);
+            Object.keys(layout).forEach(function(name) {
+                var axis = layout[name];
+                if (/^[xy]axis/.test(name) && axis && Array.isArray(axis.categoryarray)) {
+                    layout[name] = Object.assign({}, axis, {categoryarray: axis.categoryarray.filter(function(key) { return ticked.has(String(key)); })});
+                }
+            });
+
+            // Counted pies - n is the leavers in the slices kept, like the server callbacks work it out
+            if (stored.title) {
+                var n = (data[0] && data[0].values || []).reduce(function(total, value) { return total + value; }, 0);
+                layout.title = Object.assign({}, layout.title, {text: stored.title.replace('{n}', n)});
+            }
+            return {data: data, layout: layout};
+        }
+    }
+});
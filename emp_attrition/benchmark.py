@@ -0,0 +1,319 @@
+############################# IMPORT DEPENDENCIES ############################
+
+import argparse
+import json
+import os
+import platform
+import re
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from emp_attrition.data import DATASET_PATH
+
+
+############################## SYNTHETIC DATASET #############################
+
+# Documented codes of the numerically coded columns (Education, the satisfaction ratings, etc.)
+COLUMN_VALUES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'files', 'column-values.csv')
+
+# Generated datasets are kept here & reused by later runs with the same size & seed - relative to run.py (project root)
+BENCH_DATA_DIR = 'bench-data'
+
+# Rows generated & written at a time - bounds the generator's memory at 10M rows
+GENERATE_CHUNK_ROWS = 1000000
+
+# Dataset sizes benchmarked by default
+BENCH_ROWS = [1000, 10000, 100000, 1000000]
+
+
+# Read the documented codes of each coded column - {column: [codes]}
+# The file lists a column name on its own line, then one "<code> '<label>'" line per value
+def column_domains(path=COLUMN_VALUES_PATH):
+    domains = {}
+    column = None
+    with open(path, encoding='utf-8-sig') as f:
+        for line in f:
+            line = line.strip()
+            code = re.match(r"^(\d+) '.*'$", line)
+            if code and column:
+                domains[column].append(int(code.group(1)))
+            elif re.match(r'^[A-Za-z]+$', line):
+                column = line
+                domains[column] = []
+    return domains
+
+
+# Generate rows in the IBM dataset's schema (same 35 columns, in the same order)
+# Coded columns take any of their documented codes, Department & JobRole are drawn as a pair (no Sales roles in R&D),
+# EmployeeNumber counts up from first_number & every other column is drawn from the values of the bundled dataset
+def generate_rows(source, domains, rows, rng, first_number=1):
+    picks = rng.integers(len(source), size=rows)
+    columns = {}
+    for col in source.columns:
+        if col == 'EmployeeNumber':
+            columns[col] = np.arange(first_number, first_number + rows)
+        elif col in domains:
+            columns[col] = rng.choice(domains[col], size=rows)
+        elif col in ('Department', 'JobRole'):
+            columns[col] = source[col].to_numpy()[picks]
+        else:
+            columns[col] = source[col].to_numpy()[rng.integers(len(source), size=rows)]
+    return pd.DataFrame(columns)
+
+
+# Write a synthetic dataset of the given size as CSV - reused if it was already generated with the same size & seed
+def generate_dataset(rows, seed=0, data_dir=BENCH_DATA_DIR, source_path=DATASET_PATH):
+    path = os.path.join(data_dir, f'ibm-synthetic-{rows}-{seed}.csv')
+    if os.path.isfile(path):
+        return path
+    os.makedirs(data_dir, exist_ok=True)
+    source = pd.read_csv(source_path, encoding='utf-8-sig')
+    domains = column_domains()
+    rng = np.random.default_rng(seed)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    for start in range(0, rows, GENERATE_CHUNK_ROWS):
+        chunk = generate_rows(source, domains, min(GENERATE_CHUNK_ROWS, rows - start), rng, first_number=start + 1)
+        chunk.to_csv(tmp_path, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+################################ MEASUREMENTS ################################
+
+# Peak memory of this process so far, in MB (ru_maxrss is KB on Linux, bytes on macOS)
+def peak_memory_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+# Initial value of every component in the layout - {component id: value}, used as the callback inputs
+def layout_values(node, values=None):
+    values = {} if values is None else values
+    if isinstance(node, dict):
+        props = node.get('props', {})
+        if 'id' in props and 'value' in props:
+            values[props['id']] = props['value']
+        for child in node.values():
+            layout_values(child, values)
+    elif isinstance(node, list):
+        for child in node:
+            layout_values(child, values)
+    return values
+
+
+# Body of a Dash callback request - the callback's inputs set to the layout's initial values
+def callback_body(dependency, values):
+    outputs = [dict(zip(('id', 'property'), output.rsplit('.', 1))) for output in dependency['output'].strip('.').split('...')]
+    return {
+        'output': dependency['output'],
+        'outputs': outputs if dependency['output'].startswith('..') else outputs[0],
+        'inputs': [dict(item, value=values.get(item['id'])) for item in dependency['inputs']],
+        'state': [dict(item, value=values.get(item['id'])) for item in dependency.get('state', [])],
+        'changedPropIds': [f'{item["id"]}.{item["property"]}' for item in dependency['inputs']],
+    }
+
+
+# Time one request - (milliseconds, response)
+def timed_request(send):
+    started = time.perf_counter()
+    response = send()
+    return (time.perf_counter() - started) * 1000, response
+
+
+# Benchmark the dashboard in this process - on the dataset the app was configured with (see run_isolated)
+# Prep time, peak memory, layout size & each server callback's latency (cache cleared vs. cached) & payload size
+def run_benchmark(repeat=5, import_seconds=None):
+    from emp_attrition import app
+    from emp_attrition.dashboard import get_dashboard
+    from emp_attrition.figure_cache import FIGURE_CACHE, CACHE_LOCK
+
+    started = time.perf_counter()
+    dashboard = get_dashboard()
+    prep_seconds = time.perf_counter() - started
+    prep_peak = peak_memory_mb()
+
+    client = app.server.test_client()
+    compressed = {'Accept-Encoding': 'br'}
+    layout_ms, layout = timed_request(lambda: client.get('/dashboard/_dash-layout', headers=compressed))
+    values = layout_values(json.loads(dashboard['layout']['body']))
+
+    callbacks = []
+    for dependency in client.get('/dashboard/_dash-dependencies').get_json():
+        if dependency.get('clientside_function'):
+            continue
+        body = callback_body(dependency, values)
+        post = lambda headers=compressed: client.post('/dashboard/_dash-update-component', json=body, headers=headers)
+
+        cold = []
+        for _ in range(repeat):
+            with CACHE_LOCK:
+                FIGURE_CACHE.clear()
+            cold.append(timed_request(post)[0])
+        warm = [timed_request(post)[0] for _ in range(repeat)]
+        response = post({})
+        callbacks.append({
+            'output': dependency['output'],
+            'status': response.status_code,
+            'cold_ms': round(statistics.median(cold), 2),
+            'warm_ms': round(statistics.median(warm), 2),
+            'bytes': len(response.get_data()),
+            'bytes_br': len(post().get_data()),
+        })
+
+    return {
+        'path': app.server.config['DATASET_PATH'],
+        'rows': int(dashboard['aggregates']['cube']['YearsAtCompany']['count'].sum()),
+        'chunksize': app.server.config['DATASET_CHUNKSIZE'],
+        'import_seconds': None if import_seconds is None else round(import_seconds, 3),
+        'prep_seconds': round(prep_seconds, 3),
+        'prep_peak_memory_mb': prep_peak,
+        'peak_memory_mb': peak_memory_mb(),
+        'layout_ms': round(layout_ms, 2),
+        'layout_bytes': len(dashboard['layout']['body']),
+        'layout_bytes_br': len(layout.get_data()),
+        'callbacks': callbacks,
+    }
+
+
+# Child process of run_isolated - times importing the package (which builds the app), then runs the benchmark
+BENCH_CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import emp_attrition
+import_seconds = time.perf_counter() - started
+from emp_attrition.benchmark import run_benchmark
+print(json.dumps(run_benchmark(int(sys.argv[1]), import_seconds)))
+"""
+
+
+# Run the benchmark in a fresh Python process - imports, caches & peak memory aren't carried over from another run
+# The app reads its settings from the environment when the package is imported, so the dataset is passed that way
+def run_isolated(path, chunksize=0, repeat=5):
+    env = dict(os.environ, DATASET_PATH=path, DATASET_CHUNKSIZE=str(chunksize), DASHBOARD_WARMUP='lazy', DATASET_RELOAD_INTERVAL='0')
+    env.pop('FIGURE_CACHE_DIR', None)
+    output = subprocess.run([sys.executable, '-c', BENCH_CHILD, str(repeat)], env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+# Commit the benchmark ran on - None outside a git checkout
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], check=True, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Benchmark every size - generates the datasets first, then one isolated run per dataset
+def run_suite(rows=BENCH_ROWS, chunksize=0, repeat=5, seed=0, data_dir=BENCH_DATA_DIR):
+    results = []
+    for size in rows:
+        path = generate_dataset(size, seed, data_dir)
+        results.append(dict(run_isolated(path, chunksize, repeat), generated_rows=size))
+    return bench_report(results, seed)
+
+
+# Benchmark one dataset (i.e. a real export) - a report like run_suite's, so two runs can be compared too
+def run_one(path, chunksize=0, repeat=5):
+    return bench_report([dict(run_isolated(path, chunksize, repeat), generated_rows=None)])
+
+
+def bench_report(results, seed=None):
+    return {
+        'commit': git_commit(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'seed': seed,
+        'results': results,
+    }
+
+
+################################# COMPARISON #################################
+
+# Metrics compared between two runs - higher is worse for every one of them
+COMPARE_METRICS = ['import_seconds', 'prep_seconds', 'peak_memory_mb', 'layout_bytes', 'layout_bytes_br']
+CALLBACK_METRICS = ['cold_ms', 'warm_ms', 'bytes', 'bytes_br']
+
+
+# Size a result is matched on - the generated size for suite runs, the rows read for a single dataset's run
+def result_size(result):
+    return result.get('generated_rows') or result['rows']
+
+
+# Compare two suite (or run) results - one line per metric that got worse by more than threshold (0.1 = 10%), matched by size & callback
+def compare_runs(old, new, threshold=0.1):
+    regressions = []
+
+    def check(label, before, after):
+        if before and after > before * (1 + threshold):
+            regressions.append(f'{label}: {before} -> {after} (+{(after / before - 1) * 100:.0f}%)')
+
+    old_results = {(result_size(result), result['chunksize']): result for result in old['results']}
+    for result in new['results']:
+        before = old_results.get((result_size(result), result['chunksize']))
+        if before is None:
+            continue
+        name = f'{result_size(result)} rows'
+        for metric in COMPARE_METRICS:
+            check(f'{name} {metric}', before[metric], result[metric])
+        old_callbacks = {callback['output']: callback for callback in before['callbacks']}
+        for callback in result['callbacks']:
+            if callback['output'] in old_callbacks:
+                for metric in CALLBACK_METRICS:
+                    check(f'{name} {callback["output"]} {metric}', old_callbacks[callback['output']][metric], callback[metric])
+    return regressions
+
+
+# Benchmark step - run from the project root:
+#   python -m emp_attrition.benchmark suite [--rows 1000 10000 ...] [--chunksize N] [--output bench.json]
+#   python -m emp_attrition.benchmark run path/to/export.csv [--chunksize N] [--output run.json]
+#   python -m emp_attrition.benchmark compare old.json new.json [--threshold 0.1]   (exit code 1 when something got worse)
+#   python -m emp_attrition.benchmark generate --rows 10000000
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python -m emp_attrition.benchmark')
+    commands = parser.add_subparsers(dest='command', required=True)
+    suite = commands.add_parser('suite', help='generate datasets & benchmark each one')
+    suite.add_argument('--rows', type=int, nargs='+', default=BENCH_ROWS)
+    suite.add_argument('--chunksize', type=int, default=0)
+    suite.add_argument('--repeat', type=int, default=5)
+    suite.add_argument('--seed', type=int, default=0)
+    suite.add_argument('--output')
+    run = commands.add_parser('run', help='benchmark one dataset (i.e. a real export)')
+    run.add_argument('path')
+    run.add_argument('--chunksize', type=int, default=0)
+    run.add_argument('--repeat', type=int, default=5)
+    run.add_argument('--output')
+    generate = commands.add_parser('generate', help='only generate the synthetic datasets')
+    generate.add_argument('--rows', type=int, nargs='+', default=BENCH_ROWS)
+    generate.add_argument('--seed', type=int, default=0)
+    compare = commands.add_parser('compare', help='list metrics that got worse between two suite (or run) results')
+    compare.add_argument('old')
+    compare.add_argument('new')
+    compare.add_argument('--threshold', type=float, default=0.1)
+    args = parser.parse_args()
+
+    if args.command in ('suite', 'run'):
+        if args.command == 'suite':
+            report = json.dumps(run_suite(args.rows, args.chunksize, args.repeat, args.seed), indent=2)
+        else:
+            report = json.dumps(run_one(args.path, args.chunksize, args.repeat), indent=2)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                f.write(report)
+        else:
+            print(report)
+    elif args.command == 'generate':
+        for size in args.rows:
+            print(generate_dataset(size, args.seed))
+    else:
+        with open(args.old, encoding='utf-8') as f_old, open(args.new, encoding='utf-8') as f_new:
+            found = compare_runs(json.load(f_old), json.load(f_new), args.threshold)
+        print('\n'.join(found) or 'No regressions')
+        sys.exit(1 if found else 0)
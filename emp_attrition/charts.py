@@ -0,0 +1,447 @@
+############################# IMPORT DEPENDENCIES ############################
+
+import itertools
+import json
+import sys
+
+import plotly.express as px
+import plotly.graph_objs as go
+import plotly.io as pio
+from plotly.utils import PlotlyJSONEncoder
+
+from emp_attrition.aggregates import PIVOT_SPECS, attrition_counts, category_attrition, pivot_slice
+
+
+############################# DASHBOARD TEMPLATE ##############################
+
+# Look shared by every chart - the plotly template (same colors as before) plus LightSteelBlue paper, black fonts & centered titles
+# Registered as 'attrition', so pio.templates['attrition'] gives the same look outside the dashboard (i.e. in a notebook)
+DASHBOARD_TEMPLATE = go.layout.Template(pio.templates['plotly'])
+DASHBOARD_TEMPLATE.layout.update(
+    paper_bgcolor="LightSteelBlue",
+    font_color="black",
+    title_font_color="black",
+    legend_title_font_color="black",
+    title_x=0.5, #centers the chart title
+)
+pio.templates['attrition'] = DASHBOARD_TEMPLATE
+
+# Template as plain JSON - put in each figure as it is, not validated again
+TEMPLATE_JSON = DASHBOARD_TEMPLATE.to_plotly_json()
+
+# Colors given to categories in order, like Plotly Express does - the template's colorway
+COLOR_SEQUENCE = list(DASHBOARD_TEMPLATE.layout.colorway)
+
+# Footnote/caption settings shared by every chart - each chart gives its text & position
+NOTE_DEFAULTS = {'showarrow': False, 'font': {'size': 9}, 'xref': 'paper', 'x': 0.5, 'yref': 'paper', 'align': 'center'}
+
+# Department colors - the same in the bar chart & the pie chart
+DEPARTMENT_COLORS = {
+    "Human Resources": "red",
+    "Research & Development": "green",
+    "Sales": "blue",
+}
+
+
+################################ CHART SPECS ##################################
+
+# Every dashboard chart - {chart id: spec}
+# data - where the rows come from: a cube dimension ('category_attrition' with the stat shown, or 'attrition_counts' for line charts)
+#        or a precomputed pivot ('pivot_slice') - None if the callback works them out itself
+# kind - the Plotly Express function, px - its arguments, title - chart title ({n} etc. filled in per call)
+# builder - 'fast' draws the traces straight from the rows (see FAST FIGURES below), 'px' (the default) calls Plotly Express
+# layout - the chart's own layout settings on top of the template, note - footnote/caption (text & position)
+CHART_SPECS = {
+    'fig_income1a': {
+        'data': {'source': 'attrition_counts', 'dimension': 'MonthlyIncome', 'name': 'MoIncomeCounts'},
+        'kind': 'line',
+        'px': {'x': 'MonthlyIncome', 'y': 'MoIncomeCounts', 'color': 'Attrition'},
+        'title': 'Monthly Income vs. Attrition',
+        'layout': {'transition_duration': 500, 'legend_title_text': 'Attrition', 'xaxis_title': 'Monthly Income', 'yaxis_title': 'Count', 'height': 375},
+        'note': {'text': 'The highest rate of attrition based on monthly income is<br>among employees earning less than $5k per month.', 'y': -0.40},
+    },
+    'fig_percent_salary_increase': {
+        'data': {'source': 'attrition_counts', 'dimension': 'PercentSalaryHike'},
+        'kind': 'line',
+        'px': {'x': 'PercentSalaryHike', 'y': 'Count', 'color': 'Attrition'},
+        'title': 'Percent Salary Increase vs. Attrition',
+        'layout': {'transition_duration': 500, 'legend_title_text': 'Attrition', 'xaxis_title': 'Percent Salary Increase', 'yaxis_title': 'Count', 'height': 375},
+        'note': {'text': 'Higher attrition rates are associated with lower percent salary increases.', 'y': -0.35},
+    },
+    'fig_stock_options': {
+        'data': {'source': 'attrition_counts', 'dimension': 'StockOptionLevel'},
+        'kind': 'line',
+        'px': {'x': 'StockOptionLevel', 'y': 'Count', 'color': 'Attrition'},
+        'title': 'Stock Option Level vs. Attrition',
+        # The x-axis tick marks start at 0 and increment by 1 in whole numbers
+        'layout': {'transition_duration': 500, 'legend_title_text': 'Attrition', 'yaxis_title': 'Count', 'height': 375,
+                   'xaxis': {'title_text': 'Stock Option Level', 'tickmode': 'linear', 'tick0': 0, 'dtick': 1}},
+        'note': {'text': 'Higher attrition rates are associated with lower stock option levels.', 'y': -0.35},
+    },
+    'fig_promotion': {
+        'data': {'source': 'attrition_counts', 'dimension': 'YearsSinceLastPromotion'},
+        'kind': 'line',
+        'px': {'x': 'YearsSinceLastPromotion', 'y': 'Count', 'color': 'Attrition'},
+        'title': 'Years Since Last Promotion vs. Attrition',
+        'layout': {'transition_duration': 500, 'legend_title_text': 'Attrition', 'xaxis_title': 'Years Since Last Promotion', 'yaxis_title': 'Count', 'height': 375},
+        'note': {'text': 'There is increased attrition among employees who have not<br>received a promotion in the last 3 to 7 years.', 'y': -0.40},
+    },
+    'fig_yrs_at_co': {
+        'data': {'source': 'attrition_counts', 'dimension': 'YearsAtCompany'},
+        'kind': 'line',
+        'px': {'x': 'YearsAtCompany', 'y': 'Count', 'color': 'Attrition'},
+        'title': 'Years at Company vs. Attrition',
+        'layout': {'transition_duration': 500, 'legend_title_text': 'Attrition', 'xaxis_title': 'Years at Company', 'yaxis_title': 'Count', 'height': 375},
+        'note': {'text': 'Evaluating against years at the company, the highest rate of attrition occurs<br>within the first four years of employment.', 'y': -0.40},
+    },
+    'fig_current_role': {
+        'data': {'source': 'attrition_counts', 'dimension': 'YearsInCurrentRole'},
+        'kind': 'line',
+        'px': {'x': 'YearsInCurrentRole', 'y': 'Count', 'color': 'Attrition'},
+        'title': 'Years in Current Role vs. Attrition',
+        'layout': {'transition_duration': 500, 'legend_title_text': 'Attrition', 'xaxis_title': 'Years in Current Role', 'yaxis_title': 'Count', 'height': 375},
+        'note': {'text': 'Evaluating against yrs in current role, the highest rate of attrition occurs in<br>employees working for the co. less than 1 yr or around 2 yrs.', 'y': -0.40},
+    },
+    'fig_gender_ed_level': {
+        'data': {'source': 'category_attrition', 'dimension': ('Education', 'Gender'), 'stat': 'rate'},
+        'kind': 'histogram',
+        'px': {'x': 'Education', 'y': 'Attrition', 'color': 'Gender', 'histfunc': 'avg',
+               'category_orders': {"Education": ["Below College", "College", "Bachelor", "Master", "Doctor"]}},
+        'title': 'Average Rate of Attrition by Gender and Education Level',
+        'layout': {'transition_duration': 500, 'xaxis_title': 'Education Level', 'yaxis_title': 'Avg Rate of Attrition', 'yaxis_tickformat': '%', 'height': 450},
+        'note': {'text': 'Comparing rate of attrition against gender and level of education, the highest rate of attrition among women are those with an education level below college (18%). The highest rate of attrition among men are those with education levels below college & bachelor (both 18%).', 'y': -0.25},
+    },
+    'fig_gender_ed_field': {
+        'data': {'source': 'category_attrition', 'dimension': ('EducationField', 'Gender'), 'stat': 'rate'},
+        'kind': 'histogram',
+        'px': {'x': 'EducationField', 'y': 'Attrition', 'color': 'Gender', 'histfunc': 'avg'},
+        'title': 'Average Rate of Attrition by Gender and Field of Education',
+        'layout': {'transition_duration': 500, 'xaxis_title': 'Field of Education', 'yaxis_title': 'Avg Rate of Attrition', 'yaxis_tickformat': '%', 'height': 450},
+        'note': {'text': 'Comparing rate of attrition against gender and field of education, the highest rate of attrition among women are those with education in HR (38%). The highest rate of attrition among men are those with a Technical Degree (28%).', 'y': -0.25},
+    },
+
+    # This pie chart shows percentage of attrition for each travel category as a percentage of the whole 237 employees who have left the company
+    'employee-attributes-1': {
+        'data': {'source': 'category_attrition', 'dimension': 'BusinessTravel', 'stat': 'leavers'},
+        'kind': 'pie',
+        'builder': 'fast',
+        'px': {'values': 'Attrition', 'names': 'BusinessTravel', 'color': 'BusinessTravel'},
+        'title': 'Total Attrition - Percent Breakout<br>by Job Travel (n={n})',
+        'layout': {'transition_duration': 500, 'legend_title_text': 'Travel Frequency', 'height': 375},
+        'note': {'text': 'Job Roles with Rare Travel make up a higher rate of overall attrition<br>(66%) than roles with Frequent Travel (29%) or No Travel (5%).<br>Consideration: Is rare travel too much travel or not enough?', 'x': 0.6, 'y': -0.35},
+    },
+    # This chart shows percentage of attrition within each OverTime category, not as a percentage of the whole
+    'ot-percent': {
+        'data': {'source': 'category_attrition', 'dimension': 'OverTime', 'stat': 'rate'},
+        'kind': 'histogram',
+        'builder': 'fast',
+        'px': {'x': 'OverTime', 'y': 'Attrition', 'histfunc': 'avg', 'color': 'OverTime'},
+        'title': 'Avg Rate of Attrition vs. Overtime Status',
+        'layout': {'transition_duration': 500, 'legend_title_text': 'Overtime Required', 'xaxis_title': 'Overtime Required', 'yaxis_tickformat': '%', 'height': 375},
+        'note': {'text': 'There is a 31% avg attrition rate among employees who worked OT,<br>while there is a 10% avg attrition rate among employees who did not work OT.', 'x': 0.6, 'y': -0.40},
+    },
+    'last-promotion-chart': {
+        'data': {'source': 'attrition_counts', 'dimension': 'YearsAtCompany'},
+        'kind': 'line',
+        'builder': 'fast',
+        'px': {'x': 'YearsAtCompany', 'y': 'Count', 'color': 'Attrition'},
+        'title': 'Years at Company vs. Attrition',
+        'layout': {'transition_duration': 500, 'legend_title_text': 'Attrition', 'xaxis_title': 'Years at Company', 'yaxis_title': 'Count', 'height': 375},
+        'note': {'text': 'Evaluating attrition against years in current role, the highest rate of attrition occurs<br>among employees working for the company for less than 1 year or around 2 years.', 'y': -0.25, 'height': 400},
+    },
+    # category_orders sets the display order of the bars in the chart
+    'commute-chart': {
+        'data': {'source': 'category_attrition', 'dimension': 'CommuteGroup', 'stat': 'rate'},
+        'kind': 'histogram',
+        'builder': 'fast',
+        'px': {'x': 'Attrition', 'y': 'CommuteGroup', 'color': 'CommuteGroup', 'histfunc': 'avg',
+               'category_orders': {"CommuteGroup": ["1 to 5 miles", "6 to 10 miles", "11 to 20 miles", "Over 20 miles"]}},
+        'title': 'Avg Rate of Attrition vs. Commute Distance',
+        'layout': {'transition_duration': 500, 'legend_title_text': 'Commute Distance', 'xaxis_title': 'Rate of Attrition', 'yaxis_title': 'Commute Distance',
+                   'xaxis_tickformat': '%', 'height': 375, 'yaxis_categoryorder': 'total ascending'},
+        'note': {'text': 'Employees with commutes of 20 miles or more have the highest attrition rate.', 'x': 0.55, 'y': -0.35},
+    },
+    # x (the satisfaction rating picked in the dropdown) is given per call
+    'satisfaction_area_chart': {
+        'data': {'source': 'pivot_slice', 'pivot': 'satisfaction'},
+        'kind': 'bar',
+        'builder': 'fast',
+        'px': {'y': 'Count', 'color': 'Attrition', 'barmode': 'stack'},
+        'title': 'Attrition vs. Satisfaction Ratings',
+        # Tick labels at positions [1,2,3,4] are renamed (tickmode array)
+        'layout': {'transition': {'duration': 500, 'easing': 'cubic-in-out'}, 'legend_title_text': 'Attrition', 'height': 400,
+                   'xaxis': {'title_text': 'Satisfaction Rating', 'tickmode': 'array', 'tick0': 0, 'dtick': 1, 'tickvals': [1, 2, 3, 4],
+                             'ticktext': ['1: Low', "2: Medium", "3: High", "4: Very High"]}},
+        'note': None,
+    },
+    # This chart displays horizontally - one Attrition measure for each dept
+    'chart-with-dropdown': {
+        'data': {'source': 'category_attrition', 'dimension': 'Department', 'stat': 'rate'},
+        'kind': 'histogram',
+        'builder': 'fast',
+        'px': {'x': 'Attrition', 'y': 'Department', 'histfunc': 'avg', 'barmode': 'group', 'color': 'Department', 'color_discrete_map': DEPARTMENT_COLORS},
+        'title': 'Average Rate of Attrition by Department',
+        'layout': {'transition_duration': 500, 'xaxis_tickformat': '%', 'height': 400, 'yaxis_categoryorder': 'total ascending'},
+        'note': {'text': 'Although Percent Breakout by Department indicates that R&D makes up the highest percentage of all employees who have<br>left the company, the avg rate of attrition within R&D independently is 14%, compared to 21% for Sales and 19% for HR.', 'y': -0.35},
+    },
+    # This pie chart shows percent of total attrition by department
+    # i.e. Sales has 38.8% of total attrition (92 of the 237 empls that left were from the sales department)
+    'dept_pct_pie': {
+        'data': {'source': 'category_attrition', 'dimension': 'Department', 'stat': 'leavers'},
+        'kind': 'pie',
+        'builder': 'fast',
+        'px': {'values': 'Attrition', 'names': 'Department', 'color': 'Department', 'color_discrete_map': DEPARTMENT_COLORS},
+        'title': 'Total Attrition - Percent Breakout by Department (n={n})',
+        'layout': {'legend_title_text': 'Department', 'height': 400},
+        'note': {'text': 'R&D is the largest department, with 65% of all employees, so it stands to reason<br>that the highest percentage of employees leaving would come from the largest department.', 'y': -0.30},
+    },
+    'work_balance_pie': {
+        'data': {'source': 'category_attrition', 'dimension': 'WorkLifeBalance', 'stat': 'leavers'},
+        'kind': 'pie',
+        'builder': 'fast',
+        'px': {'values': 'Attrition', 'names': 'WorkLifeBalance', 'color': 'WorkLifeBalance'},
+        'title': 'Total Attrition - Percent Breakout by Work Life Balance Rating (n={n})',
+        'layout': {'legend_title_text': 'Work Life Balance Rating', 'height': 400},
+        'note': {'text': 'The highest rate of attrition comes from people who rated the work life balance<br>as "Good" (3) out of a 4-point scale.', 'y': -0.30},
+    },
+    'perf_rating_pie': {
+        'data': {'source': 'category_attrition', 'dimension': 'PerformanceRating', 'stat': 'leavers'},
+        'kind': 'pie',
+        'builder': 'fast',
+        'px': {'values': 'Attrition', 'names': 'PerformanceRating', 'color': 'PerformanceRating'},
+        'title': 'Total Attrition - Percent Breakout by Performance Rating (n={n})',
+        'layout': {'legend_title_text': 'Performance Rating', 'height': 400},
+        'note': {'text': 'All employees received performance ratings of Excellent (3) or Outstanding (4)<br>out of a 4-point scale. Of employees who left the company, 84% received an "Excellent" rating.', 'y': -0.30},
+    },
+    'chart-jobrole-checkbox': {
+        'data': {'source': 'category_attrition', 'dimension': 'JobRole', 'stat': 'rate'},
+        'kind': 'histogram',
+        'builder': 'fast',
+        'px': {'x': 'Attrition', 'y': 'JobRole', 'histfunc': 'avg'},
+        'title': 'Average Rate of Attrition by Job Role',
+        'layout': {'transition_duration': 500, 'yaxis_title': 'Job Role', 'xaxis_tickformat': '%', 'height': 450, 'yaxis_categoryorder': 'total ascending'},
+        'note': {'text': 'The Sales Representative Role has the highest rate of attrition at 40%, followed by Laboratory Technician at 24% and Human Resources at 23%.', 'y': -0.25},
+    },
+    # As the color becomes darker in either direction, those variables are more highly correlated and should not be paired together in the same model
+    # The correlation matrix is worked out by the update_heatmap callback (Pearson or Spearman)
+    'correlation-heatmap': {
+        'data': None,
+        'kind': 'imshow',
+        'px': {'zmin': -1, 'zmax': 1, 'color_continuous_scale': 'RdBu_r'},
+        'title': '{method} Correlation Between Employee Features',
+        'layout': {'height': 900},
+        'note': None,
+    },
+}
+
+
+# Validate a chart's layout settings & footnote once & keep them as plain JSON - added to each figure without validating again
+def compile_layout(spec):
+    notes = [{**NOTE_DEFAULTS, **spec['note']}] if spec['note'] is not None else []
+    return go.Layout(**spec['layout'], annotations=notes).to_plotly_json()
+
+
+# Compiled layout of each chart - {chart id: layout JSON}, built once at import
+CHART_LAYOUTS = {chart_id: compile_layout(spec) for chart_id, spec in CHART_SPECS.items()}
+
+
+############################### FIGURE BUILDING ###############################
+
+# Rows for a chart from its data source - a checklist/dropdown selection keeps only the selected categories (or picks the pivot)
+def chart_rows(chart_id, selection=None, aggregates=None):
+    data = CHART_SPECS[chart_id]['data']
+    if data['source'] == 'attrition_counts':
+        return attrition_counts(data['dimension'], name=data.get('name', 'Count'), aggregates=aggregates)
+    if data['source'] == 'pivot_slice':
+        return pivot_slice(data['pivot'], selection, aggregates)
+    return category_attrition(data['dimension'], selection, stat=data['stat'], aggregates=aggregates)
+
+
+# Layout settings laid over another layout - nested settings are merged (i.e. px's axis title replaced, its axis domain kept)
+def merge_layout(base, overrides):
+    merged = dict(base)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_layout(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+# Build a chart's figure as a dict - the chart's builder draws the traces, then the compiled layout & the template go on without a second validation
+# title_args fill in the title (i.e. {'n': 237}), px_args add to or replace the spec's px arguments (i.e. the dropdown's x column)
+# builder - 'fast' or 'px' instead of the chart's own (i.e. to compare the two)
+def build_figure(chart_id, rows, title_args=None, builder=None, **px_args):
+    spec = CHART_SPECS[chart_id]
+    build = FIGURE_BUILDERS[builder or spec.get('builder', 'px')]
+    figure = build(spec['kind'], rows, spec['title'].format(**(title_args or {})), {**spec['px'], **px_args})
+    layout = merge_layout(figure['layout'], CHART_LAYOUTS[chart_id])
+    layout['template'] = TEMPLATE_JSON
+    return {'data': figure['data'], 'layout': layout}
+
+
+# Plotly Express builder - any px chart, validated as it's built
+def px_figure(kind, rows, title, args):
+    return getattr(px, kind)(rows, title=title, **args).to_plotly_json()
+
+
+################################ FAST FIGURES #################################
+
+# Lightweight builder for the callback charts - writes the same trace & layout dicts Plotly Express would for the few
+# aggregated rows these charts get, without px's argument processing, frame reshaping & validation (several times the data work)
+# Covers pie, histogram, bar & line charts with the px arguments the specs use - python -m emp_attrition.charts checks it against px
+
+
+# Color of each category - a color map first, then the color sequence in the order the categories come (like px)
+def category_colors(values, color_map=None):
+    colors = dict(color_map or {})
+    for value in values:
+        if value not in colors:
+            colors[value] = COLOR_SEQUENCE[len(colors) % len(COLOR_SEQUENCE)]
+    return colors
+
+
+# Hover text like px's - "column=value" for the trace's category, then each axis
+def hover_template(parts):
+    return '<br>'.join(f'{label}={value}' for label, value in parts.items()) + '<extra></extra>'
+
+
+# Pie chart - one trace, a slice per row
+def pie_figure(rows, title, args):
+    names, values, color = args['names'], args['values'], args.get('color')
+    parts = {names: '%{label}', values: '%{value}'}
+    trace = {'type': 'pie', 'labels': rows[names].to_numpy(), 'values': rows[values].to_numpy(), 'domain': {'x': [0.0, 1.0], 'y': [0.0, 1.0]},
+             'legendgroup': '', 'name': '', 'showlegend': True}
+    if color:
+        parts[color] = '%{customdata[0]}'
+        trace['customdata'] = rows[[color]].to_numpy()
+        colors = category_colors(rows[color], args.get('color_discrete_map'))
+        trace['marker'] = {'colors': [colors[value] for value in rows[color]]}
+    trace['hovertemplate'] = hover_template(parts)
+    return {'data': [trace], 'layout': {'title': {'text': title}, 'legend': {'tracegroupgap': 0}}}
+
+
+# Histogram (avg of one row per bar), bar or line chart - a trace per color category, in category_orders then first-seen order
+def cartesian_figure(kind, rows, title, args):
+    x, y, color = args['x'], args['y'], args.get('color')
+    orders = {col: list(values) for col, values in args.get('category_orders', {}).items()}
+    if color:
+        orders.setdefault(color, [])
+        orders[color] += [value for value in rows[color].unique() if value not in orders[color]]
+
+    # Horizontal when the categories are on the y axis (numbers on x, text on y), like px - the line charts are always vertical
+    horizontal = kind != 'line' and rows[x].dtype.kind in 'iufb' and rows[y].dtype.kind not in 'iufb'
+    labels = {x: x, y: y}
+    if kind == 'histogram':
+        value = x if horizontal else y
+        labels[value] = f'{args["histfunc"]} of {value}'
+
+    x_values, y_values = rows[x].to_numpy(), rows[y].to_numpy()
+    if color:
+        categories = rows[color].to_numpy()
+        present = set(categories)
+        groups = [group for group in orders[color] if group in present]
+        colors = category_colors(groups, args.get('color_discrete_map'))
+    else:
+        groups = [None]
+        colors = {None: COLOR_SEQUENCE[0]}
+
+    data = []
+    for group in groups:
+        keep = categories == group if color else slice(None)
+        parts = {}
+        if color:
+            parts[color] = '%{x}' if color == x else '%{y}' if color == y else group
+        parts[labels[x]] = '%{x}'
+        parts[labels[y]] = '%{y}'
+        trace = {'type': 'scatter' if kind == 'line' else kind, 'x': x_values[keep], 'y': y_values[keep], 'xaxis': 'x', 'yaxis': 'y',
+                 'hovertemplate': hover_template(parts), 'legendgroup': group or '', 'name': group or '', 'showlegend': bool(color),
+                 'orientation': 'h' if horizontal else 'v'}
+        if kind == 'line':
+            trace.update(mode='lines', line={'color': colors[group], 'dash': 'solid'})
+        else:
+            trace.update(alignmentgroup='True', offsetgroup=group or '', marker={'color': colors[group]})
+            if kind == 'histogram':
+                trace.update(histfunc=args['histfunc'], bingroup='y' if horizontal else 'x')
+            else:
+                trace['textposition'] = 'auto'
+        data.append(trace)
+
+    layout = {'title': {'text': title}, 'legend': {'tracegroupgap': 0},
+              'xaxis': {'anchor': 'y', 'domain': [0.0, 1.0], 'title': {'text': labels[x]}},
+              'yaxis': {'anchor': 'x', 'domain': [0.0, 1.0], 'title': {'text': labels[y]}}}
+    if color:
+        layout['legend']['title'] = {'text': color}
+    if kind != 'line':
+        layout['barmode'] = args.get('barmode', 'relative')
+    # Axes showing categories keep their order - the y axis lists them bottom up, so its order is reversed
+    for axis, col, order in (('xaxis', x, 1), ('yaxis', y, -1)):
+        if col in orders:
+            layout[axis].update(categoryorder='array', categoryarray=orders[col][::order])
+    return {'data': data, 'layout': layout}
+
+
+def fast_figure(kind, rows, title, args):
+    if kind == 'pie':
+        return pie_figure(rows, title, args)
+    return cartesian_figure(kind, rows, title, args)
+
+
+# Figure builders a chart spec can pick
+FIGURE_BUILDERS = {'px': px_figure, 'fast': fast_figure}
+
+
+################################ PARITY CHECK #################################
+
+# Differences between two figures as JSON - a list of "path: a != b" (empty if they're the same)
+def figure_differences(a, b, path='figure'):
+    if isinstance(a, dict) and isinstance(b, dict):
+        return [difference for key in sorted(set(a) | set(b), key=str)
+                for difference in figure_differences(a.get(key), b.get(key), f'{path}.{key}')]
+    if isinstance(a, list) and isinstance(b, list) and len(a) == len(b):
+        return [difference for i, (item_a, item_b) in enumerate(zip(a, b)) for difference in figure_differences(item_a, item_b, f'{path}[{i}]')]
+    return [] if a == b else [f'{path}: {a!r} != {b!r}']
+
+
+# Selections to check a chart with - every combination of up to 5 categories, otherwise each one alone, all & all but one
+def parity_selections(values):
+    if len(values) <= 5:
+        return [list(combination) for size in range(1, len(values) + 1) for combination in itertools.combinations(values, size)]
+    return [[value] for value in values] + [values] + [[value for value in values if value != left_out] for left_out in values]
+
+
+# Build every fast chart with both builders over its selections & compare the JSON - {(chart id, selection): differences}
+# Needs the aggregates published (the dashboard loaded)
+def check_parity(aggregates=None):
+    problems = {}
+    for chart_id, spec in CHART_SPECS.items():
+        if spec.get('builder') != 'fast':
+            continue
+        data = spec['data']
+        if data['source'] == 'pivot_slice':
+            cases = [(value, {'x': value}) for value in PIVOT_SPECS[data['pivot']]]
+        elif data['source'] == 'category_attrition':
+            cases = [(selection, {}) for selection in parity_selections(chart_rows(chart_id, aggregates=aggregates)[data['dimension']].tolist())]
+        else:
+            cases = [(None, {})]
+        for selection, px_args in cases:
+            rows = chart_rows(chart_id, selection, aggregates)
+            figures = [json.loads(json.dumps(build_figure(chart_id, rows, {'n': len(rows)}, builder, **px_args), cls=PlotlyJSONEncoder))
+                       for builder in ('fast', 'px')]
+            differences = figure_differences(*figures)
+            if differences:
+                problems[(chart_id, json.dumps(selection))] = differences
+    return problems
+
+
+# Check the fast builder still draws what px draws - run from the project root after changing a chart spec or upgrading plotly:
+#   python -m emp_attrition.charts
+if __name__ == '__main__':
+    from emp_attrition.dashboard import get_dashboard
+    from emp_attrition import charts
+    get_dashboard()
+    found = charts.check_parity()
+    for (chart_id, selection), differences in found.items():
+        print(f'{chart_id} {selection}:', *differences[:5], sep='\n    ')
+    print(f'{len(found)} chart selection(s) differ from Plotly Express' if found else 'Fast figures match Plotly Express')
+    sys.exit(1 if found else 0)
@@ -0,0 +1,147 @@
+############################# IMPORT DEPENDENCIES ############################
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from emp_attrition.data import COLUMN_LABELS, labeled, heatmap_view
+
+
+########################### SUFFICIENT STATISTICS ############################
+
+# Dimensions the heatmap can be filtered by - statistics are kept for each combination of their values (a cell)
+# A filtered subset (i.e. one Department) is the sum of the cells it selects, so no rows are rescanned
+# To filter the heatmap by another column, add it here (& to filters.FILTER_DIMENSIONS for the Spearman option)
+CORRELATION_DIMENSIONS = ['Department']
+
+# Variance below which a column counts as constant (its correlations are left blank, like pandas' corr)
+MIN_VARIANCE = 1e-9
+
+
+# Numeric columns of the heatmap view - constant columns dropped & BusinessTravel as numerical codes (see data.heatmap_view)
+def correlation_frame(emp_df):
+    return heatmap_view(emp_df).select_dtypes('number')
+
+
+# Sums of a block of rows - n, Σx & Σxy (Σx² on its diagonal) for each column, after subtracting shift
+def block_sums(values, shift):
+    values = values - shift
+    return {'n': len(values), 'sum': values.sum(axis=0), 'cross': values.T @ values}
+
+
+# Sufficient statistics of a frame of rows - {'columns': [...], 'shift': [...], 'cells': {cell key: sums}}
+# shift is a rough center of each column (the mean of the first rows seen) - keeps the sums small so variances stay accurate
+def correlation_stats(emp_df):
+    frame = correlation_frame(emp_df)
+    values = frame.to_numpy(dtype='float64')
+    shift = values.mean(axis=0) if len(values) else np.zeros(values.shape[1])
+    keys = [(labeled(emp_df, dim) if dim in COLUMN_LABELS else emp_df[dim]).to_numpy() for dim in CORRELATION_DIMENSIONS]
+    cells = {}
+    for key, rows in frame.groupby(keys, sort=False).indices.items():
+        cells[key if isinstance(key, tuple) else (key,)] = block_sums(values[rows], shift)
+    return {'columns': list(frame.columns), 'shift': shift, 'cells': cells}
+
+
+# Add (sign=1) or take out (sign=-1) the statistics of some rows - returns new statistics, like aggregates.add_counts
+# The part's sums are moved onto the running shift first: Σ(x + d) = Σx + n·d & Σ(x + d)(y + e) = Σxy + d·Σy + e·Σx + n·d·e
+def add_stats(stats, part, sign=1):
+    if stats is None:
+        stats = {'columns': part['columns'], 'shift': part['shift'], 'cells': {}}
+    if part['columns'] != stats['columns']:
+        raise ValueError(f'Correlation columns changed from {stats["columns"]} to {part["columns"]} - reload the dataset in full')
+
+    d = part['shift'] - stats['shift']
+    cells = dict(stats['cells'])
+    for key, sums in part['cells'].items():
+        n, total = sums['n'], sums['sum']
+        moved = {'n': n, 'sum': total + n * d, 'cross': sums['cross'] + np.outer(d, total) + np.outer(total, d) + n * np.outer(d, d)}
+        if key in cells:
+            moved = {name: cells[key][name] + sign * moved[name] for name in moved}
+        elif sign < 0:
+            moved = {name: -value for name, value in moved.items()}
+        if moved['n'] == 0:
+            cells.pop(key, None)  # Every row of the cell taken back out
+        else:
+            cells[key] = moved
+    return {'columns': stats['columns'], 'shift': stats['shift'], 'cells': cells}
+
+
+# Add up the cells a selection keeps - {dimension: values}, cells must match every dimension (AND) like filters.filter_mask
+def select_sums(stats, selections=None):
+    selections = selections or {}
+    k = len(stats['columns'])
+    total = {'n': 0, 'sum': np.zeros(k), 'cross': np.zeros((k, k))}
+    for key, sums in stats['cells'].items():
+        if all(key[i] in selections[dim] for i, dim in enumerate(CORRELATION_DIMENSIONS) if dim in selections):
+            total = {name: total[name] + sums[name] for name in total}
+    return total
+
+
+# Pearson correlation matrix from sums - cov = Σxy/n - mean(x)·mean(y), divided by the standard deviations
+def correlation_from_sums(sums, columns):
+    n = sums['n']
+    if n < 2:
+        return pd.DataFrame(np.nan, index=columns, columns=columns)
+    mean = sums['sum'] / n
+    cov = sums['cross'] / n - np.outer(mean, mean)
+    variance = np.diag(cov).copy()
+    variance[variance < MIN_VARIANCE] = np.nan
+    std = np.sqrt(variance)
+    corr = np.clip(cov / np.outer(std, std), -1, 1)
+    np.fill_diagonal(corr, np.where(np.isnan(std), np.nan, 1.0))
+    return pd.DataFrame(corr, index=columns, columns=columns)
+
+
+# Pearson correlation matrix for the rows a selection keeps (every row when None) - read from the cells, no rows needed
+def pearson_matrix(stats, selections=None):
+    return correlation_from_sums(select_sums(stats, selections), stats['columns'])
+
+
+################################# RANK CACHES ################################
+
+# Spearman correlation is Pearson correlation of the ranks - ranks depend on which rows are kept, so they can't be summed by cell
+# Instead the sort order of each column is cached once per version of the rows, & a subset's ranks are read off it without sorting
+# {'cache': {'key': version the cache was built for, 'columns': [...], 'values': rows x columns, 'orders': row order of each column when sorted}}
+# A new cache is built whole & put in with one assignment, so a reader never sees one half filled
+RANK_CACHE = {'cache': None}
+
+# Callbacks run on several threads - the first Spearman request for a version builds the cache, the others wait for it
+RANK_LOCK = threading.Lock()
+
+
+# Return the rank cache for a version of the rows - built on the first Spearman request for that version
+def rank_cache(emp_df, key):
+    cache = RANK_CACHE['cache']
+    if cache is None or cache['key'] != key:
+        with RANK_LOCK:
+            cache = RANK_CACHE['cache']
+            if cache is None or cache['key'] != key:
+                frame = correlation_frame(emp_df)
+                values = frame.to_numpy(dtype='float64')
+                cache = {'key': key, 'columns': list(frame.columns), 'values': values, 'orders': np.argsort(values, axis=0, kind='stable')}
+                RANK_CACHE['cache'] = cache
+    return cache
+
+
+# Ranks of each column within the masked rows - ties share the average of their ranks (same as pandas' rank)
+# Walks each column's cached sort order, keeping the masked rows - O(rows) per column instead of a sort
+def subset_ranks(cache, mask):
+    values, orders = cache['values'], cache['orders']
+    position = np.cumsum(mask) - 1  # Row number -> position among the masked rows
+    ranks = np.empty((int(mask.sum()), values.shape[1]))
+    for j in range(values.shape[1]):
+        order = orders[:, j][mask[orders[:, j]]]
+        sorted_values = values[order, j]
+        starts = np.flatnonzero(np.r_[True, sorted_values[1:] != sorted_values[:-1]])
+        ends = np.r_[starts[1:], len(sorted_values)]
+        ranks[position[order], j] = np.repeat((starts + ends + 1) / 2, ends - starts)
+    return ranks
+
+
+# Spearman correlation matrix for the masked rows (every row when None)
+def spearman_matrix(emp_df, key, mask=None):
+    cache = rank_cache(emp_df, key)
+    mask = np.ones(len(cache['values']), dtype=bool) if mask is None else mask
+    ranks = subset_ranks(cache, mask)
+    return correlation_from_sums(block_sums(ranks, ranks.mean(axis=0) if len(ranks) else 0), cache['columns'])
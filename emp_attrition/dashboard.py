@@ -1,19 +1,33 @@
 ############################# IMPORT DEPENDENCIES ############################
 
-from os import X_OK
-import dash
+import functools
+import json
+import os
+import threading
+import time
+from types import MappingProxyType
+
+import flask
 import dash_core_components as dcc
 import dash_html_components as html
-from dash.dependencies import Input, Output, State
-from numpy.lib.function_base import _diff_dispatcher, select
-import pandas as pd
-import numpy as np
-import plotly.express as px
-import plotly.graph_objs as go
-import seaborn as sns
-import plotly.figure_factory as ff
-
-from emp_attrition import app
+from dash.dependencies import ClientsideFunction, Input, Output
+from plotly.utils import PlotlyJSONEncoder
+
+from emp_attrition.data import DATASET_PATH, SATISFACTION_COLUMNS, read_dataset_chunks, read_delta, merge_rows
+from emp_attrition.ingest import read_dataset, source_version, delta_dir, list_deltas
+from emp_attrition.aggregates import (attrition_table, attrition_totals, category_attrition, correlation_table, register_pivot,
+                                      build_aggregates, build_aggregates_from_chunks, update_aggregates, publish_aggregates, count_rows, finish_aggregates,
+                                      pivot_columns)
+from emp_attrition.correlation import pearson_matrix, spearman_matrix
+from emp_attrition.charts import CHART_SPECS, chart_rows, build_figure
+from emp_attrition.filters import FILTER_DIMENSIONS, build_filter_index, use_filter_index, filter_mask
+from emp_attrition.figure_cache import (cached_figure, configure_figure_cache, send_cached_json, set_dataset_version, shared_figure_cache,
+                                        tenant_figure_cache)
+from emp_attrition.http_cache import prepare_response, send_prepared
+from emp_attrition.metrics import instrument_callback, phase
+from emp_attrition.profiler import track_callback
+from emp_attrition.tenants import (TENANT_CONFIG, TENANT_HEADER, TENANT_PARAM, multi_tenant, required_tenant, tenant_path, check_tenant,
+                                   cached_tenant, store_tenant, tenant_lock)
 import dash_bootstrap_components as dbc
 
 # for more complicated dashboard, can define dccs before the layout
@@ -22,537 +36,394 @@ import dash_bootstrap_components as dbc
 
 ############################## READ & CLEAN DATA ############################
 
-# Read in dataset as a dataframe
-df = pd.read_csv('ibm_emp_att_dataset.csv')
-# print(df.head())
-
-# Make copy of the dataframe - to maintain original
-# Because will change Yes/No values in Attrition column to numerical values
-ea_rev = df.copy(deep = True)
-# ea_rev.head()
-
-# Remove EmployeeCount and StandardHours columns for heatmap
-# Otherwise these produce blank spaces within heatmap b/c these columns have the exact same value in each row
-ea_rev.drop(['EmployeeCount', 'StandardHours'], axis=1, inplace=True)
-# ea_rev.head()
+# Dashboard settings - filled in from the Flask config by init_dashboard
+# DATASET_CHUNKSIZE - rows per chunk when streaming the CSV straight into the aggregates (0 = read the whole dataset)
+# DATASET_RELOAD_INTERVAL - seconds between checks for a new export or delta batch (0 = never reload)
+# CROSSFILTER - sidebar selections filter every chart, not just their own (see CROSS-FILTER MODE)
+# CLIENTSIDE - checklist charts are filtered in the browser, with no callback request to the server (see CLIENTSIDE MODE)
+DASHBOARD_CONFIG = {'DATASET_PATH': DATASET_PATH, 'DATASET_CHUNKSIZE': 0, 'DATASET_RELOAD_INTERVAL': 0, 'CROSSFILTER': False, 'CLIENTSIDE': False,
+                    'LAYOUT_PATH': None, 'LOGGER': None, 'SERVER': None}
 
-# Change Attrition values from text to numerical
-ea_rev["Attrition"]= ea_rev["Attrition"].replace("Yes", 1)
-ea_rev["Attrition"]= ea_rev["Attrition"].replace("No", 0)
-# ea_rev.head()
-
-# This syntax to change values works in matplotlib, but doesn't work in plotly:
-# ea_rev.Attrition.replace({"Yes":1, "No": 0}, inplace=True)
+# Loaded data & static charts - None until the dashboard is first used (or warmed up), then one read-only snapshot per process
+# A new version is built aside & replaces the whole snapshot in one assignment (see swap_dashboard) - a request reads it once
+# (see get_dashboard), so its rows, filter index, aggregates & figure cache version always belong together
+DASHBOARD = None
+DASHBOARD_LOCK = threading.Lock()
 
-# Export to csv to confirm above changes (drops and value changes)
-# Works!!
-# ea_rev.to_csv('csv_test.csv')
+# Process the dataset watcher thread runs in - a thread started before gunicorn forks the workers doesn't run in them
+WATCHER = {'pid': None}
 
-# Make another copy of data frame to update BusinessTravel values to numeric
-df_trvl = ea_rev.copy(deep = True)
 
-# Change BusinessTravel values from text to numerical - for calcs and to get into the Heatmap
-df_trvl["BusinessTravel"]= df_trvl["BusinessTravel"].replace("Non-Travel", 1)
-df_trvl["BusinessTravel"]= df_trvl["BusinessTravel"].replace("Travel_Frequently", 2)
-df_trvl["BusinessTravel"]= df_trvl["BusinessTravel"].replace("Travel_Rarely", 3)
+# A worker forked (gunicorn --preload) while another thread of the master held the lock would never see it released - give it a new one
+def reset_dashboard_lock():
+    global DASHBOARD_LOCK
+    DASHBOARD_LOCK = threading.Lock()
 
-# Confirming Changes - Works!!
-# df_trvl.to_csv('df_trvl.csv')
 
-# Copy dataframe to shorten HR & R&D Dept values for charting purposes
-dept_shorten = df_trvl.copy(deep = True)
+os.register_at_fork(after_in_child=reset_dashboard_lock)
 
+# The Satisfaction chart's dropdown picks one of these columns - counts are precomputed with the cube
+register_pivot('satisfaction', {display: column for column, display in SATISFACTION_COLUMNS.items()})
 
-# Shorten HR & R&D Dept values
-dept_shorten["Department"]= dept_shorten["Department"].replace("Human Resources", "HR")
-dept_shorten["Department"]= dept_shorten["Department"].replace("Research & Development", "R & D")
 
-# Confirm - works!
-# dept_shorten.to_csv('dept_shorten.csv')
+# Read & prepare the data, then build the static charts - the configured dataset, or a tenant's (see MULTI-TENANT MODE)
+# Nothing is published here - the new version is swapped in by swap_dashboard
+def load_dashboard(dataset_path=None, tenant=None):
+    dataset_path = dataset_path or DASHBOARD_CONFIG['DATASET_PATH']
+    chunksize = DASHBOARD_CONFIG['DATASET_CHUNKSIZE']
 
+    # Tenants are always streamed - only their aggregates are kept, so hundreds of them fit in one process
+    if tenant is not None:
+        chunksize = chunksize or TENANT_CHUNKSIZE
 
-# Change Overtime values from text to numerical
-dept_shorten["OverTime"]= dept_shorten["OverTime"].replace("Yes", 1)
-dept_shorten["OverTime"]= dept_shorten["OverTime"].replace("No", 0)
-# ea_rev.head()
+    # Streaming mode - for exports too large to hold in memory
+    # The CSV is read a chunk at a time & each chunk is folded into the cube & pivots, so the raw rows are never kept
+    # Every chart & callback reads from the aggregates, so nothing else needs the rows (the filter index is skipped)
+    if chunksize:
+        emp_df = None
+        aggregates = build_aggregates_from_chunks(read_dataset_chunks(dataset_path, chunksize))
 
+    else:
+        # Read in dataset once as the single canonical dataframe - memory-mapped from its columnar cache when converted (see ingest.py)
+        # Text columns are category dtype, Yes/No columns (Attrition, OverTime) are 1/0 & integers are narrowed
+        # Each chart builds the labeled view it needs from emp_df (see data.py) instead of keeping a full copy
+        emp_df = read_dataset(dataset_path)
+
+        # Count every chart dimension & satisfaction rating against Attrition once - the charts read their counts from these
+        aggregates = build_aggregates(emp_df)
+
+    dashboard = {'path': dataset_path, 'tenant': tenant, 'source_version': source_version(dataset_path), 'deltas': [], 'emp_df': emp_df,
+                 'aggregates': aggregates}
+
+    # Delta batches already waiting next to the export are part of this version too
+    return apply_deltas(dashboard, list_deltas(dataset_path))
+
+
+# Fold delta batches (hires & terminations, see data.read_delta) into a loaded dashboard
+# Only the delta rows are counted - the aggregates are updated, not rebuilt from the whole dataset
+def apply_deltas(dashboard, names):
+    folder = delta_dir(dashboard['path'])
+    aggregates = dashboard['aggregates']
+    emp_df = dashboard['emp_df']
+    for name in names:
+        added, removed = read_delta(os.path.join(folder, name))
+        aggregates = update_aggregates(aggregates, added, removed)
+        if emp_df is not None:
+            emp_df = merge_rows(emp_df, added, removed)
+
+    dashboard = dict(dashboard, deltas=dashboard['deltas'] + list(names), emp_df=emp_df, aggregates=aggregates)
+
+    # Index the rows behind each checklist value once - callbacks combine these bitmaps instead of filtering with isin
+    dashboard['filter_index'] = build_filter_index(emp_df) if emp_df is not None else None
+
+    # Version of the data the charts are built from - the export plus the number of delta batches applied to it
+    # A tenant's version starts with the tenant, so two units with the same export never share a layout ETag
+    dashboard['version'] = dashboard['source_version'] + (f'+{len(dashboard["deltas"])}' if dashboard['deltas'] else '')
+    if dashboard['tenant'] is not None:
+        dashboard['version'] = f'{dashboard["tenant"]}@{dashboard["version"]}'
+
+    dashboard.update(build_static_charts(aggregates))
+
+    # Clientside mode - the checklist charts go out with the layout, built for every category (see build_clientside_figures)
+    if clientside_mode():
+        dashboard['clientside'] = build_clientside_figures(aggregates)
+
+    # Encode the layout (with the static charts in it) once for this version - layout requests send these bytes (see serve_layout_json)
+    dashboard['layout'] = prepare_response(json.dumps(build_layout(dashboard), cls=PlotlyJSONEncoder), dashboard['version'])
+
+    # Callback figures are cached under this version - a tenant's with its dashboard (a new version starts an empty cache,
+    # an evicted tenant takes its cache along), the DATASET_PATH dashboard's in the shared cache
+    if dashboard['tenant'] is not None:
+        dashboard['figure_cache'] = tenant_figure_cache(dashboard['version'], TENANT_CONFIG['FIGURE_CACHE_SIZE'],
+                                                        TENANT_CONFIG['FIGURE_CACHE_SIZE'] * TENANT_CONFIG['CACHE_SIZE'])
+    else:
+        dashboard['figure_cache'] = shared_figure_cache(dashboard['version'])
+    return MappingProxyType(dashboard)
+
+
+# Swap in a new version of the dashboard - one assignment, so a request sees the old snapshot or the new one, never a mix
+# Requests keep being served from the old version until then (no cold start while a new version loads)
+def swap_dashboard(dashboard):
+    global DASHBOARD
+    DASHBOARD = dashboard
+
+    # For code that reads outside a request (benchmarks, python -m emp_attrition.charts) - requests read the snapshot itself
+    publish_aggregates(dashboard['aggregates'])
+    if dashboard['filter_index'] is not None:
+        use_filter_index(dashboard['filter_index'])
+
+    # Drop the figures cached for older versions - their keys can no longer be hit
+    set_dataset_version(dashboard['version'])
 
-# Create income groups for monthly income ranges & populate new column with appropriate grouping
-def make_monthly_income_groups(monthly_income):
-    if 1000 <= monthly_income and 2000 > monthly_income:
-        return '$1,000-$1,999'
-    elif 2000 <= monthly_income and 3000 > monthly_income:
-        return '$2,000-$2,999'
-    elif 3000 <= monthly_income and 4000 > monthly_income:
-        return '$3,000-$3,999'
-    elif 4000 <= monthly_income and 5000 > monthly_income:
-        return '$4,000-$4,999'
-    elif 5000 <= monthly_income and 6000 > monthly_income:
-        return '$5,000-$5,999'
-    elif 6000 <= monthly_income and 7000 > monthly_income:
-        return '$6,000-$6,999'
-    elif 7000 <= monthly_income and 8000 > monthly_income:
-        return '$7,000-$7,999'
-    elif 8000 <= monthly_income and 9000 > monthly_income:
-        return '$8,000-$8,999'
-    elif 9000 <= monthly_income and 10000 > monthly_income:
-        return '$9,000-$9,999'
-    elif 10000 <= monthly_income:
-        return '$10,000 or more'
-
-# Create a new column called monthly_income_group
-df_trvl['monthly_income_group'] = df_trvl['MonthlyIncome'].apply(make_monthly_income_groups)
-
-# Check new column groupings
-# df_trvl.to_csv('checking_inc_groups.csv')
-
-
-
-# Make new copy of data frame to create commute groups
-commute_df = ea_rev.copy(deep = True)
-
-# Create Commute Groups
-def make_commute_groups(distance):
-    if 1 <= distance and 5 > distance:
-        return '1 to 5 miles'
-    elif 5 <= distance and 10 > distance:
-        return '6 to 10 miles'
-    elif 10 <= distance and 20 > distance:
-        return '11 to 20 miles'
-    elif 20 <= distance:
-        return 'Over 20 miles'
-
-# Create a new column called CommuteGroup
-commute_df['CommuteGroup'] = commute_df['DistanceFromHome'].apply(make_commute_groups)
-
-# Confirm change
-# commute_df[['Attrition','CommuteGroup']].head()
-
-# Check count of new groupings
-# commute_group_count = commute_df.groupby(['CommuteGroup','Attrition']).count()
-# commute_df.groupby('CommuteGroup', as_index = False).count()
-
-
-# Make another copy of data frame to update Education values from # to Text
-df_educ = df_trvl.copy(deep = True)
-
-# Change Education values from numerical to text
-df_educ["Education"]= df_educ["Education"].replace(1, "Below College")
-df_educ["Education"]= df_educ["Education"].replace(2, "College")
-df_educ["Education"]= df_educ["Education"].replace(3, "Bachelor")
-df_educ["Education"]= df_educ["Education"].replace(4, "Master")
-df_educ["Education"]= df_educ["Education"].replace(5, "Doctor")
-
-
-# Confirm above value changes - Works!!
-# df_educ.to_csv('csv_test.csv')
-
-
-# Make another copy of data frame to Rename Satisfaction Columns
-df_satis_rev = df.copy(deep = True)
-
-# Rename Satisfaction Columns-adding a space between words to improve readability in Satisfactoin chart display
-df_satis_rev.rename(columns={"EnvironmentSatisfaction": "Environment Satisfaction", "JobInvolvement": "Job Involvement", "JobSatisfaction": "Job Satisfaction", "RelationshipSatisfaction": "Relationship Satisfaction"}, inplace=True)
-
-# Confirm above changes - Works!!
-# df_satis_rev.to_csv('df_satis_rev.csv')
-
-
-# Make a copy of data frame to update PerformanceRating values from # to Text
-perf_rating_df = df_trvl.copy(deep = True)
-
-# Change Education values from numerical to text
-perf_rating_df["PerformanceRating"]= perf_rating_df["PerformanceRating"].replace(1, "Low")
-perf_rating_df["PerformanceRating"]= perf_rating_df["PerformanceRating"].replace(2, "Good")
-perf_rating_df["PerformanceRating"]= perf_rating_df["PerformanceRating"].replace(3, "Excellent")
-perf_rating_df["PerformanceRating"]= perf_rating_df["PerformanceRating"].replace(4, "Outstanding")
 
+# Return the loaded data & static charts - the first call loads them, any other callers wait for it to finish
+# In multi-tenant mode a request gets its tenant's (see tenant_dashboard) - the DATASET_PATH dashboard is only for single-dataset mode
+# Within a request the snapshot is read once - later calls get the same one, even if a new version is swapped in meanwhile
+def get_dashboard():
+    if flask.has_request_context() and 'dashboard' in flask.g:
+        return flask.g.dashboard
+
+    tenant = required_tenant()
+    if tenant is not None:
+        return use_dashboard(tenant_dashboard(tenant))
+
+    if DASHBOARD is None:
+        with DASHBOARD_LOCK:
+            if DASHBOARD is None:
+                swap_dashboard(load_dashboard())
+    # The watcher starts on a request, so never in the gunicorn master (eager warmup with --preload) - each worker starts its own
+    if DASHBOARD_CONFIG['DATASET_RELOAD_INTERVAL'] and WATCHER['pid'] != os.getpid() and flask.has_request_context():
+        start_watcher()
+    return use_dashboard(DASHBOARD)
+
+
+# Point the request's chart reads at one snapshot - its aggregates (see aggregates.current_aggregates) & figure cache (see figure_cache.current_cache)
+def use_dashboard(dashboard):
+    if flask.has_request_context():
+        flask.g.dashboard = dashboard
+        flask.g.aggregates = dashboard['aggregates']
+        flask.g.figure_cache = dashboard['figure_cache']
+    return dashboard
+
+
+############################### DATASET WATCHER ###############################
+
+# New version of a loaded dashboard if there's a new export or new delta batches - None if it's up to date
+# A replaced export is loaded in full, new delta batches are applied to the current version
+def updated_dashboard(dashboard):
+    dataset_path = dashboard['path']
+    if source_version(dataset_path) != dashboard['source_version']:
+        return load_dashboard(dataset_path, dashboard['tenant'])
+
+    new_deltas = [name for name in list_deltas(dataset_path) if name not in dashboard['deltas']]
+    if new_deltas:
+        return apply_deltas(dict(dashboard), new_deltas)
+    return None
+
+
+# Check for a new version of the dataset & swap it in - returns True if the dashboard changed
+# The new version is built without the lock (it can take a while) - the lock is only held for the swap
+def refresh_dashboard():
+    current = DASHBOARD
+    if current is None:
+        return False  # Not loaded yet - the first use reads the latest files anyway
+
+    dashboard = updated_dashboard(current)
+    if dashboard is None:
+        return False
+    with DASHBOARD_LOCK:
+        if DASHBOARD is not current:
+            return False  # Swapped meanwhile - the next check compares against that version
+        swap_dashboard(dashboard)
+    return True
+
+
+# Watcher loop - one daemon thread per process
+def watch_dataset(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            refresh_dashboard()
+        except Exception:
+            # Keep serving the current version - i.e. the export was still being copied in, the next check picks it up
+            DASHBOARD_CONFIG['LOGGER'].exception('Dataset refresh failed')
+
+
+def start_watcher():
+    with DASHBOARD_LOCK:
+        if WATCHER['pid'] == os.getpid():
+            return
+        WATCHER['pid'] = os.getpid()
+    threading.Thread(target=watch_dataset, args=(DASHBOARD_CONFIG['DATASET_RELOAD_INTERVAL'],), daemon=True).start()
+
+
+############################### MULTI-TENANT MODE #############################
+
+# Optional mode (TENANTS_PATH, see tenants.py) - each business unit's pages & callbacks are served from its own dataset
+# A tenant's dashboard (aggregates, layout & figure cache) is loaded on its first request & kept while it's among the
+# TENANT_CACHE_SIZE most recently used tenants - requests with no tenant get a 404 (see tenants.required_tenant)
+# Tenants keep no rows (see load_dashboard), so like streaming mode they show Pearson & no cross-filtering
+
+# Rows per chunk a tenant's export is streamed in when DATASET_CHUNKSIZE isn't set
+TENANT_CHUNKSIZE = 100000
+
+
+# True if a loaded tenant is still for the registry's file & was checked for new data within DATASET_RELOAD_INTERVAL
+def tenant_is_current(dashboard, dataset_path):
+    interval = DASHBOARD_CONFIG['DATASET_RELOAD_INTERVAL']
+    return (dashboard is not None and dashboard['path'] == dataset_path
+            and not (interval and time.time() - dashboard['checked'] > interval))
+
+
+# Loaded dashboard of a tenant - read on first use & after eviction, checked for a new export or delta batches on use
+# There's no watcher thread per tenant - a cold tenant costs nothing until its next request
+def tenant_dashboard(tenant):
+    dataset_path = tenant_path(tenant)
+    dashboard = cached_tenant(tenant)
+    if tenant_is_current(dashboard, dataset_path):
+        return dashboard
+
+    with tenant_lock(tenant):
+        dashboard = cached_tenant(tenant)  # Another request may have loaded it while this one waited
+        if tenant_is_current(dashboard, dataset_path):
+            return dashboard
+
+        if dashboard is None or dashboard['path'] != dataset_path:
+            dashboard = load_dashboard(dataset_path, tenant)
+        else:
+            try:
+                dashboard = updated_dashboard(dashboard) or dashboard
+            except Exception:
+                # Keep serving the current version - i.e. the export was still being copied in, the next check picks it up
+                DASHBOARD_CONFIG['LOGGER'].exception('Dataset refresh failed for tenant %s', tenant)
 
-# Make a copy of data frame to update WorkLifeBalance values from # to Text
-work_balance_df = df_trvl.copy(deep = True)
+        dashboard = MappingProxyType(dict(dashboard, checked=time.time()))
+        store_tenant(tenant, dashboard)
+    return dashboard
 
-# Change Education values from numerical to text
-work_balance_df["WorkLifeBalance"]= work_balance_df["WorkLifeBalance"].replace(1, "Bad")
-work_balance_df["WorkLifeBalance"]= work_balance_df["WorkLifeBalance"].replace(2, "Good")
-work_balance_df["WorkLifeBalance"]= work_balance_df["WorkLifeBalance"].replace(3, "Better")
-work_balance_df["WorkLifeBalance"]= work_balance_df["WorkLifeBalance"].replace(4, "Best")
 
 
 ########### CREATE CHART VARIABLES & STATIC (NON-CALLBACK) CHARTS ############
 
-### Start of Calc for Card 2 in Top Row (Overall Percent of Attrition) ###
+# Build the KPI card values & the charts that don't use callbacks - called for each version of the dataset
+# Everything here is read from the aggregates passed in (not yet published), so it works the same whether or not the rows were kept
+def build_static_charts(aggregates):
 
-# Calculate overall attrition percentage rate
-agg_att_avg = df_trvl["Attrition"].mean()
+    # Employee & leaver totals, avg years at company - from the cube
+    totals = attrition_totals(aggregates)
 
-# Add formatting as % with 0 decimals
-percentage_attrition = "{:.0%}".format(agg_att_avg)
+    ### Start of Calc for Card 2 in Top Row (Overall Percent of Attrition) ###
 
-### End of Calc for Card 2 in Top Row (Overall Percent of Attrition) ###
+    # Calculate overall attrition percentage rate
+    agg_att_avg = totals['leavers'] / totals['employees']
 
+    # Add formatting as % with 0 decimals
+    percentage_attrition = "{:.0%}".format(agg_att_avg)
 
-### Start of Calc for Card 3 in Top Row (Avg Length of Service) ###
+    ### End of Calc for Card 2 in Top Row (Overall Percent of Attrition) ###
 
-# Calculate avg length of services in years
-avg_yrs_svc = df_trvl["YearsAtCompany"].describe()['mean']
 
-# Format to remove decimal
-avg_yrs_format = "{:.0f}".format(avg_yrs_svc)
+    ### Start of Calc for Card 3 in Top Row (Avg Length of Service) ###
 
-### End of Calc for Card 3 in Top Row (Avg Length of Service) ###
+    # Calculate avg length of services in years
+    avg_yrs_svc = totals['avg_years_at_company']
 
+    # Format to remove decimal
+    avg_yrs_format = "{:.0f}".format(avg_yrs_svc)
 
+    ### End of Calc for Card 3 in Top Row (Avg Length of Service) ###
 
-### Start of Monthly Income vs. Attrition Line Chart ###
-# Not using callbacks for this chart
 
-# Count Monthly Income & set to new column
-inc_attrition=df.groupby(['MonthlyIncome','Attrition']).apply(lambda x:x['MonthlyIncome'].count()).reset_index(name='MoIncomeCounts')
 
-# Round Monthly Income Rates
-inc_attrition['MonthlyIncome']=round(inc_attrition['MonthlyIncome'],-3)
+    ### Start of Monthly Income vs. Attrition Line Chart ###
+    # Not using callbacks for this chart
+    # Layout & footnote of every chart come from its spec in charts.py
 
-# Count Monthly Income again based on rounding and update MoIncomeCounts
-inc_attrition=inc_attrition.groupby(['MonthlyIncome','Attrition']).apply(lambda x:x['MonthlyIncome'].count()).reset_index(name='MoIncomeCounts')
+    # Count Monthly Income (read from the attrition cube) & set to new column
+    inc_attrition=chart_rows('fig_income1a', aggregates=aggregates)
 
-# Populate Line Chart Based on Rounded Income & Counts of those values
-fig_income1a=px.line(inc_attrition,x='MonthlyIncome',y='MoIncomeCounts',color='Attrition',title='Monthly Income vs. Attrition')
+    # Round Monthly Income Rates
+    inc_attrition['MonthlyIncome']=round(inc_attrition['MonthlyIncome'],-3)
 
-fig_income1a.update_layout(
-transition_duration=500,
-# margin=dict(l=20, r=20, t=70, b=90),
-paper_bgcolor="LightSteelBlue",
-# font=dict(size=12),
-font_color="black",
-title_font_color="black",
-# title_font=dict(size=16),
-legend_title_font_color="black",
-legend_title_text="Attrition",
-title_x=0.5, #centers the chart title
-xaxis_title="Monthly Income",
-yaxis_title="Count",
-height=375,
-)
+    # Count Monthly Income again based on rounding and update MoIncomeCounts
+    inc_attrition=inc_attrition.groupby(['MonthlyIncome','Attrition']).size().reset_index(name='MoIncomeCounts')
 
-# Footnote/caption for chart
-fig_income1a_note = 'The highest rate of attrition based on monthly income is<br>among employees earning less than $5k per month.'
-
-fig_income1a.add_annotation(
-    showarrow=False,
-    text=fig_income1a_note,
-    font=dict(size=9), 
-    xref='paper',
-    x=0.5,
-    yref='paper',
-    y=-0.40,
-    align="center",
-    )
+    # Populate Line Chart Based on Rounded Income & Counts of those values
+    fig_income1a=build_figure('fig_income1a', inc_attrition)
 
-### End of Monthly Income vs. Attrition Line Chart ###
+    ### End of Monthly Income vs. Attrition Line Chart ###
 
 
-### Start of Salary Increase vs. Attrition Line Chart ###
-# Not using callbacks for this chart
+    ### Start of Salary Increase vs. Attrition Line Chart ###
+    # Not using callbacks for this chart
 
-# Group by PercentSalaryHike and count the values
-df_percent_salary_increase=df.groupby(['PercentSalaryHike','Attrition']).apply(lambda x:x['PercentSalaryHike'].count()).reset_index(name='Count')
+    # Use the count of PercentSalaryHike & Attrition values (read from the attrition cube) to populate the line chart
+    fig_percent_salary_increase=build_figure('fig_percent_salary_increase', chart_rows('fig_percent_salary_increase', aggregates=aggregates))
 
-# Use the count of PercentSalaryHike & Attrition values to populate the line chart
-fig_percent_salary_increase=px.line(df_percent_salary_increase,x='PercentSalaryHike',y='Count',color='Attrition',title='Percent Salary Increase vs. Attrition')
+    ### End of Percent Salary Increase vs. Attrition Line Chart ###
 
-fig_percent_salary_increase.update_layout(
-transition_duration=500,
-# margin=dict(l=20, r=20, t=70, b=90),
-paper_bgcolor="LightSteelBlue",
-# font=dict(size=12),
-font_color="black",
-title_font_color="black",
-# title_font=dict(size=16),
-legend_title_font_color="black",
-legend_title_text="Attrition",
-title_x=0.5, #centers the chart title
-xaxis_title="Percent Salary Increase",
-yaxis_title="Count", 
-height=375,
-)
 
-# Add footnote/caption to chart
-fig_percent_salary_increase_note = "Higher attrition rates are associated with lower percent salary increases."
-
-fig_percent_salary_increase.add_annotation(
-    showarrow=False,
-    text=fig_percent_salary_increase_note,
-    font=dict(size=9), 
-    xref='paper',
-    x=0.5,
-    yref='paper',
-    y=-0.35,
-    align="center",
-    )
+    ### Start of Stock Options vs. Attrition Line Chart ###
+    # Not using callbacks for this chart
 
-### End of Percent Salary Increase vs. Attrition Line Chart ###
-
-
-### Start of Stock Options vs. Attrition Line Chart ###
-# Not using callbacks for this chart
-
-# Group by StockOptionLevel and count the values
-df_stock_options=df.groupby(['StockOptionLevel','Attrition']).apply(lambda x:x['StockOptionLevel'].count()).reset_index(name='Count')
-
-# Use the count of StockOptionLevel & Attrition values to populate the line chart
-fig_stock_options=px.line(df_stock_options,x='StockOptionLevel',y='Count',color='Attrition',title='Stock Option Level vs. Attrition')
-
-fig_stock_options.update_layout(
-transition_duration=500,
-# margin=dict(l=20, r=20, t=70, b=90),
-paper_bgcolor="LightSteelBlue",
-# font=dict(size=12),
-font_color="black",
-title_font_color="black",
-# title_font=dict(size=16),
-legend_title_font_color="black",
-legend_title_text="Attrition",
-title_x=0.5, #centers the chart title
-xaxis_title="Stock Option Level",
-yaxis_title="Count",
-# The xaxis = dict below sets the x-axis tick marks to start at 0 and increment by 1 in whole numbers
-xaxis = dict(
-    tickmode = 'linear',
-    tick0 = 0,
-    dtick = 1
-    ),
-height=375,
-)
+    # Use the count of StockOptionLevel & Attrition values (read from the attrition cube) to populate the line chart
+    fig_stock_options=build_figure('fig_stock_options', chart_rows('fig_stock_options', aggregates=aggregates))
 
-# Add footnote/caption to chart
-fig_stock_options_note = "Higher attrition rates are associated with lower stock option levels."
-
-fig_stock_options.add_annotation(
-    showarrow=False,
-    text=fig_stock_options_note,
-    font=dict(size=9), 
-    xref='paper',
-    x=0.5,
-    yref='paper',
-    y=-0.35,
-    align="center",
-    )
+    ### End of Stock Options vs. Attrition Line Chart ###
 
-### End of Stock Options vs. Attrition Line Chart ###
 
+    ### Years Since Last Promotion vs. Attrition Line Chart Start ###
+    # Not using callbacks on this chart
 
-### Years Since Last Promotion vs. Attrition Line Chart Start ###
-# Not using callbacks on this chart
+    # Use the counts of YearsSinceLastPromotion & Attrition values (read from the attrition cube) to populate the line chart
+    fig_promotion=build_figure('fig_promotion', chart_rows('fig_promotion', aggregates=aggregates))
 
-# Group by YearsSinceLastPromotion & Attrition and count the values of YearsSinceLastPromotion
-df_promotion=df.groupby(['YearsSinceLastPromotion','Attrition']).apply(lambda x:x['YearsSinceLastPromotion'].count()).reset_index(name='Count')
+    ### Years Since Last Promotion vs. Attrition Line Chart End ###
 
-# Use the counts of YearsSinceLastPromotion & Attrition values to populate the line chart
-fig_promotion=px.line(df_promotion,x='YearsSinceLastPromotion',y='Count',color='Attrition',title='Years Since Last Promotion vs. Attrition')
 
-fig_promotion.update_layout(
-transition_duration=500,
-# margin=dict(l=20, r=20, t=70, b=90),
-paper_bgcolor="LightSteelBlue",
-# font=dict(size=12),
-font_color="black",
-title_font_color="black",
-# title_font=dict(size=16),
-legend_title_font_color="black",
-legend_title_text="Attrition",
-title_x=0.5, #centers the chart title
-xaxis_title="Years Since Last Promotion",
-yaxis_title="Count",
-height=375,
-)
+    ### Start of Years at Company vs. Attrition Line Chart ###
+    # Not using callbacks with this chart
 
-fig_promotion_note = "There is increased attrition among employees who have not<br>received a promotion in the last 3 to 7 years."
-
-fig_promotion.add_annotation(
-    showarrow=False,
-    text=fig_promotion_note,
-    font=dict(size=9), 
-    xref='paper',
-    x=0.5,
-    yref='paper',
-    y=-0.40,
-    align="center",
-    )
-### Years Since Last Promotion vs. Attrition Line Chart End ###
+    # Use the count of YearsAtCompany & Attrition values (read from the attrition cube) to populate the line chart
+    fig_yrs_at_co=build_figure('fig_yrs_at_co', chart_rows('fig_yrs_at_co', aggregates=aggregates))
 
+    ### Years at Company vs. Attrition Line Chart End ###
 
 
-### Start of Years at Company vs. Attrition Line Chart ###
-# Not using callbacks with this chart
+    ### Years in Current Role vs. Attrition Line Chart Start ###
+    # Not using callbacks with this chart
 
-# Group by YearsAtCompany and count the values
-df_yrs_at_co=df.groupby(['YearsAtCompany','Attrition']).apply(lambda x:x['YearsAtCompany'].count()).reset_index(name='Count')
+    # Use the count of YearsInCurrentRole & Attrition values (read from the attrition cube) to populate the line chart
+    fig_current_role=build_figure('fig_current_role', chart_rows('fig_current_role', aggregates=aggregates))
 
-# Use the count of YearsAtCompany & Attrition values to populate the line chart
-fig_yrs_at_co=px.line(df_yrs_at_co,x='YearsAtCompany',y='Count',color='Attrition',title='Years at Company vs. Attrition')
+    ### Years in Current Role vs. Attrition Line Chart End ###
 
-fig_yrs_at_co.update_layout(
-transition_duration=500,
-# margin=dict(l=20, r=20, t=70, b=90),
-paper_bgcolor="LightSteelBlue",
-# font=dict(size=12),
-font_color="black",
-title_font_color="black",
-# title_font=dict(size=16),
-legend_title_font_color="black",
-legend_title_text="Attrition",
-title_x=0.5, #centers the chart title
-xaxis_title="Years at Company",
-yaxis_title="Count",
-height=375,
-)
 
-# Add footnote/caption to chart
-fig_yrs_at_co_note = "Evaluating against years at the company, the highest rate of attrition occurs<br>within the first four years of employment."
-
-fig_yrs_at_co.add_annotation(
-    showarrow=False,
-    text=fig_yrs_at_co_note,
-    font=dict(size=9), 
-    xref='paper',
-    x=0.5,
-    yref='paper',
-    y=-0.40,
-    align="center",
-    )
+    ### Start of Stacked Bar - Gender & Education Level ###
+    # Not using callbacks on this chart
 
-### Years at Company vs. Attrition Line Chart End ###
+    # Avg rate of attrition for each Education level & Gender - one row per bar, Education values changed from numerical to text
+    fig_gender_ed_level=build_figure('fig_gender_ed_level', chart_rows('fig_gender_ed_level', aggregates=aggregates))
 
+    ### End of Stacked Bar - Gender & Education Level ###
 
-### Years in Current Role vs. Attrition Line Chart Start ###
-# Not using callbacks with this chart
 
-# Group by YearsInCurrentRole and count the values
-df_current_role=df.groupby(['YearsInCurrentRole','Attrition']).apply(lambda x:x['YearsInCurrentRole'].count()).reset_index(name='Count')
+    ### Start of Stacked Bar - Gender & Education Field ###
+    fig_gender_ed_field=build_figure('fig_gender_ed_field', chart_rows('fig_gender_ed_field', aggregates=aggregates))
 
-# Use the count of YearsInCurrentRole & Attrition values to populate the line chart
-fig_current_role=px.line(df_current_role,x='YearsInCurrentRole',y='Count',color='Attrition',title='Years in Current Role vs. Attrition')
+    ### End of Stacked Bar - Gender & Education Level ###
 
-fig_current_role.update_layout(
-transition_duration=500,
-# margin=dict(l=20, r=20, t=70, b=90),
-paper_bgcolor="LightSteelBlue",
-# font=dict(size=12),
-font_color="black",
-title_font_color="black",
-# title_font=dict(size=16),
-legend_title_font_color="black",
-legend_title_text="Attrition",
-title_x=0.5, #centers the chart title
-xaxis_title="Years in Current Role",
-yaxis_title="Count",
-height=375,
-)
 
-fig_current_role_note = f'Evaluating against yrs in current role, the highest rate of attrition occurs in<br>employees working for the co. less than 1 yr or around 2 yrs.'
-
-fig_current_role.add_annotation(
-    showarrow=False,
-    text=fig_current_role_note,
-    font=dict(size=9), 
-    xref='paper',
-    x=0.5,
-    yref='paper',
-    y=-0.40,
-    align="center",
-    )
-### Years in Current Role vs. Attrition Line Chart End ###
-
-
-### Start of Stacked Bar - Gender & Education Level ###
-# Not using callbacks on this chart
-
-fig_gender_ed_level=px.histogram(df_educ,x='Education',y='Attrition',color='Gender',histfunc="avg", title='Average Rate of Attrition by Gender and Education Level',category_orders={"Education": ["Below College", "College", "Bachelor", "Master", "Doctor"]})
-
-fig_gender_ed_level.update_layout(
-transition_duration=500,
-# margin=dict(l=20, r=20, t=70, b=90),
-paper_bgcolor="LightSteelBlue",
-# font=dict(size=12),
-font_color="black",
-title_font_color="black",
-# title_font=dict(size=16),
-legend_title_font_color="black",
-title_x=0.5, #centers the chart title
-xaxis_title="Education Level",
-yaxis_title="Avg Rate of Attrition",
-yaxis_tickformat = '%',
-height=450,
-)
+    ### Start of Contents for Card 1 in Row 1 ###
+    # Total number of employees
+    card_text_1 = totals['employees']
 
 
-fig_gender_ed_level_note = "Comparing rate of attrition against gender and level of education, the highest rate of attrition among women are those with an education level below college (18%). The highest rate of attrition among men are those with education levels below college & bachelor (both 18%)."
 
-fig_gender_ed_level.add_annotation(
-    showarrow=False,
-    text=fig_gender_ed_level_note,
-    font=dict(size=9), 
-    xref='paper',
-    x=0.5,
-    yref='paper',
-    y=-0.25,
-    align="center",
-    )
-
-### End of Stacked Bar - Gender & Education Level ###
-
-
-### Start of Stacked Bar - Gender & Education Field ###
-fig_gender_ed_field=px.histogram(df_trvl,x='EducationField',y='Attrition',color='Gender',histfunc="avg", title='Average Rate of Attrition by Gender and Field of Education')
-
-fig_gender_ed_field.update_layout(
-transition_duration=500,
-# margin=dict(l=20, r=20, t=70, b=90),
-paper_bgcolor="LightSteelBlue",
-# font=dict(size=12),
-font_color="black",
-title_font_color="black",
-# title_font=dict(size=16),
-legend_title_font_color="black",
-title_x=0.5, #centers the chart title
-xaxis_title="Field of Education",
-yaxis_title="Avg Rate of Attrition",
-yaxis_tickformat = '%',
-height=450,
-)
-
-
-fig_gender_ed_field_note = "Comparing rate of attrition against gender and field of education, the highest rate of attrition among women are those with education in HR (38%). The highest rate of attrition among men are those with a Technical Degree (28%)."
-
-fig_gender_ed_field.add_annotation(
-    showarrow=False,
-    text=fig_gender_ed_field_note,
-    font=dict(size=9), 
-    xref='paper',
-    x=0.5,
-    yref='paper',
-    y=-0.25,
-    align="center",
-    )
+    # Heatmap to show correlation between all features in the dataset
+    # Useful to determine which features to focus on in model/analysis
+    # As the color becomes darker in either direction, that means that those variables are more highly correlated and should not be paired together in the same model
+    # https://medium.com/@connor.anderson_42477/hot-or-not-heatmaps-and-correlation-matrix-plots-940088fa2806
+    # Not placed in the layout, so not computed - the heatmap is now drawn by the update_heatmap callback from the correlation statistics (see correlation.py)
+    # fig4 = px.imshow(ea_rev.corr(),width=1000, height=1000)
+    # fig4 = px.imshow(heatmap_view(emp_df).corr(),width=1000, height=1000)
+    # fig4 = ff.create_annotated_heatmap(ea_rev)
 
-### End of Stacked Bar - Gender & Education Level ###
+    # fig4 = px.imshow(df.corr())
 
-
-### Start of Contents for Card 1 in Row 1 ###
-# Total number of employees
-card_text_1 = df["EmployeeCount"].sum()
-
-
-
-# Heatmap to show correlation between all features in the dataset
-# Useful to determine which features to focus on in model/analysis
-# As the color becomes darker in either direction, that means that those variables are more highly correlated and should not be paired together in the same model
-# https://medium.com/@connor.anderson_42477/hot-or-not-heatmaps-and-correlation-matrix-plots-940088fa2806
-# fig4 = px.imshow(ea_rev.corr(),width=1000, height=1000)
-fig4 = px.imshow(df_trvl.corr(),width=1000, height=1000)
-# fig4 = ff.create_annotated_heatmap(ea_rev)
-
-# fig4 = px.imshow(df.corr())
+    return {
+        'card_text_1': card_text_1,
+        'percentage_attrition': percentage_attrition,
+        'avg_yrs_format': avg_yrs_format,
+        'fig_income1a': fig_income1a,
+        'fig_percent_salary_increase': fig_percent_salary_increase,
+        'fig_stock_options': fig_stock_options,
+        'fig_promotion': fig_promotion,
+        'fig_yrs_at_co': fig_yrs_at_co,
+        'fig_current_role': fig_current_role,
+        'fig_gender_ed_level': fig_gender_ed_level,
+        'fig_gender_ed_field': fig_gender_ed_field,
+    }
 
 
 ############################## START PAGE LAYOUT ##############################
@@ -844,7 +715,45 @@ controls = dbc.FormGroup(
                 }
             ],
             value='Environment Satisfaction'
-        )]),  
+        )]),
+
+            html.P('Select to update Correlation Heatmap: ', style={
+            'font-size': '11px', 'paddingTop': '2%'
+        }),
+        dbc.Card([dbc.Checklist(
+            id='heatmap-dept-checkbox',
+            style={'font-size': '11px'},
+            options=[{
+                'label': 'HR',
+                'value': 'Human Resources'
+            },
+                {
+                    'label': 'R&D',
+                    'value': 'Research & Development'
+                },
+                {
+                    'label': 'Sales',
+                    'value': 'Sales'
+                }
+            ],
+            value=['Human Resources', 'Research & Development', 'Sales'],
+            inline=True
+        ),
+            dbc.RadioItems(
+            id='heatmap-method',
+            style={'font-size': '11px'},
+            options=[{
+                'label': 'Pearson',
+                'value': 'pearson'
+            },
+                {
+                    'label': 'Spearman (rank)',
+                    'value': 'spearman'
+                }
+            ],
+            value='pearson',
+            inline=True
+        )]),
     ]
 )
 
@@ -864,564 +773,479 @@ sidebar = html.Div(
 ### Sidebar Layout - End ###
 
 
-# First row start - contains four cards
-content_first_row = dbc.Row([
-    dbc.Col(
-        dbc.Card(
-            [
-                dbc.CardBody(
-                    [
-                        html.H5(id='card_title_1', children=['Total Number of Employees:'], className='card-title',
-                                style=CARD_TEXT_STYLE),
-                        html.P(id='card_text_1', children=[df["EmployeeCount"].sum()], style=CARD_INFO_STYLE),
-                    ]
-                )
-            ],
-            style = CARD_STYLE,
-        ),
-        md=4, style={
-            'paddingBottom': '3%'
-        }
-    ),
-    dbc.Col(
-        dbc.Card(
-            [
-
-                dbc.CardBody(
-                    [
-                        html.H5('Overall Percent of Attrition:', className='card-title', style=CARD_TEXT_STYLE),
-                        html.P(percentage_attrition, style=CARD_INFO_STYLE),
-                    ]
-                ),
-            ],
-            style = CARD_STYLE,
+# Layout Dash validates on the first request to any page - the charts are left empty, so nothing is loaded for it
+# The dashboard's own layout requests are answered from the prepared JSON instead (see serve_layout_json)
+def serve_layout():
+    return build_layout({})
 
-        ),
-        md=4, style={
-            'paddingBottom': '3%'
-        }
-    ),
-    # dbc.Col(
-    #     dbc.Card(
-    #         [
-    #             dbc.CardBody(
-    #                 [
-    #                     html.H4('Attrition Within First 2 Years:', className='card-title', style=CARD_TEXT_STYLE),
-    #                     html.P(test_calc, style=CARD_INFO_STYLE),
-    #                 ]
-    #             ),
-    #         ],
-    #         style = CARD_STYLE,
-
-    #     ),
-    #     md=3, style={
-    #         'paddingBottom': '3%'
-    #     }
-    # ),
-    dbc.Col(
-        dbc.Card(
-            [
-                dbc.CardBody(
-                    [
-                        html.H5('Avg Employee Yrs at Company:', className='card-title', style=CARD_TEXT_STYLE),
-                        html.P(avg_yrs_format, style=CARD_INFO_STYLE),
-                    ]
-                ),
-            ],
-            style = CARD_STYLE,
-        ),
-        md=4
-    )
-])
 
-### First Row End ###
+# Send the layout encoded for the current dataset version - a browser that already has it gets a 304
+def serve_layout_json():
+    response = send_prepared(get_dashboard()['layout'])
 
+    # Multi-tenant mode - the same URL answers with each tenant's layout, picked by header or the page it's for
+    if multi_tenant():
+        response.vary.update([TENANT_HEADER, 'Referer'])
+    return response
 
-### Second Row Start - contains three charts ###
-content_second_row = dbc.Row(
-    [
-        # Line Chart - Monthly Income vs. Attrition
+
+# Link to one of the Flask pages - url_for like the templates' links, for the tenant the layout is built for (see tenants.add_tenant)
+# Layouts are also built outside a request (warmup, the watcher), so the URL is built in a request context of its own
+def page_url(endpoint, tenant=None):
+    with DASHBOARD_CONFIG['SERVER'].test_request_context():
+        return flask.url_for(endpoint, **({TENANT_PARAM: tenant} if tenant else {}))
+
+
+# Page content - built once per dataset version (see apply_deltas), from that version's KPI values & static charts
+def build_layout(charts):
+
+    # First row start - contains four cards
+    content_first_row = dbc.Row([
         dbc.Col(
-            dcc.Graph(id='fig_income1a', figure=fig_income1a, style = CARD_STYLE), md=4, style={
-            'paddingBottom': '3%'
-        }
+            dbc.Card(
+                [
+                    dbc.CardBody(
+                        [
+                            html.H5(id='card_title_1', children=['Total Number of Employees:'], className='card-title',
+                                    style=CARD_TEXT_STYLE),
+                            html.P(id='card_text_1', children=[charts.get('card_text_1')], style=CARD_INFO_STYLE),
+                        ]
+                    )
+                ],
+                style = CARD_STYLE,
+            ),
+            md=4, style={
+                'paddingBottom': '3%'
+            }
         ),
-
-        # Line Chart - Percent of Salary Increase vs. Attrition
         dbc.Col(
-            dcc.Graph(id='fig_percent_salary_increase', figure=fig_percent_salary_increase, style = CARD_STYLE), md=4, style={
-            'paddingBottom': '3%'
-        }
+            dbc.Card(
+                [
+
+                    dbc.CardBody(
+                        [
+                            html.H5('Overall Percent of Attrition:', className='card-title', style=CARD_TEXT_STYLE),
+                            html.P(charts.get('percentage_attrition'), style=CARD_INFO_STYLE),
+                        ]
+                    ),
+                ],
+                style = CARD_STYLE,
+
+            ),
+            md=4, style={
+                'paddingBottom': '3%'
+            }
         ),
-
-        # Line Chart - Stock Options vs. Attrition
+        # dbc.Col(
+        #     dbc.Card(
+        #         [
+        #             dbc.CardBody(
+        #                 [
+        #                     html.H4('Attrition Within First 2 Years:', className='card-title', style=CARD_TEXT_STYLE),
+        #                     html.P(test_calc, style=CARD_INFO_STYLE),
+        #                 ]
+        #             ),
+        #         ],
+        #         style = CARD_STYLE,
+
+        #     ),
+        #     md=3, style={
+        #         'paddingBottom': '3%'
+        #     }
+        # ),
         dbc.Col(
-            dcc.Graph(id='fig_stock_options', figure=fig_stock_options, style = CARD_STYLE), md=4, style={
-            'paddingBottom': '3%'
-        }
+            dbc.Card(
+                [
+                    dbc.CardBody(
+                        [
+                            html.H5('Avg Employee Yrs at Company:', className='card-title', style=CARD_TEXT_STYLE),
+                            html.P(charts.get('avg_yrs_format'), style=CARD_INFO_STYLE),
+                        ]
+                    ),
+                ],
+                style = CARD_STYLE,
+            ),
+            md=4
         )
-    ]
-)
+    ])
 
-### Second Row End ###
+    ### First Row End ###
 
 
-### Row 2b Start - contains three charts ###
-content_row_2b = dbc.Row(
-    [
-        # Line Chart of Years in Current Role vs. Attrition
-        dbc.Col(
-            dcc.Graph(id='fig_current_role', figure=fig_current_role, style = CARD_STYLE), md=4, style={
-            'paddingBottom': '3%'
-        }
-        ),
+    ### Second Row Start - contains three charts ###
+    content_second_row = dbc.Row(
+        [
+            # Line Chart - Monthly Income vs. Attrition
+            dbc.Col(
+                dcc.Graph(id='fig_income1a', figure=charts.get('fig_income1a'), style = CARD_STYLE), md=4, style={
+                'paddingBottom': '3%'
+            }
+            ),
 
-        # Line Chart - Years with Current Manager vs. Attrition
-        dbc.Col(
-            dcc.Graph(id='fig_promotion', figure=fig_promotion, style = CARD_STYLE), md=4, style={
-            'paddingBottom': '3%'
-        }
-        ),
+            # Line Chart - Percent of Salary Increase vs. Attrition
+            dbc.Col(
+                dcc.Graph(id='fig_percent_salary_increase', figure=charts.get('fig_percent_salary_increase'), style = CARD_STYLE), md=4, style={
+                'paddingBottom': '3%'
+            }
+            ),
 
-        # Line Chart - Years at Company vs. Attrition
-        dbc.Col(
-            dcc.Graph(id='fig_yrs_at_co', figure=fig_yrs_at_co, style = CARD_STYLE), md=4, style={
-            'paddingBottom': '3%'
-        }
-        )
-    ]
-)
+            # Line Chart - Stock Options vs. Attrition
+            dbc.Col(
+                dcc.Graph(id='fig_stock_options', figure=charts.get('fig_stock_options'), style = CARD_STYLE), md=4, style={
+                'paddingBottom': '3%'
+            }
+            )
+        ]
+    )
 
-### Row 2b End ###
+    ### Second Row End ###
 
 
-### Third Row Start - contains three charts ###
-content_third_row = dbc.Row(
-    [
-        # Horizontal histogram - Avg Rate of Attrition vs. Commute Distance
-        dbc.Col(
-            dcc.Graph(id='commute-chart', style = CARD_STYLE), md=4, style={
-            'paddingBottom': '3%'
-        }
-        ),
+    ### Row 2b Start - contains three charts ###
+    content_row_2b = dbc.Row(
+        [
+            # Line Chart of Years in Current Role vs. Attrition
+            dbc.Col(
+                dcc.Graph(id='fig_current_role', figure=charts.get('fig_current_role'), style = CARD_STYLE), md=4, style={
+                'paddingBottom': '3%'
+            }
+            ),
 
-        # Pie chart - Attrition Percent Breakout by Job Travel 
-        dbc.Col(
-            dcc.Graph(id='employee-attributes-1', style = CARD_STYLE), md=4, style={
-            'paddingBottom': '3%'
-        }
-        ),
+            # Line Chart - Years with Current Manager vs. Attrition
+            dbc.Col(
+                dcc.Graph(id='fig_promotion', figure=charts.get('fig_promotion'), style = CARD_STYLE), md=4, style={
+                'paddingBottom': '3%'
+            }
+            ),
 
-        # Bar chart of avg rate of attrition vs. Overtime status
-        dbc.Col(
-            dcc.Graph(id='ot-percent', style = CARD_STYLE), md=4, style={
-            'paddingBottom': '3%'
-        }
-        )
-    ]
-)
+            # Line Chart - Years at Company vs. Attrition
+            dbc.Col(
+                dcc.Graph(id='fig_yrs_at_co', figure=charts.get('fig_yrs_at_co'), style = CARD_STYLE), md=4, style={
+                'paddingBottom': '3%'
+            }
+            )
+        ]
+    )
 
-### Third Row End ###
+    ### Row 2b End ###
 
 
-### Fourth Row Start - Contains 1 Chart ###
-content_fourth_row = dbc.Row(
-    [
-        # Stacked Bar Chart - Avg Rate of Attrition by Gender & Educ Level
-        dbc.Col(
-            dcc.Graph(id='fig_gender_ed_level', figure=fig_gender_ed_level, style=CARD_STYLE), md=12, style={
-            'paddingBottom': '3%'
-        }
-        )
-        
-    ]
-)
+    ### Third Row Start - contains three charts ###
+    content_third_row = dbc.Row(
+        [
+            # Horizontal histogram - Avg Rate of Attrition vs. Commute Distance
+            dbc.Col(
+                dcc.Graph(id='commute-chart', style = CARD_STYLE), md=4, style={
+                'paddingBottom': '3%'
+            }
+            ),
 
-### Fourth Row End ###
+            # Pie chart - Attrition Percent Breakout by Job Travel 
+            dbc.Col(
+                dcc.Graph(id='employee-attributes-1', style = CARD_STYLE), md=4, style={
+                'paddingBottom': '3%'
+            }
+            ),
 
+            # Bar chart of avg rate of attrition vs. Overtime status
+            dbc.Col(
+                dcc.Graph(id='ot-percent', style = CARD_STYLE), md=4, style={
+                'paddingBottom': '3%'
+            }
+            )
+        ]
+    )
 
-### Row 4a Start - Contains 1 Chart ###
-content_row_4a = dbc.Row(
-    [
-        # Stacked Bar Chart - Avg Rate of Attrition by Gender & Educ Field
-        dbc.Col(
-            dcc.Graph(id='fig_gender_ed_field', figure=fig_gender_ed_field, style=CARD_STYLE), md=12, style={
-            'paddingBottom': '3%', 
-        }
-        )
-        
-    ]
-)
+    ### Third Row End ###
 
-### Row 4a End ###
 
+    ### Fourth Row Start - Contains 1 Chart ###
+    content_fourth_row = dbc.Row(
+        [
+            # Stacked Bar Chart - Avg Rate of Attrition by Gender & Educ Level
+            dbc.Col(
+                dcc.Graph(id='fig_gender_ed_level', figure=charts.get('fig_gender_ed_level'), style=CARD_STYLE), md=12, style={
+                'paddingBottom': '3%'
+            }
+            )
 
-### Fifth Row Start - Contains 1 Chart ###
-content_fifth_row = dbc.Row(
-    [
-        # Horiz. bar chart of Avg Rate of Attrition by Job Role
-        dbc.Col(
-            dcc.Graph(id='chart-jobrole-checkbox', style=CARD_STYLE), md=12, style={
-            'paddingBottom': '3%', 
-        }
-        )
-        
-    ]
-)
+        ]
+    )
 
-### Fifth Row End ###
+    ### Fourth Row End ###
 
 
-### Sixth Row Start - contains 2 Charts ###
-content_sixth_row = dbc.Row(
-    [
-        # Pie Chart of Attrition percentage breakout by Dept
-        dbc.Col(
-            dcc.Graph(id='dept_pct_pie', style = CARD_STYLE), md=6, style={
-            'paddingBottom': '3%',
-        }
-        ),
-        
-        # Horiz. bar chart of avg rate of attrition by Dept
-        dbc.Col(
-            dcc.Graph(id='chart-with-dropdown', style = CARD_STYLE), md=6, style={
-            'paddingBottom': '3%',
-        }
-        
-        )
-    ]
-)
+    ### Row 4a Start - Contains 1 Chart ###
+    content_row_4a = dbc.Row(
+        [
+            # Stacked Bar Chart - Avg Rate of Attrition by Gender & Educ Field
+            dbc.Col(
+                dcc.Graph(id='fig_gender_ed_field', figure=charts.get('fig_gender_ed_field'), style=CARD_STYLE), md=12, style={
+                'paddingBottom': '3%', 
+            }
+            )
 
-### Sixth Row End ###
+        ]
+    )
 
+    ### Row 4a End ###
 
-### Seventh Row Start - contains 2 Charts ###
-content_seventh_row = dbc.Row(
-    [
-        # Pie Chart of Attrition breakout based on WorkLifeBalance
-        dbc.Col(
-            dcc.Graph(id='work_balance_pie', style = CARD_STYLE), md=6, style={
-            'paddingBottom': '3%',
-        }
-        ),
-        
-        # Pie Chart of Attrition breakout based on Performance Rating
-        dbc.Col(
-            dcc.Graph(id='perf_rating_pie', style = CARD_STYLE), md=6, style={
-            'paddingBottom': '3%',
-        }
-        
-        )
-    ]
-)
 
-### Seventh Row End ###
+    ### Fifth Row Start - Contains 1 Chart ###
+    content_fifth_row = dbc.Row(
+        [
+            # Horiz. bar chart of Avg Rate of Attrition by Job Role
+            dbc.Col(
+                dcc.Graph(id='chart-jobrole-checkbox', style=CARD_STYLE), md=12, style={
+                'paddingBottom': '3%', 
+            }
+            )
 
+        ]
+    )
 
-### Bottom Row Start - Contains 1 Chart ###
-content_bottom_row = dbc.Row(
-    [
-        # Horiz. bar chart of Avg Rate of Attrition by Job Role
-        dbc.Col(
-            dcc.Graph(id='satisfaction_area_chart', style=CARD_STYLE), md=12, style={
-            'paddingBottom': '3%', 
-        }
-        )
-        
-    ]
-)
+    ### Fifth Row End ###
 
-### Bottom Row End ###
 
+    ### Sixth Row Start - contains 2 Charts ###
+    content_sixth_row = dbc.Row(
+        [
+            # Pie Chart of Attrition percentage breakout by Dept
+            dbc.Col(
+                dcc.Graph(id='dept_pct_pie', style = CARD_STYLE), md=6, style={
+                'paddingBottom': '3%',
+            }
+            ),
 
-# Summary row start
-content_summary_row = dbc.Row([
-    dbc.Col(
-        dbc.Card(
-            [
-                dbc.CardBody(
-                    [
-                        html.H4(id='summary', children=['Summary:'], className='card-title',
-                                style=CARD_TEXT_STYLE),
-                        html.P(id='summary_text_1', children="Evaluting against pay and benefits, the highest rates of attrition are seen with the lowest monthly income, lowest percent salary increase, and lowest stock option level.", style=SUMMARY_STYLE),
+            # Horiz. bar chart of avg rate of attrition by Dept
+            dbc.Col(
+                dcc.Graph(id='chart-with-dropdown', style = CARD_STYLE), md=6, style={
+                'paddingBottom': '3%',
+            }
 
-                        html.P(id='summary_text_2', children="Evaluating against employee length of service and promotion status, the highest rates of attrition occur among employees working at the company for 4 years or less or have not received a promotion within the last 3 to 7 years.", style=SUMMARY_STYLE),
+            )
+        ]
+    )
 
-                        html.P(id='summary_text_3', children="Longer commute distances are related to higher levels of attrition.", style=SUMMARY_STYLE),
-                        
-                        html.P(id='summary_text_4', children="Roles that require rare travel make up a higher rate of overall attrition than frequent or no travel. Consideration: Is rare travel too much or not enough?", style=SUMMARY_STYLE),
+    ### Sixth Row End ###
 
-                        html.P(id='summary_text_5', children="There is a 31% attrition rate among employees who worked ovetime, compared to 10% attrition for those who did not work overtime.", style=SUMMARY_STYLE),
 
-                        html.P(id='summary_text_6', children="Job role seems to be a factor in attrition, with Sales Representative having the highest rate of attrition at 40%, followed by Laboratory Technician at 24% and HR at 23%.", style=SUMMARY_STYLE),
-                    ]
-                )
-            ],
-            style = CARD_STYLE,
-        ),
-        md=12, style={
-            'paddingBottom': '3%'
-        }
-    ),
+    ### Seventh Row Start - contains 2 Charts ###
+    content_seventh_row = dbc.Row(
+        [
+            # Pie Chart of Attrition breakout based on WorkLifeBalance
+            dbc.Col(
+                dcc.Graph(id='work_balance_pie', style = CARD_STYLE), md=6, style={
+                'paddingBottom': '3%',
+            }
+            ),
+
+            # Pie Chart of Attrition breakout based on Performance Rating
+            dbc.Col(
+                dcc.Graph(id='perf_rating_pie', style = CARD_STYLE), md=6, style={
+                'paddingBottom': '3%',
+            }
 
-])
+            )
+        ]
+    )
 
-### Summary Row End ###
+    ### Seventh Row End ###
 
-# Specify page content to include in app.layout
-content = html.Div(
-    [
-        ### Navbar Start ###
-        dbc.NavbarSimple(
-        children=[
-            dbc.NavItem(dbc.NavLink("Home", href="/", external_link=True)),
-            dbc.NavItem(dbc.NavLink("Dashboard", href="/dashboard", external_link=True)),
-        ],
-        brand="Erin Richard - Employee Attrition Analysis Project",
-        color="light",
-        dark=False,
+
+    ### Bottom Row Start - Contains 1 Chart ###
+    content_bottom_row = dbc.Row(
+        [
+            # Horiz. bar chart of Avg Rate of Attrition by Job Role
+            dbc.Col(
+                dcc.Graph(id='satisfaction_area_chart', style=CARD_STYLE), md=12, style={
+                'paddingBottom': '3%', 
+            }
+            )
+
+        ]
+    )
+
+    ### Bottom Row End ###
+
+
+    ### Heatmap Row Start - Contains 1 Chart ###
+    content_heatmap_row = dbc.Row(
+        [
+            # Correlation heatmap of the numeric columns - filtered by Department in the sidebar
+            dbc.Col(
+                dcc.Graph(id='correlation-heatmap', style=CARD_STYLE), md=12, style={
+                'paddingBottom': '3%',
+            }
+            )
+
+        ]
+    )
+
+    ### Heatmap Row End ###
+
+
+    # Summary row start
+    content_summary_row = dbc.Row([
+        dbc.Col(
+            dbc.Card(
+                [
+                    dbc.CardBody(
+                        [
+                            html.H4(id='summary', children=['Summary:'], className='card-title',
+                                    style=CARD_TEXT_STYLE),
+                            html.P(id='summary_text_1', children="Evaluting against pay and benefits, the highest rates of attrition are seen with the lowest monthly income, lowest percent salary increase, and lowest stock option level.", style=SUMMARY_STYLE),
+
+                            html.P(id='summary_text_2', children="Evaluating against employee length of service and promotion status, the highest rates of attrition occur among employees working at the company for 4 years or less or have not received a promotion within the last 3 to 7 years.", style=SUMMARY_STYLE),
+
+                            html.P(id='summary_text_3', children="Longer commute distances are related to higher levels of attrition.", style=SUMMARY_STYLE),
+
+                            html.P(id='summary_text_4', children="Roles that require rare travel make up a higher rate of overall attrition than frequent or no travel. Consideration: Is rare travel too much or not enough?", style=SUMMARY_STYLE),
+
+                            html.P(id='summary_text_5', children="There is a 31% attrition rate among employees who worked ovetime, compared to 10% attrition for those who did not work overtime.", style=SUMMARY_STYLE),
+
+                            html.P(id='summary_text_6', children="Job role seems to be a factor in attrition, with Sales Representative having the highest rate of attrition at 40%, followed by Laboratory Technician at 24% and HR at 23%.", style=SUMMARY_STYLE),
+                        ]
+                    )
+                ],
+                style = CARD_STYLE,
+            ),
+            md=12, style={
+                'paddingBottom': '3%'
+            }
         ),
 
-        ### Navbar End ###
+    ])
 
-        html.Br(),
-        html.H2('Employee Attrition Analysis', style=TEXT_STYLE),
-        html.Hr(),
-        content_first_row,
-        content_second_row,
-        content_row_2b,
-        content_third_row,
-        content_fourth_row,
-        content_row_4a,
-        content_fifth_row,
-        content_sixth_row,
-        content_seventh_row,
-        content_bottom_row,
-        content_summary_row,
-    ],
-    style=CONTENT_STYLE
-)
+    ### Summary Row End ###
 
+    # Specify page content to include in app.layout
+    content = html.Div(
+        [
+            ### Navbar Start ###
+            dbc.NavbarSimple(
+            children=[
+                dbc.NavItem(dbc.NavLink("Home", href=page_url('home', charts.get('tenant')), external_link=True)),
+                dbc.NavItem(dbc.NavLink("Dashboard", href=page_url('dashboard', charts.get('tenant')), external_link=True)),
+            ],
+            brand="Erin Richard - Employee Attrition Analysis Project",
+            color="light",
+            dark=False,
+            ),
+
+            ### Navbar End ###
+
+            html.Br(),
+            html.H2('Employee Attrition Analysis', style=TEXT_STYLE),
+            html.Hr(),
+            content_first_row,
+            content_second_row,
+            content_row_2b,
+            content_third_row,
+            content_fourth_row,
+            content_row_4a,
+            content_fifth_row,
+            content_sixth_row,
+            content_seventh_row,
+            content_bottom_row,
+            content_heatmap_row,
+            content_summary_row,
+
+            # Clientside mode - each checklist chart built for every category, filtered in the browser (see CLIENTSIDE MODE)
+            *[dcc.Store(id=f'{chart_id}-clientside', data=data) for chart_id, data in charts.get('clientside', {}).items()],
+        ],
+        style=CONTENT_STYLE
+    )
 
-# specifying layout is required in order for Dash to work
-app.layout = html.Div([sidebar, content])
+
+    return html.Div([sidebar, content])
 
 
 
 ################################## CALLBACKS ##################################
 
+# Callbacks are collected here & attached to the Dash app by init_dashboard (the app is made by create_app)
+CALLBACKS = []
+
+def dashboard_callback(output, inputs):
+    def register(func):
+        CALLBACKS.append((output, inputs, func))
+        return func
+    return register
+
+
 ### Businesss Travel Pie Chart Start ###
-@app.callback(
+# Each chart's px arguments, layout & footnote are in its spec in charts.py - the callbacks pick the rows & fill in the title
+@dashboard_callback(
     Output('employee-attributes-1', 'figure'),
     [Input('emp-attributes-checkbox-1', 'value')])
-def update_ee_fig(selected_ee_attribute):
+@cached_figure
+def update_ee_fig(selected_ee_attribute, aggregates=None):
 
     if selected_ee_attribute == []:
         return {}  # Returning this empty {} resolves a callback error that was occurring when all checklist items were unselected
     
     else:
-        attribute1_df = ea_rev[ea_rev["BusinessTravel"].isin(selected_ee_attribute)]
+        # Count of Attrition = "Yes" (or 1) for each selected travel category - one row per slice
+        attribute1_df = chart_rows('employee-attributes-1', selected_ee_attribute, aggregates)
 
         # Set variable to Total Count of Attrition = "Yes" (or 1)
-        attrition_yes_count = sum(ea_rev["Attrition"]==1)
+        attrition_yes_count = attrition_table("BusinessTravel", aggregates)["leavers"].sum()
 
     # This pie chart shows percentage of attrition for each travel category as a percentage of the whole 237 employees who have left the company
-    fig_ee_attributes1 = px.pie(attribute1_df, values='Attrition', names='BusinessTravel',color="BusinessTravel", title=f"Total Attrition - Percent Breakout<br>by Job Travel (n={attrition_yes_count})")
-
-
-    # This chart shows percentage of attrition within each travel category, not as a percentage of the whole -- pie chart above shows it as percentage of whole
-    # fig_ee_attributes1 = px.histogram(attribute1_df, x="BusinessTravel", y="Attrition", color="BusinessTravel", title="Avg Rate of Attrition by Job Travel")
-
-    fig_ee_attributes1.update_layout(
-    transition_duration=500,
-    # margin=dict(l=20, r=20, t=70, b=90),
-    paper_bgcolor="LightSteelBlue",
-    # font=dict(size=12),
-    font_color="black",
-    title_font_color="black",
-    # title_font=dict(size=16),
-    legend_title_font_color="black",
-    legend_title_text="Travel Frequency",
-    title_x=0.5, #centers the chart title
-    height=375,
-    )
-
-    figJobTravel_note = 'Job Roles with Rare Travel make up a higher rate of overall attrition<br>(66%) than roles with Frequent Travel (29%) or No Travel (5%).<br>Consideration: Is rare travel too much travel or not enough?'
-
-    fig_ee_attributes1.add_annotation(
-        showarrow=False,
-        text=figJobTravel_note,
-        font=dict(size=9), 
-        xref='paper',
-        x=0.6,
-        yref='paper',
-        y=-0.35,
-        align="center"
-        )
-
-    return fig_ee_attributes1
+    return build_figure('employee-attributes-1', attribute1_df, {'n': attrition_yes_count})
 
 ### Business Travel Pie Chart End ###
 
 
 ### Overtime Chart Start ###
-@app.callback(
+@dashboard_callback(
     Output('ot-percent', 'figure'),
     [Input('ot-checkbox-1', 'value')])
-def update_ot_fig(selected_ot_attribute):
+@cached_figure
+def update_ot_fig(selected_ot_attribute, aggregates=None):
     if selected_ot_attribute == []:
         return {}  # Returning this empty {} resolves a callback error that was occurring when all checklist items were unselected
 
     else:
-        ot_df = ea_rev[ea_rev["OverTime"].isin(selected_ot_attribute)]
+        # Avg rate of attrition for each selected OverTime value - one row per bar
+        ot_df = chart_rows('ot-percent', selected_ot_attribute, aggregates)
 
-    # Set variable to Total Count of OverTime == "Yes"
-    ot_yes_count = sum(dept_shorten["OverTime"])
-
-    # This pie chart shows percentage of attrition for each travel category as a percentage of the whole 237 employees who have left the company
-    # ot_fig = px.pie(ot_df, values='Attrition', names='OverTime',color="OverTime", title=f"Total Attrition - Percent Breakout by Overtime (n={ot_yes_count})")
-
-
-    # This chart shows percentage of attrition within each OverTime category, not as a percentage of the whole -- pie chart above shows it as percentage of whole
-    ot_fig = px.histogram(ot_df, x="OverTime", y="Attrition", histfunc='avg', color="OverTime", title="Avg Rate of Attrition vs. Overtime Status")
-
-    ot_fig.update_layout(
-    transition_duration=500,
-    # margin=dict(l=20, r=20, t=70, b=90),
-    paper_bgcolor="LightSteelBlue",
-    # font=dict(size=12),
-    font_color="black",
-    title_font_color="black",
-    # title_font=dict(size=16),
-    legend_title_font_color="black",
-    legend_title_text="Overtime Required",
-    title_x=0.5, #centers the chart title
-    xaxis_title="Overtime Required",
-    yaxis_tickformat = '%',
-    height=375,
-    )
-
-    fig_ot_note = 'There is a 31% avg attrition rate among employees who worked OT,<br>while there is a 10% avg attrition rate among employees who did not work OT.'
-
-    ot_fig.add_annotation(
-        showarrow=False,
-        text=fig_ot_note,
-        font=dict(size=9), 
-        xref='paper',
-        x=0.6,
-        yref='paper',
-        y=-0.40,
-        align="center",
-        )
-
-    return ot_fig
+    # This chart shows percentage of attrition within each OverTime category, not as a percentage of the whole
+    return build_figure('ot-percent', ot_df)
 
 ### Overtime Chart End ###
 
 
 ### Years at Company Line Chart Start ###
-@app.callback(
+@dashboard_callback(
     Output("last-promotion-chart", "figure"), 
     [Input("last-promotion-checklist", "value")])
-
+@cached_figure
 def update_promotion_chart(last_promotion_selected):
 
-    df_yrs_at_co=df.groupby(['YearsAtCompany','Attrition']).apply(lambda x:x['YearsAtCompany'].count()).reset_index(name='Count')
-
-    fig_promotion=px.line(df_yrs_at_co,x='YearsAtCompany',y='Count',color='Attrition',title='Years at Company vs. Attrition')
-
-    fig_promotion.update_layout(
-    transition_duration=500,
-    # margin=dict(l=20, r=20, t=70, b=90),
-    paper_bgcolor="LightSteelBlue",
-    # font=dict(size=12),
-    font_color="black",
-    title_font_color="black",
-    # title_font=dict(size=16),
-    legend_title_font_color="black",
-    legend_title_text="Attrition",
-    title_x=0.5, #centers the chart title
-    xaxis_title="Years at Company",
-    yaxis_title="Count",
-    height=375,
-    )
-
-    # Set variable to Total Count of 2 years in current role
-    # two_yr_role = df[df['YearsInCurrentRole'] == 2].count()
-    # two = df.groupby("Attrition").count()[["YearsInCurrentRole"]]==2
-    # two_yr_role = df.groupby["YearsInCurrentRole"].count()["YearsInCurrentRole"]==2
-
-    fig_promotion_note = f'Evaluating attrition against years in current role, the highest rate of attrition occurs<br>among employees working for the company for less than 1 year or around 2 years.'
-
-    fig_promotion.add_annotation(
-        showarrow=False,
-        text=fig_promotion_note,
-        font=dict(size=9), 
-        xref='paper',
-        x=0.5,
-        yref='paper',
-        y=-0.25,
-        align="center",
-        height=400,
-        )
+    df_yrs_at_co=chart_rows('last-promotion-chart')
 
-    return fig_promotion
+    return build_figure('last-promotion-chart', df_yrs_at_co)
 
 ### Years at Company Line Chart End ###
 
 
 ### Start of Attrition vs. Commute Chart ###
-@app.callback(
+@dashboard_callback(
     Output("commute-chart", "figure"), 
     [Input("commute_group_selections", "value")])
-
-def update_commute_chart(commute_group_selected):
+@cached_figure
+def update_commute_chart(commute_group_selected, aggregates=None):
     if commute_group_selected == []:
         return {}  # Returning this empty {} resolves a callback error that was occurring when all checklist items were unselected
     
     else:
-        commute_group_df = commute_df[commute_df["CommuteGroup"].isin(commute_group_selected)]
-    
+        # Avg rate of attrition for each selected commute group - one row per bar
+        commute_group_df = chart_rows('commute-chart', commute_group_selected, aggregates)
     
     # Create Commute vs. Attrition Chart
-    # category_orders sets the display order of the bars in the chart
-    fig_commute=px.histogram(commute_group_df,x='Attrition',y='CommuteGroup',color='CommuteGroup',histfunc='avg', title='Avg Rate of Attrition vs. Commute Distance', category_orders={"CommuteGroup": ["1 to 5 miles", "6 to 10 miles", "11 to 20 miles", "Over 20 miles"]})
-
-    fig_commute.update_layout(
-        transition_duration=500,
-        # margin=dict(l=20, r=20, t=70, b=90),
-        paper_bgcolor="LightSteelBlue",
-        # font=dict(size=12),
-        font_color="black",
-        title_font_color="black",
-        # title_font=dict(size=16),
-        legend_title_font_color="black",
-        legend_title_text="Commute Distance",
-        title_x=0.5, #centers the chart title
-        xaxis_title="Rate of Attrition",
-        yaxis_title="Commute Distance",
-        xaxis_tickformat = '%', #Adds % sign to xaxis ticks
-        height=375,
-        )
-
-    fig_commute.update_yaxes(
-        categoryorder='total ascending'
-    )
-
-    fig_commute_note = 'Employees with commutes of 20 miles or more have the highest attrition rate.'
-
-    fig_commute.add_annotation(
-        showarrow=False,
-        text=fig_commute_note,
-        font=dict(size=9), 
-        xref='paper',
-        x=0.55,
-        yref='paper',
-        y=-0.35,
-        align="center",
-        )
-
-    return fig_commute
+    return build_figure('commute-chart', commute_group_df)
 
 ### End of Commute vs. Attrition Chart ###
 
@@ -1431,327 +1255,341 @@ def update_commute_chart(commute_group_selected):
 
 
 ### Satisfaction Bar Chart Start ###
-@app.callback(
+@dashboard_callback(
     Output("satisfaction_area_chart", "figure"), 
     [Input("satisfaction-x-axis", "value")])
+@cached_figure
+def display_area(x, aggregates=None):
+    if x is None:
+        return {}  # Returning this empty {} resolves a callback error that was occurring when the dropdown was cleared
 
-def display_area(x):
-    df_satisfaction=df_satis_rev.groupby(['Environment Satisfaction', 'Job Involvement', 'Job Satisfaction','Relationship Satisfaction','Attrition']).apply(lambda x:x['EmployeeCount'].count()).reset_index(name='Count')
-    
-    
-    fig_satisfaction_area_chart = px.bar(df_satisfaction, x=x, y="Count",
-        color="Attrition", barmode="stack", title=f"Attrition vs. Satisfaction Ratings")
-    
-    fig_satisfaction_area_chart.update_layout(
-    transition={
-        'duration': 500,
-        'easing': 'cubic-in-out',
-    },
-    # margin=dict(l=20, r=20, t=70, b=90),
-    paper_bgcolor="LightSteelBlue",
-    # font=dict(size=12),
-    font_color="black",
-    title_font_color="black",
-    # title_font=dict(size=16),
-    legend_title_font_color="black",
-    legend_title_text="Attrition",
-    title_x=0.5, #centers the chart title
-    xaxis_title="Satisfaction Rating",
-    # yaxis_title="Count",
-    # The xaxis = dict below sets the x-axis tick marks to start at 0 and increment by 1 in whole numbers
-    xaxis = dict(
-        tickmode = 'array', # Set to array in order to rename tick labels
-        tick0 = 0,
-        dtick = 1,
-        tickvals = [1,2,3,4], # Position of tick labels to rename
-        ticktext = ['1: Low', "2: Medium", "3: High", "4: Very High"] # rename tick labels at positions [1,2,3,4]
-        ),
-    height=400,
-    )
-    
-    return fig_satisfaction_area_chart
+    # Counts of the selected satisfaction rating & Attrition - precomputed at load
+    df_satisfaction=chart_rows('satisfaction_area_chart', x, aggregates)
+
+    return build_figure('satisfaction_area_chart', df_satisfaction, x=x)
 
 ### Satisfaction Bar Chart End ###
 
 
 
 ### Avg Rate of Attrition by Dept horiz. bar chart Start ###
-@app.callback(
+@dashboard_callback(
     Output('chart-with-dropdown', 'figure'),
     [Input('dept-dropdown', 'value')])
-def update_figure(selected_dept):
+@cached_figure
+def update_figure(selected_dept, aggregates=None):
 
     if selected_dept == []:
         return {}  # Returning this empty {} resolves a callback error that was occurring when all checklist items were unselected
         
-    # dept_df = dept_shorten[dept_shorten["Department"].isin(selected_dept)]
     else:
-        dept_df = df_trvl[df_trvl["Department"].isin(selected_dept)]
-    # fig100 = px.histogram(dept_df, x="Attrition", histfunc='avg', barmode="group", color="Department", title="Average Rate of Attrition by Department")
+        # Avg rate of attrition for each selected dept - one row per bar
+        dept_df = chart_rows('chart-with-dropdown', selected_dept, aggregates)
 
     # This chart displays horizontally - one Attrition measure for each dept
-    # fig100 = px.histogram(dept_df, x="Attrition", y="Department", histfunc='avg', barmode="group", color="Department", title="Average Rate of Attrition by Department")
-
-    fig100 = px.histogram(dept_df, x="Attrition", y="Department", histfunc='avg', barmode="group", color="Department", 
-    color_discrete_map={
-        "Human Resources": "red",
-        "Research & Development": "green",
-        "Sales": "blue"}, 
-        title="Average Rate of Attrition by Department")
-
-
-    fig100.update_layout(
-        transition_duration=500,
-        # margin=dict(l=20, r=20, t=70, b=90),
-        paper_bgcolor="LightSteelBlue",
-        # font=dict(size=12),
-        # font_family="Courier New",
-        font_color="black",
-        # title_font_family="Times New Roman",
-        title_font_color="black",
-        # title_font=dict(size=16),
-        legend_title_font_color="black",
-        title_x=0.5,
-        xaxis_tickformat = '%',
-        height=400,
-    )
-
-    fig100.update_yaxes(
-        categoryorder='total ascending'
-    )
-
-    fig100_note = 'Although Percent Breakout by Department indicates that R&D makes up the highest percentage of all employees who have<br>left the company, the avg rate of attrition within R&D independently is 14%, compared to 21% for Sales and 19% for HR.'
-
-    fig100.add_annotation(
-        showarrow=False,
-        text=fig100_note,
-        font=dict(size=9), 
-        xref='paper',
-        x=0.5,
-        yref='paper',
-        y=-0.35,
-        align="center"
-        )
-
-    return fig100
+    return build_figure('chart-with-dropdown', dept_df)
 
 ### Avg Rate of Attrition by Dept horiz. bar chart End ###
 
 
 ### Avg Rate of Attrition percent by Dept Pie Chart Start ###
-@app.callback(
+@dashboard_callback(
     Output('dept_pct_pie', 'figure'),
     [Input('dept-pie-checkbox', 'value')])
-def update_pie(dept_selection):
+@cached_figure
+def update_pie(dept_selection, aggregates=None):
 
     if dept_selection == []:
         return {}  # Returning this empty {} resolves a callback error that was occurring when all checklist items were unselected
     
     else:
-        dept_pct_df = df_trvl[df_trvl["Department"].isin(dept_selection)]
+        # Count of Attrition = "Yes" (or 1) for each selected dept - one row per slice
+        dept_pct_df = chart_rows('dept_pct_pie', dept_selection, aggregates)
 
         # Set variable to Total Count of Attrition = "Yes" (or 1)
-        attrition_yes_count = sum(dept_pct_df["Attrition"]==1)
-  
+        attrition_yes_count = dept_pct_df["Attrition"].sum()
 
     # This pie chart shows percent of total attrition by department
-    # i.e. Sales has 38.8% of total attrition (92 of the 237 empls that left were from the sales department)
-    fig200 = px.pie(dept_pct_df, values='Attrition', names='Department',color="Department", color_discrete_map={
-        "Human Resources": "red",
-        "Research & Development": "green",
-        "Sales": "blue"},
-        title=f"Total Attrition - Percent Breakout by Department (n={attrition_yes_count})")
-   
-    fig200.update_layout(
-        # margin=dict(l=70, r=70, t=70, b=90),
-        paper_bgcolor="LightSteelBlue",
-        # font=dict(size=12),
-        # font_family="Courier New",
-        font_color="black",
-        # title_font_family="Times New Roman",
-        title_font_color="black",
-        # title_font=dict(size=16),
-        legend_title_font_color="black",
-        legend_title_text="Department",
-        title_x=0.5,
-        height=400,
-    )
-
-    # This adds annotation/caption to the chart
-    fig200_note = 'R&D is the largest department, with 65% of all employees, so it stands to reason<br>that the highest percentage of employees leaving would come from the largest department.'
-
-    fig200.add_annotation(
-        showarrow=False,
-        text=fig200_note,
-        font=dict(size=9), 
-        xref='paper',
-        x=0.5,
-        yref='paper',
-        y=-0.30,
-        align = "center",
-        )
-
-    return fig200
+    return build_figure('dept_pct_pie', dept_pct_df, {'n': attrition_yes_count})
 
 ### Avg Rate of Attrition percent by Dept Pie Chart End ###
 
 
 ### Start Avg Rate of Attrition Percent vs WorkLifeBalance Pie Chart ###
-@app.callback(
+@dashboard_callback(
     Output('work_balance_pie', 'figure'),
     [Input('work-balance-checklist', 'value')])
-def update_pie(work_balance_selection):
+@cached_figure
+def update_pie(work_balance_selection, aggregates=None):
 
     if work_balance_selection == []:
         return {}  # Returning this empty {} resolves a callback error that was occurring when all checklist items were unselected
     
     else:
-        work_life_bal_df = work_balance_df[work_balance_df["WorkLifeBalance"].isin(work_balance_selection)]
+        # Count of Attrition = "Yes" (or 1) for each selected rating - one row per slice
+        work_life_bal_df = chart_rows('work_balance_pie', work_balance_selection, aggregates)
 
         # Set variable to Total Count of Attrition = "Yes" (or 1)
-        attrition_yes_count = sum(work_life_bal_df["Attrition"]==1)
-  
+        attrition_yes_count = work_life_bal_df["Attrition"].sum()
 
-    # This pie chart shows percent of total attrition based on performance rating
-    fig_work_bal = px.pie(work_life_bal_df, values='Attrition', names='WorkLifeBalance',color="WorkLifeBalance", title=f"Total Attrition - Percent Breakout by Work Life Balance Rating (n={attrition_yes_count})")
-   
-    fig_work_bal.update_layout(
-        # margin=dict(l=70, r=70, t=70, b=90),
-        paper_bgcolor="LightSteelBlue",
-        # font=dict(size=12),
-        # font_family="Courier New",
-        font_color="black",
-        # title_font_family="Times New Roman",
-        title_font_color="black",
-        # title_font=dict(size=16),
-        legend_title_font_color="black",
-        legend_title_text="Work Life Balance Rating",
-        title_x=0.5,
-        height=400,
-    )
-
-    # This adds annotation/caption to the chart
-    fig_work_bal_note = 'The highest rate of attrition comes from people who rated the work life balance<br>as "Good" (3) out of a 4-point scale.'
-
-    fig_work_bal.add_annotation(
-        showarrow=False,
-        text=fig_work_bal_note,
-        font=dict(size=9), 
-        xref='paper',
-        x=0.5,
-        yref='paper',
-        y=-0.30,
-        align = "center",
-        )
-
-    return fig_work_bal
+    # This pie chart shows percent of total attrition based on work life balance rating
+    return build_figure('work_balance_pie', work_life_bal_df, {'n': attrition_yes_count})
 
 ### Avg Rate of Attrition Percent vs WorkLifeBalance Pie Chart End ###
 
 
 ### Start Avg Rate of Attrition Percent vs Performance Rating Pie Chart ###
-@app.callback(
+@dashboard_callback(
     Output('perf_rating_pie', 'figure'),
     [Input('perf-rating-checkbox', 'value')])
-def update_pie(perf_rating_selection):
+@cached_figure
+def update_pie(perf_rating_selection, aggregates=None):
 
     if perf_rating_selection == []:
         return {}  # Returning this empty {} resolves a callback error that was occurring when all checklist items were unselected
     
     else:
-        performance_df = perf_rating_df[perf_rating_df["PerformanceRating"].isin(perf_rating_selection)]
+        # Count of Attrition = "Yes" (or 1) for each selected rating - one row per slice
+        performance_df = chart_rows('perf_rating_pie', perf_rating_selection, aggregates)
 
         # Set variable to Total Count of Attrition = "Yes" (or 1)
-        attrition_yes_count = sum(performance_df["Attrition"]==1)
-  
+        attrition_yes_count = performance_df["Attrition"].sum()
 
     # This pie chart shows percent of total attrition based on performance rating
-    fig_perf_rating = px.pie(performance_df, values='Attrition', names='PerformanceRating',color="PerformanceRating", title=f"Total Attrition - Percent Breakout by Performance Rating (n={attrition_yes_count})")
-   
-    fig_perf_rating.update_layout(
-        # margin=dict(l=70, r=70, t=70, b=90),
-        paper_bgcolor="LightSteelBlue",
-        # font=dict(size=12),
-        # font_family="Courier New",
-        font_color="black",
-        # title_font_family="Times New Roman",
-        title_font_color="black",
-        # title_font=dict(size=16),
-        legend_title_font_color="black",
-        legend_title_text="Performance Rating",
-        title_x=0.5,
-        height=400,
-    )
-
-    # This adds annotation/caption to the chart
-    fig_perf_rating_note = 'All employees received performance ratings of Excellent (3) or Outstanding (4)<br>out of a 4-point scale. Of employees who left the company, 84% received an "Excellent" rating.'
-
-    fig_perf_rating.add_annotation(
-        showarrow=False,
-        text=fig_perf_rating_note,
-        font=dict(size=9), 
-        xref='paper',
-        x=0.5,
-        yref='paper',
-        y=-0.30,
-        align = "center",
-        )
-
-    return fig_perf_rating
+    return build_figure('perf_rating_pie', performance_df, {'n': attrition_yes_count})
 
 ### Avg Rate of Attrition Percent vs Performance Rating Pie Chart End ###
 
 
 ### Avg Rate of Attrition by Job Role Chart Start ###
-@app.callback(
+@dashboard_callback(
     Output('chart-jobrole-checkbox', 'figure'),
     [Input('jobrole-checkboxes', 'value')])
-def update_figure(selected_role):
+@cached_figure
+def update_figure(selected_role, aggregates=None):
 
     if selected_role == []:
         return {}  # Returning this empty {} resolves a callback error that was occurring when all checklist items were unselected
-    # role_df = df_trvl.groupby("JobRole").mean()["Attrition"].multiply(100)
     
     else:
-        role_df_rev = df_trvl[df_trvl["JobRole"].isin(selected_role)]
+        # Avg rate of attrition for each selected job role - one row per bar
+        role_df_rev = chart_rows('chart-jobrole-checkbox', selected_role, aggregates)
 
+    return build_figure('chart-jobrole-checkbox', role_df_rev)
 
-    figJobRole = px.histogram(role_df_rev, x="Attrition", y="JobRole", histfunc='avg',title="Average Rate of Attrition by Job Role")
+### Avg Rate of Attrition by Job Role Chart End ###
 
 
-    figJobRole.update_layout(
-        transition_duration=500,
-        # margin=dict(l=20, r=20, t=70, b=90),
-        paper_bgcolor="LightSteelBlue",
-        # font=dict(size=12),
-        font_color="black",
-        title_font_color="black",
-        # title_font=dict(size=16),
-        legend_title_font_color="black",
-        title_x=0.5, #centers the chart title
-        yaxis_title="Job Role",
-        xaxis_tickformat = '%',
-        height=450,
-    )
+### Correlation Heatmap Start ###
+@dashboard_callback(
+    Output('correlation-heatmap', 'figure'),
+    [Input('heatmap-dept-checkbox', 'value'), Input('heatmap-method', 'value')])
+@cached_figure
+def update_heatmap(dept_selection, method):
+    if not dept_selection:
+        return {}  # Returning this empty {} resolves a callback error that was occurring when all checklist items were unselected
 
-    figJobRole.update_yaxes(
-        categoryorder='total ascending'
-    )
+    selections = {'Department': dept_selection}
+    dashboard = get_dashboard()
 
-    figJobRole_note = 'The Sales Representative Role has the highest rate of attrition at 40%, followed by Laboratory Technician at 24% and Human Resources at 23%.'
-
-    figJobRole.add_annotation(
-        showarrow=False,
-        text=figJobRole_note,
-        font=dict(size=9), 
-        xref='paper',
-        x=0.5,
-        yref='paper',
-        y=-0.25,
-        align="center"
-        )
+    # Spearman ranks the selected rows (from the cached sort orders), so it needs the rows - streaming mode keeps none & shows Pearson
+    if method == 'spearman' and dashboard['emp_df'] is not None:
+        mask = filter_mask(selections, dashboard['filter_index'])
+        with phase('aggregate'):
+            corr_df = spearman_matrix(dashboard['emp_df'], dashboard['version'], mask)
+        method_title = 'Spearman'
+    else:
+        # Pearson - summed from the per-Department statistics, no rows are scanned
+        with phase('aggregate'):
+            corr_df = pearson_matrix(correlation_table(), selections)
+        method_title = 'Pearson'
+
+    # As the color becomes darker in either direction, those variables are more highly correlated and should not be paired together in the same model
+    return build_figure('correlation-heatmap', corr_df, {'method': method_title})
+
+### Correlation Heatmap End ###
+
+
+############################## CROSS-FILTER MODE ##############################
+
+# Optional mode (DASHBOARD_CROSSFILTER) - the sidebar selections combine into one global filter & every sidebar chart shows only
+# the employees that pass it (i.e. unticking Sales in the Department checklist takes Sales out of the Job Role & Overtime charts too)
+# One callback updates all of these charts - the row mask is built once per change & each chart reads its counts from the same filtered rows
+
+# Sidebar controls & the dimension each one filters - None for the satisfaction dropdown (its chart is filtered, it doesn't filter)
+CROSSFILTER_INPUTS = {
+    'emp-attributes-checkbox-1': 'BusinessTravel',
+    'ot-checkbox-1': 'OverTime',
+    'commute_group_selections': 'CommuteGroup',
+    'satisfaction-x-axis': None,
+    'dept-dropdown': 'Department',
+    'dept-pie-checkbox': 'Department',
+    'work-balance-checklist': 'WorkLifeBalance',
+    'perf-rating-checkbox': 'PerformanceRating',
+    'jobrole-checkboxes': 'JobRole',
+}
 
-    return figJobRole
 
-### Avg Rate of Attrition by Job Role Chart End ###
+# Combine the sidebar selections into one global filter - {dimension: selection}
+# Both Department checklists filter Department (rows must be ticked in both) & an empty checklist doesn't filter the other charts
+def sidebar_selections(values):
+    selections = {}
+    for input_id, selection in values.items():
+        dim = CROSSFILTER_INPUTS.get(input_id)
+        if dim is None or not selection:
+            continue
+        selections[dim] = [value for value in selections[dim] if value in selection] if dim in selections else list(selection)
+    return selections
+
+
+# Counts of the rows that pass the global filter - the same tables the charts normally read, so each chart is built as usual
+# Streaming mode keeps no rows to filter - the charts then read the full aggregates (each checklist still filters its own chart)
+def filtered_aggregates(selections):
+    dashboard = get_dashboard()
+    emp_df, index = dashboard['emp_df'], dashboard['filter_index']
+    if emp_df is None or index is None or index['rows'] != len(emp_df):
+        return None
+    mask = filter_mask(selections, index)
+    # Only the columns the counts read are taken - the other columns of the matching rows are never copied (or paged in when memory-mapped)
+    with phase('filter'):
+        rows = emp_df.loc[mask, list(dict.fromkeys(FILTER_DIMENSIONS + pivot_columns() + ['Attrition']))]
+    with phase('aggregate'):
+        return finish_aggregates(count_rows(rows, FILTER_DIMENSIONS, correlation=False))
+
+
+# One multi-output callback for the charts driven by the sidebar - returns one figure per chart, in the order of charts
+# Cached by the whole set of selections, like the single-chart callbacks are by theirs
+def crossfilter_callback(charts):
+    input_ids = [inputs[0].component_id for _, inputs, _ in charts]
+
+    @cached_figure
+    def update_crossfilter_charts(*values):
+        aggregates = filtered_aggregates(sidebar_selections(dict(zip(input_ids, values))))
+        # __wrapped__ is the chart function under its cached_figure wrapper - these figures are cached together above
+        return [func.__wrapped__(value, aggregates=aggregates) for (_, _, func), value in zip(charts, values)]
+
+    return update_crossfilter_charts
+
+
+############################### CLIENTSIDE MODE ###############################
+
+# Optional mode (DASHBOARD_CLIENTSIDE) - the checklist charts are built once per dataset version for every category & sent with the layout
+# Ticking a checklist then filters the figure in the browser (assets/clientside.js) - no callback request, no server CPU per click
+# Cross-filtering needs the rows on the server, so DASHBOARD_CROSSFILTER takes precedence when both are set
+
+# Checklist charts filtered in the browser & how - {chart id: filter}
+# 'traces' keeps the bars (one trace per category) named after a ticked value, 'labels'/'y' keep the slices/bars whose label/y is ticked
+CLIENTSIDE_CHARTS = {
+    'employee-attributes-1': 'labels',
+    'ot-percent': 'traces',
+    'commute-chart': 'traces',
+    'chart-with-dropdown': 'traces',
+    'dept_pct_pie': 'labels',
+    'work_balance_pie': 'labels',
+    'perf_rating_pie': 'labels',
+    'chart-jobrole-checkbox': 'y',
+}
 
+# Pies whose title counts the leavers in the ticked slices (n=) - the browser works n out again from the slices it keeps
+# (the Job Travel pie's n is every leaver, whatever is ticked, so its built title stays)
+CLIENTSIDE_COUNTS = {'dept_pct_pie', 'work_balance_pie', 'perf_rating_pie'}
+
+
+# True if the checklist charts are filtered in the browser
+def clientside_mode():
+    return DASHBOARD_CONFIG['CLIENTSIDE'] and not DASHBOARD_CONFIG['CROSSFILTER']
+
+
+# Build each clientside chart with every category ticked - {chart id: {'figure': ..., 'filter': ...}}
+# Same chart functions as the server callbacks, so the browser only has to drop the unticked categories
+# Colors are given out over every category, so a category keeps its color as others are unticked
+def build_clientside_figures(aggregates):
+    figures = {}
+    for output, inputs, func in CALLBACKS:
+        chart_id = output.component_id
+        if chart_id in CLIENTSIDE_CHARTS:
+            dim = CROSSFILTER_INPUTS[inputs[0].component_id]
+            values = category_attrition(dim, aggregates=aggregates)[dim].tolist()
+            figures[chart_id] = {'figure': func.__wrapped__(values, aggregates=aggregates), 'filter': CLIENTSIDE_CHARTS[chart_id]}
+            if chart_id in CLIENTSIDE_COUNTS:
+                figures[chart_id]['title'] = CHART_SPECS[chart_id]['title']
+    return figures
+
+
+############################### DASHBOARD SETUP ###############################
+
+# Make sure the data & static charts are loaded before a callback runs
+def with_dashboard(func):
+    @functools.wraps(func)
+    def wrapper(*args):
+        get_dashboard()
+        return func(*args)
+    return wrapper
+
+
+# Check the request's tenant before a page view runs (see tenants.check_tenant)
+def with_tenant_check(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        check_tenant()
+        return view(*args, **kwargs)
+    return wrapper
+
+
+# Attach the dashboard to the Dash app - called by create_app
+def init_dashboard(app):
+    config = app.server.config
+    DASHBOARD_CONFIG['DATASET_PATH'] = config['DATASET_PATH']
+    DASHBOARD_CONFIG['DATASET_CHUNKSIZE'] = config['DATASET_CHUNKSIZE']
+    DASHBOARD_CONFIG['DATASET_RELOAD_INTERVAL'] = config['DATASET_RELOAD_INTERVAL']
+    DASHBOARD_CONFIG['CROSSFILTER'] = config['DASHBOARD_CROSSFILTER']
+    DASHBOARD_CONFIG['CLIENTSIDE'] = config['DASHBOARD_CLIENTSIDE']
+    DASHBOARD_CONFIG['LOGGER'] = app.server.logger
+    DASHBOARD_CONFIG['SERVER'] = app.server
+    DASHBOARD_CONFIG['LAYOUT_PATH'] = app.config.routes_pathname_prefix + '_dash-layout'
+    configure_figure_cache(config['FIGURE_CACHE_SIZE'], config['FIGURE_CACHE_DIR'])
+
+    # specifying layout is required in order for Dash to work - passing the function (not its result) defers the charts until requested
+    app.layout = serve_layout
+
+    # Answer layout requests with the JSON encoded once per dataset version, instead of Dash encoding the static charts on every page load
+    app.server.view_functions[DASHBOARD_CONFIG['LAYOUT_PATH']] = serve_layout_json
+
+    # Multi-tenant mode - Dash's page answers 404 for an unknown tenant, like its layout & callback requests do
+    prefix = app.config.routes_pathname_prefix
+    for endpoint in (prefix, prefix + '<path:path>'):
+        app.server.view_functions[endpoint] = with_tenant_check(app.server.view_functions[endpoint])
+
+    # Cross-filter mode - the sidebar charts share one callback, the rest keep their own
+    charts = [callback for callback in CALLBACKS if callback[1][0].component_id in CROSSFILTER_INPUTS] if DASHBOARD_CONFIG['CROSSFILTER'] else []
+
+    # Clientside mode - the checklist charts are filtered by assets/clientside.js from the figure stored in the layout
+    clientside = [callback for callback in CALLBACKS if callback[0].component_id in CLIENTSIDE_CHARTS] if clientside_mode() else []
+    for output, inputs, _ in clientside:
+        app.clientside_callback(ClientsideFunction('attrition', 'filter_figure'), output,
+                                [inputs[0], Input(f'{output.component_id}-clientside', 'data')])
+
+    # Each callback's time & phases are recorded under the chart it draws (see metrics.py) & it can be profiled (see profiler.py)
+    for output, inputs, func in CALLBACKS:
+        if (output, inputs, func) not in charts + clientside:
+            label = output.component_id
+            app.callback(output, inputs)(track_callback(label, with_dashboard(instrument_callback(label, func))))
+    if charts:
+        app.callback([output for output, _, _ in charts], [inputs[0] for _, inputs, _ in charts])(
+            track_callback('crossfilter', with_dashboard(instrument_callback('crossfilter', crossfilter_callback(charts)))))
+
+    # Cached figures go into the callback responses as stored, without Dash decoding & encoding them again (see figure_cache.py)
+    for callback in app.callback_map.values():
+        if 'callback' in callback:
+            callback['callback'] = send_cached_json(callback['callback'])
+
+    # Optional warmup instead of loading on first use
+    # 'eager' loads now - with gunicorn --preload the data is loaded once before the workers are forked
+    # 'background' loads on a separate thread while the server starts taking requests (don't combine with --preload)
+    # Multi-tenant mode has nothing to warm up - each tenant loads on its own first request
+    if multi_tenant():
+        pass
+    elif config['DASHBOARD_WARMUP'] == 'eager':
+        get_dashboard()
+    elif config['DASHBOARD_WARMUP'] == 'background':
+        threading.Thread(target=get_dashboard, daemon=True).start()
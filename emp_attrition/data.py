@@ -0,0 +1,153 @@
+############################# IMPORT DEPENDENCIES ############################
+
+import os
+
+import numpy as np
+import pandas as pd
+
+
+############################## COLUMN DEFINITIONS #############################
+
+# Dataset path - relative to run.py (project root), same as the original read_csv call
+DATASET_PATH = 'ibm_emp_att_dataset.csv'
+
+# Text columns - stored as category dtype so each row only holds a small integer code
+CATEGORY_COLUMNS = ['BusinessTravel', 'Department', 'EducationField', 'Gender', 'JobRole', 'MaritalStatus', 'Over18']
+
+# Yes/No columns - stored as 1/0 so they can be averaged & summed directly (Attrition rate = mean)
+YES_NO_COLUMNS = ['Attrition', 'OverTime']
+
+# Labels for numerically coded columns - taken from files/column-values.csv
+COLUMN_LABELS = {
+    'Attrition': {0: 'No', 1: 'Yes'},
+    'OverTime': {0: 'No', 1: 'Yes'},
+    'Education': {1: 'Below College', 2: 'College', 3: 'Bachelor', 4: 'Master', 5: 'Doctor'},
+    'PerformanceRating': {1: 'Low', 2: 'Good', 3: 'Excellent', 4: 'Outstanding'},
+    'WorkLifeBalance': {1: 'Bad', 2: 'Good', 3: 'Better', 4: 'Best'},
+}
+
+# BusinessTravel text values to numerical - for calcs and to get into the Heatmap
+TRAVEL_CODES = {'Non-Travel': 1, 'Travel_Frequently': 2, 'Travel_Rarely': 3}
+
+# Satisfaction columns with a space between words - improves readability in Satisfaction chart display
+SATISFACTION_COLUMNS = {
+    'EnvironmentSatisfaction': 'Environment Satisfaction',
+    'JobInvolvement': 'Job Involvement',
+    'JobSatisfaction': 'Job Satisfaction',
+    'RelationshipSatisfaction': 'Relationship Satisfaction',
+}
+
+# Columns with the exact same value in each row - produce blank spaces within the heatmap
+CONSTANT_COLUMNS = ['EmployeeCount', 'StandardHours']
+
+
+################################# GROUPINGS ##################################
+
+# Group definitions - new column: (source column, bin edges, group labels)
+# Each edge is the inclusive lower bound of its group & the last group has no upper bound
+# Values below the first edge are left blank (NaN)
+GROUPINGS = {
+    'monthly_income_group': ('MonthlyIncome',
+        [1000, 2000, 3000, 4000, 5000, 6000, 7000, 8000, 9000, 10000],
+        ['$1,000-$1,999', '$2,000-$2,999', '$3,000-$3,999', '$4,000-$4,999', '$5,000-$5,999',
+         '$6,000-$6,999', '$7,000-$7,999', '$8,000-$8,999', '$9,000-$9,999', '$10,000 or more']),
+    'CommuteGroup': ('DistanceFromHome',
+        [1, 5, 10, 20],
+        ['1 to 5 miles', '6 to 10 miles', '11 to 20 miles', 'Over 20 miles']),
+    'AgeGroup': ('Age',
+        [18, 25, 35, 45, 55],
+        ['18 to 24', '25 to 34', '35 to 44', '45 to 54', '55 and over']),
+    'TotalWorkingYearsGroup': ('TotalWorkingYears',
+        [0, 3, 6, 11, 21],
+        ['0 to 2 years', '3 to 5 years', '6 to 10 years', '11 to 20 years', 'Over 20 years']),
+    'YearsAtCompanyGroup': ('YearsAtCompany',
+        [0, 3, 6, 11, 21],
+        ['0 to 2 years', '3 to 5 years', '6 to 10 years', '11 to 20 years', 'Over 20 years']),
+}
+
+
+# Put each value into its group - one vectorized pd.cut call instead of an if/elif check per row
+# Returns an ordered category Series, so the groups sort & chart in bin order rather than alphabetically
+def make_groups(values, edges, labels):
+    return pd.cut(values, bins=list(edges) + [np.inf], labels=labels, right=False)
+
+
+################################ LOAD DATASET ################################
+
+# Read the dataset once into the single canonical dataframe used by every chart
+# Text columns become category dtype, Yes/No columns become 1/0 & all integers are narrowed (int8/int16)
+# Charts build their labeled views from this frame instead of each keeping its own full copy
+def load_dataset(path=DATASET_PATH):
+    return prepare_dataset(pd.read_csv(path, dtype={col: 'category' for col in CATEGORY_COLUMNS}))
+
+
+# Read the dataset in chunks of rows - each chunk is prepared the same way as the whole dataset
+# For exports too large to hold in memory - fold each chunk into the aggregates (see aggregates.build_aggregates_from_chunks)
+def read_dataset_chunks(path=DATASET_PATH, chunksize=100000):
+    for chunk in pd.read_csv(path, dtype={col: 'category' for col in CATEGORY_COLUMNS}, chunksize=chunksize):
+        yield prepare_dataset(chunk)
+
+
+# Read a delta batch - a CSV in the dataset's columns plus a Change column: "add" or "remove"
+# add = a row to count (a new hire, or an employee's updated record - i.e. with Attrition "Yes" once they've left)
+# remove = a row to take back out (the employee's previous record, as it was loaded)
+# A termination is the previous record removed & the same record added with Attrition "Yes"
+# Returns the (added, removed) rows, each prepared the same way as the whole dataset
+def read_delta(path):
+    delta = pd.read_csv(path, dtype={col: 'category' for col in CATEGORY_COLUMNS})
+    change = delta.pop('Change')
+    return prepare_dataset(delta[change == 'add'].copy()), prepare_dataset(delta[change == 'remove'].copy())
+
+
+# Apply a delta batch to a dataframe - the removed employees' records are dropped (by EmployeeNumber) & the added rows appended
+def merge_rows(emp_df, added, removed):
+    kept = emp_df[~emp_df['EmployeeNumber'].isin(removed['EmployeeNumber'])]
+    merged = pd.concat([kept, added], ignore_index=True)
+
+    # Text columns come back as plain text when the two frames have different categories - change back to category dtype
+    for col in CATEGORY_COLUMNS:
+        merged[col] = merged[col].astype('category')
+    return merged
+
+
+# Recode a freshly read dataframe (or chunk) - Yes/No to 1/0, narrow integers & add the groupings
+def prepare_dataset(emp_df):
+    # Change Yes/No values from text to numerical
+    for col in YES_NO_COLUMNS:
+        emp_df[col] = (emp_df[col] == 'Yes').astype('int8')
+
+    # Narrow every integer column to the smallest integer type that fits its values
+    int_cols = emp_df.select_dtypes('integer').columns
+    emp_df[int_cols] = emp_df[int_cols].apply(pd.to_numeric, downcast='integer')
+
+    # Add the groupings (income, commute, etc.) as new columns
+    for column, (source, edges, labels) in GROUPINGS.items():
+        emp_df[column] = make_groups(emp_df[source], edges, labels)
+
+    return emp_df
+
+
+# Dataset version - changes whenever the file is replaced or edited (modified time & size)
+# Used to tell cached figures built from an older copy of the data apart
+def dataset_version(path=DATASET_PATH):
+    stat = os.stat(path)
+    return f'{stat.st_mtime_ns:x}-{stat.st_size:x}'
+
+
+################################ LABELED VIEWS ################################
+
+# Return a numerically coded column with its codes swapped for text labels (i.e. Education 1 -> "Below College")
+# The result is an ordered category Series - the labels are stored once, not once per row, & keep the code order when grouped
+def labeled(emp_df, column):
+    return emp_df[column].astype('category').cat.rename_categories(COLUMN_LABELS[column]).cat.as_ordered()
+
+
+# BusinessTravel as numerical codes - for calcs and the Heatmap
+def travel_codes(emp_df):
+    return emp_df['BusinessTravel'].map(TRAVEL_CODES).astype('int8')
+
+
+# Heatmap view - constant columns removed & BusinessTravel as numerical codes
+def heatmap_view(emp_df):
+    view = emp_df.drop(columns=CONSTANT_COLUMNS)
+    return view.assign(BusinessTravel=travel_codes(emp_df))
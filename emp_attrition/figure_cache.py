@@ -0,0 +1,234 @@
+############################# IMPORT DEPENDENCIES ############################
+
+import functools
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import flask
+from plotly.utils import PlotlyJSONEncoder
+
+from emp_attrition.metrics import phase, record_cache
+
+
+############################# CALLBACK FIGURE CACHE ###########################
+
+# Figures returned by the callbacks, stored as serialized JSON - {cache key: figure JSON}
+# Least recently used figures are dropped first once the cache holds more than maxsize figures
+FIGURE_CACHE = OrderedDict()
+
+# Cache settings
+# directory - optional folder shared by all gunicorn workers on the host (a figure built by one worker is reused by the others)
+# version - dataset version the cached figures were built from (see data.dataset_version)
+CACHE_CONFIG = {'maxsize': 256, 'directory': None, 'version': ''}
+
+# Callbacks can run on several threads (Flask dev server) - guard the OrderedDict
+CACHE_LOCK = threading.Lock()
+
+# Shared folders are pruned once every PRUNE_EVERY cache files written by this process - {directory: files written}
+# so a folder can briefly hold up to PRUNE_EVERY files per worker over its bound
+PRUNE_EVERY = 16
+PRUNE_WRITES = {}
+
+
+# Set the cache size & (optionally) the shared cache folder
+def configure_figure_cache(maxsize=256, directory=None):
+    CACHE_CONFIG['maxsize'] = maxsize
+    CACHE_CONFIG['directory'] = directory
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+
+# Record the dataset version the figures are built from - a new version empties the in-process cache
+# Shared cache files are left alone - during a rolling reload other workers may still serve the old version from them,
+# & once they're no longer hit they're the oldest files, dropped first by the folder's bound (see write_cache_file)
+def set_dataset_version(version):
+    with CACHE_LOCK:
+        if version == CACHE_CONFIG['version']:
+            return
+        CACHE_CONFIG['version'] = version
+        FIGURE_CACHE.clear()
+
+
+# Shared cache, keyed by a version of the DATASET_PATH dashboard - each snapshot carries its own (see dashboard.apply_deltas)
+def shared_figure_cache(version):
+    return {'figures': FIGURE_CACHE, 'prefix': version, 'maxsize': CACHE_CONFIG['maxsize'], 'directory': CACHE_CONFIG['directory'],
+            'files': CACHE_CONFIG['maxsize']}
+
+
+# Separate cache for one tenant's figures (see tenants.py) - kept with the tenant's dashboard & dropped with it
+# Files shared between workers go in tenants/ under the shared folder, named after a hash of the tenant's version & bounded by files
+def tenant_figure_cache(version, maxsize, files):
+    directory = os.path.join(CACHE_CONFIG['directory'], 'tenants') if CACHE_CONFIG['directory'] else None
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    prefix = hashlib.sha1(version.encode('utf-8')).hexdigest()[:16]
+    return {'figures': OrderedDict(), 'prefix': prefix, 'maxsize': maxsize, 'directory': directory, 'files': files}
+
+
+# Cache the current request's callbacks use - the one of the dashboard snapshot the request reads (put on flask.g by the dashboard),
+# or the shared one at the latest version outside a request
+def current_cache():
+    cache = flask.g.get('figure_cache') if flask.has_request_context() else None
+    return cache if cache is not None else shared_figure_cache(CACHE_CONFIG['version'])
+
+
+# Normalize callback inputs so the same selection always gives the same key
+# Checklist values are sorted - ['Sales', 'Human Resources'] and ['Human Resources', 'Sales'] draw the same chart
+def normalize_inputs(args):
+    return [sorted(arg) if isinstance(arg, list) else arg for arg in args]
+
+
+# Cache key - callback (name & line, since some callbacks share a name), normalized inputs & dataset version (the cache's prefix)
+# CACHE_FORMAT changes with the way figures are stored, so shared files written by an older release are never read back
+CACHE_FORMAT = 2
+
+
+def cache_key(func, args, prefix):
+    callback_id = f'{func.__module__}.{func.__name__}:{func.__code__.co_firstlineno}'
+    key = json.dumps([CACHE_FORMAT, callback_id, normalize_inputs(args)], default=str)
+    return prefix + '-' + hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+# Shared cache file helpers - writes go to a temp file first so other workers never read half a figure
+def read_cache_file(key, directory):
+    try:
+        with open(os.path.join(directory, key + '.json'), encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def write_cache_file(key, figure_json, directory, files):
+    path = os.path.join(directory, key + '.json')
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(figure_json)
+    os.replace(tmp_path, path)
+
+    # Keep the shared folder bounded as well - checked every PRUNE_EVERY writes rather than listing the folder on every miss
+    with CACHE_LOCK:
+        writes = PRUNE_WRITES[directory] = PRUNE_WRITES.get(directory, 0) + 1
+    if writes % PRUNE_EVERY == 0:
+        prune_cache_files(directory, files)
+
+
+# Drop the oldest files once the folder holds more than files
+# Other workers prune the same folder, so files can vanish between the listing & the stat - those are just skipped
+def prune_cache_files(directory, files):
+    entries = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.name.endswith('.json'):
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except OSError:
+                    pass
+    if len(entries) > files:
+        entries.sort()
+        for _, path in entries[:len(entries) - files]:
+            remove_cache_file(path)
+
+
+def remove_cache_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+# Store a figure in the in-process LRU cache
+def remember(key, figure_json, cache):
+    figures = cache['figures']
+    with CACHE_LOCK:
+        figures[key] = figure_json
+        figures.move_to_end(key)
+        while len(figures) > cache['maxsize']:
+            figures.popitem(last=False)
+
+
+# Serialize a callback's figure - a multi-output callback's list is stored one figure per line (still valid JSON),
+# so each figure can be put in the response on its own (see load_figure)
+def dump_figure(figure):
+    if isinstance(figure, list):
+        return '[' + '\n,'.join(json.dumps(item, cls=PlotlyJSONEncoder) for item in figure) + ']'
+    return json.dumps(figure, cls=PlotlyJSONEncoder)
+
+
+############################## CACHED RESPONSES ##############################
+
+# Dash encodes whatever a callback returns, so handing it the figure as a dict means decoding the stored JSON & encoding it again
+# Instead, during a Dash callback request (see send_cached_json) the callback returns a placeholder string per figure,
+# Dash encodes its tiny response & the stored JSON is swapped in for the placeholders - the figure is never decoded
+# Placeholders start with a NUL character, which Dash writes as \u0000 - no chart data ever contains one
+PLACEHOLDER = '\x00cached-figure:{}'
+PLACEHOLDER_PATTERN = re.compile(r'"\\u0000cached-figure:(\d+)"')
+
+
+# Figure as the callback returns it - placeholders when send_cached_json will fill them in, the decoded figure otherwise
+# (direct calls outside Dash, e.g. benchmark.py)
+def load_figure(figure_json):
+    figures = flask.g.get('cached_figures') if flask.has_request_context() else None
+    if figures is None:
+        return json.loads(figure_json)
+    if figure_json.startswith('['):
+        return [figure_placeholder(part, figures) for part in figure_json[1:-1].split('\n,')] if figure_json != '[]' else []
+    return figure_placeholder(figure_json, figures)
+
+
+def figure_placeholder(figure_json, figures):
+    figures.append(figure_json)
+    return PLACEHOLDER.format(len(figures) - 1)
+
+
+# Wrap Dash's callback dispatch (app.callback_map[...]['callback']) - fills the figures' placeholders in the encoded response
+def send_cached_json(dispatch):
+    @functools.wraps(dispatch)
+    def wrapper(*args, **kwargs):
+        figures = flask.g.cached_figures = []
+        try:
+            response = dispatch(*args, **kwargs)
+        finally:
+            flask.g.pop('cached_figures', None)
+        if not figures:
+            return response
+        return PLACEHOLDER_PATTERN.sub(lambda match: figures[int(match.group(1))], response)
+    return wrapper
+
+
+############################## CACHE DECORATOR ###############################
+
+# Decorator for callbacks - place it under @app.callback
+# Repeat selections return the stored figure JSON (see load_figure) instead of rebuilding the Plotly figure
+def cached_figure(func):
+    @functools.wraps(func)
+    def wrapper(*args):
+        cache = current_cache()
+        figures = cache['figures']
+        key = cache_key(func, args, cache['prefix'])
+
+        with CACHE_LOCK:
+            figure_json = figures.get(key)
+            if figure_json is not None:
+                figures.move_to_end(key)
+
+        if figure_json is None and cache['directory']:
+            figure_json = read_cache_file(key, cache['directory'])
+            if figure_json is not None:
+                remember(key, figure_json, cache)
+
+        record_cache(figure_json is not None)
+        if figure_json is None:
+            figure = func(*args)
+            with phase('serialize'):
+                figure_json = dump_figure(figure)
+            remember(key, figure_json, cache)
+            if cache['directory']:
+                write_cache_file(key, figure_json, cache['directory'], cache['files'])
+        with phase('serialize'):
+            return load_figure(figure_json)
+
+    return wrapper
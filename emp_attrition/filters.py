@@ -0,0 +1,56 @@
+############################# IMPORT DEPENDENCIES ############################
+
+import numpy as np
+
+from emp_attrition.data import COLUMN_LABELS, labeled
+from emp_attrition.metrics import phase
+
+
+############################ CHECKLIST FILTER INDEX ###########################
+
+# Dimensions driven by the sidebar checklists
+FILTER_DIMENSIONS = ['BusinessTravel', 'OverTime', 'CommuteGroup', 'Department', 'JobRole', 'WorkLifeBalance', 'PerformanceRating']
+
+# Module-level index - rows = number of rows the bitmaps cover (needed to unpack them back into a row mask)
+# bitmaps = {dimension: {checklist value: bitmap of the rows with that value}}
+# Bitmaps are packed 8 rows per byte (np.packbits) & keyed by the same values the checklists send (i.e. "Good", "Yes")
+FILTER_INDEX = {'rows': 0, 'bitmaps': {}}
+
+
+# Build one bitmap per value of each dimension - done once at load, so clicks never compare strings over every row
+# Returns a new index - publish it with use_filter_index
+def build_filter_index(emp_df, dimensions=FILTER_DIMENSIONS):
+    bitmaps = {}
+    for dim in dimensions:
+        column = labeled(emp_df, dim) if dim in COLUMN_LABELS else emp_df[dim]
+        codes = column.cat.codes.to_numpy()
+        bitmaps[dim] = {value: np.packbits(codes == i) for i, value in enumerate(column.cat.categories)}
+    return {'rows': len(emp_df), 'bitmaps': bitmaps}
+
+
+# Make an index the one the masks are built from - a single assignment, so a mask never mixes two versions of the rows
+def use_filter_index(index):
+    global FILTER_INDEX
+    FILTER_INDEX = index
+
+
+# OR together the bitmaps of the selected values - values not in the data select nothing
+def selection_bits(dimension, selection, index=None):
+    index = index or FILTER_INDEX
+    bitmaps = index['bitmaps'][dimension]
+    bits = np.zeros((index['rows'] + 7) // 8, dtype=np.uint8)
+    for value in selection:
+        if value in bitmaps:
+            bits |= bitmaps[value]
+    return bits
+
+
+# Boolean row mask for several checklists at once - {dimension: selection}, rows must match every dimension (AND)
+# Pass the index the rows were loaded with to build the mask from it instead of the published one
+def filter_mask(selections, index=None):
+    index = index or FILTER_INDEX
+    with phase('filter'):
+        bits = np.full((index['rows'] + 7) // 8, 0xFF, dtype=np.uint8)
+        for dimension, selection in selections.items():
+            bits &= selection_bits(dimension, selection, index)
+        return np.unpackbits(bits, count=index['rows']).view(bool)
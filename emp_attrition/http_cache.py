@@ -0,0 +1,164 @@
+############################# IMPORT DEPENDENCIES ############################
+
+import functools
+import gzip
+import hashlib
+import mimetypes
+import os
+
+import brotli
+import flask
+
+
+########################### PREPARED JSON RESPONSES ###########################
+
+# Responses that only change with the dataset version (i.e. the dashboard layout & its static charts) are encoded once
+# & kept as bytes - {'etag': ..., 'body': JSON bytes, 'br': Brotli bytes, 'gzip': gzipped bytes}
+# Served with an ETag, so a browser that already has this version gets a 304 with no body
+
+
+# Encode a response once - the ETag is the dataset version plus a hash of the content
+def prepare_response(body, version):
+    body = body.encode('utf-8') if isinstance(body, str) else body
+    return {
+        'etag': f'{version}-{hashlib.sha1(body).hexdigest()[:16]}',
+        'body': body,
+        'br': brotli.compress(body, quality=11),
+        'gzip': gzip.compress(body, compresslevel=9),
+    }
+
+
+# Send a prepared response - compressed when the browser accepts it (Brotli first), 304 when its cached copy is still current
+# no-cache lets browsers keep the response but makes them check the ETag each time, so a new dataset version is picked up straight away
+def send_prepared(prepared, mimetype='application/json'):
+    request = flask.request
+    for encoding, _ in PRECOMPRESSED:
+        if encoding in request.accept_encodings:
+            response = flask.Response(prepared[encoding], mimetype=mimetype)
+            response.headers['Content-Encoding'] = encoding
+            response.set_etag(f'{prepared["etag"]}-{encoding}')
+            break
+    else:
+        response = flask.Response(prepared['body'], mimetype=mimetype)
+        response.set_etag(prepared['etag'])
+    response.vary.add('Accept-Encoding')
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+######################### STATIC FILES & PAGE CACHING #########################
+
+# Versioned URLs are kept by browsers for a year without checking back - a changed file gets a new URL
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+
+# Content hashes of static files - {file path: (modified time, size, hash)}, worked out the first time a URL is built for the file
+FILE_HASHES = {}
+
+# Encodings & file suffixes of precompressed variants (see static_assets.py) - preferred encoding first
+PRECOMPRESSED = [('br', '.br'), ('gzip', '.gz')]
+
+# Static file endpoints & their folders, and the GET endpoints served with an ETag - filled in by init_http_cache
+STATIC_FOLDERS = {}
+PAGE_ENDPOINTS = set()
+
+
+# Short content hash of a file - used as the ?v= version in static URLs
+def file_hash(path):
+    stat = os.stat(path)
+    cached = FILE_HASHES.get(path)
+    if cached is None or cached[:2] != (stat.st_mtime_ns, stat.st_size):
+        with open(path, 'rb') as f:
+            cached = (stat.st_mtime_ns, stat.st_size, hashlib.sha1(f.read()).hexdigest()[:12])
+        FILE_HASHES[path] = cached
+    return cached[2]
+
+
+# Add the content hash to url_for('static', filename=...) - i.e. /static/css/main.css?v=3f2a9c1b04de
+def add_file_version(endpoint, values):
+    if endpoint in STATIC_FOLDERS and 'filename' in values and 'v' not in values:
+        path = os.path.join(STATIC_FOLDERS[endpoint], values['filename'])
+        if os.path.isfile(path):
+            values['v'] = file_hash(path)
+
+
+# True if the request's URL names the current version of the file - content hash (?v=) or Dash's modified-time stamp for /assets (?m=)
+def is_current_version(folder, filename):
+    path = os.path.join(folder, filename)
+    if not os.path.isfile(path):
+        return False
+    args = flask.request.args
+    if 'v' in args:
+        return args['v'] == file_hash(path)
+    if 'm' in args:
+        try:
+            return float(args['m']) == os.path.getmtime(path)
+        except ValueError:
+            return False
+    return False
+
+
+# True if a precompressed variant was written from the file as it is now - a variant older than the file is left over from before an edit
+def is_fresh_variant(path, variant_path):
+    try:
+        return os.path.getmtime(variant_path) >= os.path.getmtime(path)
+    except OSError:
+        return False
+
+
+# Static file view that sends a precompressed variant (i.e. main.css.br) when there is one, it's up to date & the browser accepts it
+# Otherwise falls back to the normal view (Flask-Compress then compresses on the fly)
+def precompressed_view(folder, view):
+    @functools.wraps(view)
+    def send(filename):
+        path = os.path.join(folder, filename)
+        for encoding, suffix in PRECOMPRESSED:
+            if encoding in flask.request.accept_encodings and is_fresh_variant(path, path + suffix):
+                mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+                response = flask.send_from_directory(folder, filename + suffix, mimetype=mimetype)
+                response.headers['Content-Encoding'] = encoding
+                response.vary.add('Accept-Encoding')
+                return response
+        return view(filename)
+    return send
+
+
+# Cache headers for every response - runs before Flask-Compress, so ETags are worked out on the uncompressed body
+# Static files - a year when the URL carries the file's current version, otherwise checked each time (no-cache + ETag)
+# Pages & Dash's GET endpoints - no-cache with an ETag, so a repeat visit to an unchanged page costs a 304
+def set_cache_headers(response):
+    request = flask.request
+    if request.method not in ('GET', 'HEAD') or response.status_code != 200:
+        return response
+
+    if request.endpoint in STATIC_FOLDERS:
+        filename = request.view_args.get('filename', '')
+        if is_current_version(STATIC_FOLDERS[request.endpoint], filename):
+            response.headers['Cache-Control'] = IMMUTABLE_CACHE
+        else:
+            response.headers['Cache-Control'] = 'no-cache'
+
+    elif request.endpoint in PAGE_ENDPOINTS:
+        if not response.get_etag()[0]:
+            response.add_etag()
+        response.cache_control.no_cache = True
+        response = response.make_conditional(request)
+
+    return response
+
+
+# Wire the caching layer into the Flask server - called by create_app after the routes are added
+# Compression itself is Flask-Compress (attached by Dash), set up by the COMPRESS_* settings in the config
+def init_http_cache(app):
+    server = app.server
+    prefix = app.config.routes_pathname_prefix
+
+    STATIC_FOLDERS['static'] = server.static_folder
+    STATIC_FOLDERS[prefix.replace('/', '_') + 'dash_assets.static'] = app.config.assets_folder
+    for endpoint, folder in STATIC_FOLDERS.items():
+        server.view_functions[endpoint] = precompressed_view(folder, server.view_functions[endpoint])
+
+    # Flask page routes (routes.py) & the Dash page, plus Dash's callback list - all only change with a deploy
+    PAGE_ENDPOINTS.update(['home', 'about', 'dashboard', prefix, prefix + '<path:path>', prefix + '_dash-dependencies'])
+
+    server.url_defaults(add_file_version)
+    server.after_request(set_cache_headers)
@@ -0,0 +1,125 @@
+############################# IMPORT DEPENDENCIES ############################
+
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+
+from emp_attrition.data import DATASET_PATH, load_dataset, dataset_version
+
+
+########################### COLUMNAR DATASET CACHE ###########################
+
+# CSV copies converted by default - the dataset the dashboard reads & the original in files/
+INGEST_PATHS = [DATASET_PATH, 'emp_attrition/files/IBM-FD-Employee-Attrition.csv']
+
+# Name of the manifest inside a cache folder - column order, dtypes, category labels & source CSV version
+MANIFEST_NAME = 'columns.json'
+
+
+# Cache folder for a CSV - i.e. ibm_emp_att_dataset.csv -> ibm_emp_att_dataset.columns/
+def cache_dir(path):
+    return os.path.splitext(path)[0] + '.columns'
+
+
+# Read the cache manifest - None if the CSV hasn't been converted
+def read_manifest(path):
+    try:
+        with open(os.path.join(cache_dir(path), MANIFEST_NAME), encoding='utf-8') as f:
+            return json.load(f)
+    except OSError:
+        return None
+
+
+# Convert a CSV into a columnar cache - one .npy file per column of the typed frame (see data.load_dataset)
+# Category columns are saved as their integer codes, with the labels kept once in the manifest
+def convert_dataset(path):
+    emp_df = load_dataset(path)
+    target = cache_dir(path)
+
+    # Write into a temp folder first & swap it in at the end, so readers never see a half written cache
+    tmp_target = f'{target}.tmp-{os.getpid()}'
+    os.makedirs(tmp_target)
+
+    columns = []
+    for i, col in enumerate(emp_df.columns):
+        series = emp_df[col]
+        file_name = f'{i:03d}.npy'
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            np.save(os.path.join(tmp_target, file_name), series.cat.codes.to_numpy())
+            columns.append({'name': col, 'file': file_name, 'categories': series.cat.categories.tolist(), 'ordered': bool(series.cat.ordered)})
+        else:
+            np.save(os.path.join(tmp_target, file_name), series.to_numpy())
+            columns.append({'name': col, 'file': file_name})
+
+    manifest = {'source_version': dataset_version(path), 'rows': len(emp_df), 'columns': columns}
+    with open(os.path.join(tmp_target, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    os.rename(tmp_target, target)
+    return target
+
+
+# Load a converted dataset by memory-mapping its column files (read-only)
+# Nothing is parsed or copied - pages are read from disk on use & shared by every process that maps the same files
+def load_dataset_cache(path):
+    target = cache_dir(path)
+    manifest = read_manifest(path)
+    data = {}
+    for column in manifest['columns']:
+        values = np.load(os.path.join(target, column['file']), mmap_mode='r')
+        if 'categories' in column:
+            values = pd.Categorical.from_codes(values, column['categories'], ordered=column['ordered'])
+        data[column['name']] = values
+    return pd.DataFrame(data, copy=False)
+
+
+# Dataset version - from the CSV if it's there, otherwise from the cache it was converted into
+# FileNotFoundError when neither is there (i.e. a deploy without the data)
+def source_version(path):
+    if os.path.exists(path):
+        return dataset_version(path)
+    manifest = read_manifest(path)
+    if manifest is None:
+        raise FileNotFoundError(f'Dataset not found - neither {path} nor its converted cache {cache_dir(path)} exists')
+    return manifest['source_version']
+
+
+# Read the dataset - from its columnar cache when that was converted from the current CSV, otherwise by parsing the CSV
+# (the cache alone is enough - the CSV doesn't need to be deployed once converted)
+def read_dataset(path=DATASET_PATH):
+    version = source_version(path)
+    manifest = read_manifest(path)
+    if manifest is not None and manifest['source_version'] == version:
+        return load_dataset_cache(path)
+    return load_dataset(path)
+
+
+############################### DELTA BATCHES ################################
+
+# Delta batches for a CSV are dropped into a folder next to it - i.e. ibm_emp_att_dataset.csv -> ibm_emp_att_dataset.deltas/
+# Each batch is a CSV of hires & terminations (see data.read_delta), applied in file name order
+# Use names that sort in the order the batches were exported (i.e. 2021-03-01T0900.csv) & clear the folder when a new full export replaces the CSV
+def delta_dir(path):
+    return os.path.splitext(path)[0] + '.deltas'
+
+
+# Delta batch file names in the order they're applied - empty if the folder doesn't exist
+def list_deltas(path):
+    try:
+        names = os.listdir(delta_dir(path))
+    except OSError:
+        return []
+    return sorted(name for name in names if name.endswith('.csv'))
+
+
+# Ingestion step - run from the project root after a new export is dropped in:
+#   python -m emp_attrition.ingest [path/to/export.csv ...]
+if __name__ == '__main__':
+    for csv_path in sys.argv[1:] or INGEST_PATHS:
+        print(f'{csv_path} -> {convert_dataset(csv_path)}')
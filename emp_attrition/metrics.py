@@ -0,0 +1,201 @@
+############################# IMPORT DEPENDENCIES ############################
+
+import bisect
+import contextlib
+import functools
+import os
+import threading
+import time
+
+import flask
+
+
+############################### METRIC REGISTRY ###############################
+
+# Metrics kept by this process - each gunicorn worker keeps & serves its own (every series carries the worker's pid)
+# Histograms - {name: (help text, bucket upper bounds)}, counters - {name: help text}
+HISTOGRAMS = {
+    'dash_callback_duration_seconds': ('Time spent in each Dash callback', (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)),
+    'dash_callback_phase_duration_seconds': ('Time spent in each phase of a Dash callback - filter, aggregate, figure & serialize',
+                                             (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)),
+    'dash_callback_response_bytes': ('Size of each Dash callback response before compression', (1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000, 1000000)),
+    'http_request_duration_seconds': ('Time spent answering each Flask route', (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)),
+}
+COUNTERS = {
+    'dash_callback_cache_total': 'Figure cache lookups by Dash callbacks - result is hit or miss',
+}
+
+# Recorded values - {(name, labels): {'buckets': [...], 'sum': ..., 'count': ...}} & {(name, labels): value}
+# Bucket counts are per bucket (not cumulative) until they're written out
+HISTOGRAM_VALUES = {}
+COUNTER_VALUES = {}
+METRICS_LOCK = threading.Lock()
+
+# Settings - filled in from the Flask config by init_metrics
+# SERVER_TIMING - add a Server-Timing header with the phase timings to each response (shows up in the browser's dev tools)
+METRICS_CONFIG = {'ENABLED': True, 'SERVER_TIMING': False}
+
+# Phases of a callback - filter (checklist selection & row masks), aggregate (reading/summing counts), figure (building the
+# Plotly figure - the callback time not spent in another phase) & serialize (figure JSON encoding/decoding & Dash's response)
+PHASES = ('filter', 'aggregate', 'figure', 'serialize')
+
+
+# Label set as a hashable key - sorted, so the same labels in any order are the same series
+def label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+# Add an observation to a histogram
+def observe(name, value, **labels):
+    buckets = HISTOGRAMS[name][1]
+    key = (name, label_key(labels))
+    with METRICS_LOCK:
+        series = HISTOGRAM_VALUES.get(key)
+        if series is None:
+            series = HISTOGRAM_VALUES[key] = {'buckets': [0] * (len(buckets) + 1), 'sum': 0.0, 'count': 0}
+        series['buckets'][bisect.bisect_left(buckets, value)] += 1
+        series['sum'] += value
+        series['count'] += 1
+
+
+# Add to a counter
+def increment(name, amount=1, **labels):
+    key = (name, label_key(labels))
+    with METRICS_LOCK:
+        COUNTER_VALUES[key] = COUNTER_VALUES.get(key, 0) + amount
+
+
+############################## CALLBACK TIMING ###############################
+
+# Timing of the callback running in the current request - kept on flask.g as {'callback': label, 'phases': {phase: seconds}}
+def current_timing():
+    if METRICS_CONFIG['ENABLED'] and flask.has_request_context():
+        return flask.g.get('callback_timing')
+    return None
+
+
+# Time a block of a callback as one of its phases - i.e. with phase('filter'): ...
+# Does nothing outside a callback request (i.e. the static charts built at load), so shared code can be timed freely
+# Phases don't nest - time the innermost blocks only
+@contextlib.contextmanager
+def phase(name):
+    timing = current_timing()
+    if timing is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing['phases'][name] = timing['phases'].get(name, 0) + time.perf_counter() - started
+
+
+# Record a figure cache lookup for the current callback
+def record_cache(hit):
+    timing = current_timing()
+    if timing is not None:
+        increment('dash_callback_cache_total', callback=timing['callback'], result='hit' if hit else 'miss', pid=os.getpid())
+
+
+# Wrap a callback so its time & phases are recorded under a label (the chart it draws)
+# The figure phase is the callback time not spent in the other phases
+def instrument_callback(label, func):
+    @functools.wraps(func)
+    def wrapper(*args):
+        if not METRICS_CONFIG['ENABLED']:
+            return func(*args)
+        timing = flask.g.callback_timing = {'callback': label, 'phases': {}}
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            timing['seconds'] = time.perf_counter() - started
+            timing['phases']['figure'] = max(0.0, timing['seconds'] - sum(timing['phases'].values()))
+    return wrapper
+
+
+############################### REQUEST TIMING ###############################
+
+def start_request_timer():
+    flask.g.request_started = time.perf_counter()
+
+
+# Record each request's time by route & the callback's phases, response size & Server-Timing header
+# Runs before Flask-Compress (registered later), so response sizes are before compression
+def record_request(response):
+    started = flask.g.get('request_started')
+    if started is None:
+        return response
+    seconds = time.perf_counter() - started
+    pid = os.getpid()
+    observe('http_request_duration_seconds', seconds, endpoint=flask.request.endpoint or 'not_found', method=flask.request.method,
+            status=response.status_code, pid=pid)
+
+    timing = flask.g.get('callback_timing')
+    if timing is not None and 'seconds' in timing:
+        # Dash encodes the callback's return value after the callback - counted as serialize too
+        timing['phases']['serialize'] = timing['phases'].get('serialize', 0) + max(0.0, seconds - timing['seconds'])
+        observe('dash_callback_duration_seconds', seconds, callback=timing['callback'], pid=pid)
+        for name in PHASES:
+            observe('dash_callback_phase_duration_seconds', timing['phases'].get(name, 0), callback=timing['callback'], phase=name, pid=pid)
+        if not response.direct_passthrough:
+            observe('dash_callback_response_bytes', len(response.get_data()), callback=timing['callback'], pid=pid)
+
+    if METRICS_CONFIG['SERVER_TIMING']:
+        entries = [f'{name};dur={timing["phases"].get(name, 0) * 1000:.2f}' for name in PHASES] if timing is not None and 'seconds' in timing else []
+        response.headers['Server-Timing'] = ', '.join(entries + [f'total;dur={seconds * 1000:.2f}'])
+    return response
+
+
+############################### /metrics OUTPUT ###############################
+
+# Label values are quoted - backslashes, quotes & newlines escaped as the Prometheus text format asks
+def format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+# Every metric in the Prometheus text format (version 0.0.4)
+def render_metrics():
+    with METRICS_LOCK:
+        histograms = {key: dict(series, buckets=list(series['buckets'])) for key, series in HISTOGRAM_VALUES.items()}
+        counters = dict(COUNTER_VALUES)
+
+    lines = []
+    for name, (help_text, bounds) in HISTOGRAMS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for (series_name, labels), series in sorted(histograms.items()):
+            if series_name != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(list(bounds) + ['+Inf'], series['buckets']):
+                cumulative += count
+                lines.append(f'{name}_bucket{format_labels(labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{name}_sum{format_labels(labels)} {series["sum"]}')
+            lines.append(f'{name}_count{format_labels(labels)} {series["count"]}')
+    for name, help_text in COUNTERS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for (series_name, labels), value in sorted(counters.items()):
+            if series_name == name:
+                lines.append(f'{name}{format_labels(labels)} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+# /metrics view - for Prometheus to scrape
+def serve_metrics():
+    return flask.Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+
+# Add the /metrics endpoint & the request timing hooks to the Flask server - called by create_app
+def init_metrics(app):
+    server = app.server
+    METRICS_CONFIG['ENABLED'] = server.config['METRICS_ENABLED']
+    METRICS_CONFIG['SERVER_TIMING'] = server.config['METRICS_SERVER_TIMING']
+    if not METRICS_CONFIG['ENABLED']:
+        return
+    server.add_url_rule('/metrics', 'metrics', serve_metrics)
+    server.before_request(start_request_timer)
+    server.after_request(record_request)
@@ -0,0 +1,276 @@
+############################# IMPORT DEPENDENCIES ############################
+
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from emp_attrition.data import DATASET_PATH, heatmap_view, travel_codes, read_delta, merge_rows
+from emp_attrition.ingest import read_dataset, source_version, delta_dir, list_deltas
+
+
+############################### MODEL FEATURES ###############################
+
+# Folder the trained models are saved in - relative to run.py (project root), like the dataset
+MODEL_DIR = 'models'
+
+# Numeric columns left out of the features - the target & the employee ID
+MODEL_EXCLUDE = ['Attrition', 'EmployeeNumber']
+
+# Text columns given one 0/1 feature per value (BusinessTravel is already a numerical code, Over18 is the same for everyone)
+MODEL_CATEGORY_COLUMNS = ['Department', 'EducationField', 'Gender', 'JobRole', 'MaritalStatus']
+
+# Rows per block when going over the features - bounds the memory a fit needs on top of the feature matrix
+BLOCK_ROWS = 100000
+
+
+# Work out the features from the training rows - numeric columns of the heatmap view (BusinessTravel/OverTime/Attrition
+# already numerical, constant columns dropped) & the values of each text column
+# Saved with the model, so scoring encodes new rows exactly like the training rows
+def feature_spec(emp_df):
+    view = heatmap_view(emp_df)
+    numeric = [col for col in view.select_dtypes('number').columns if col not in MODEL_EXCLUDE]
+    values = view[numeric].to_numpy(dtype='float64')
+    std = values.std(axis=0)
+    return {
+        'numeric': numeric,
+        'mean': values.mean(axis=0).tolist(),
+        'std': np.where(std > 0, std, 1).tolist(),
+        'categories': {col: [str(value) for value in emp_df[col].astype('category').cat.categories] for col in MODEL_CATEGORY_COLUMNS},
+    }
+
+
+# Feature names in the order of the encoded columns - the intercept first
+def feature_names(spec):
+    return ['(intercept)'] + spec['numeric'] + [f'{col}={value}' for col, values in spec['categories'].items() for value in values]
+
+
+# Encode prepared rows (see data.prepare_dataset) as the model's feature matrix - one column operation per feature, no per-row loops
+# Numeric columns are standardized with the training means & standard deviations, text values the model hasn't seen encode as all 0s
+def encode_features(emp_df, spec, dtype='float32'):
+    n = len(emp_df)
+    X = np.empty((n, len(feature_names(spec))), dtype=dtype)
+    X[:, 0] = 1
+
+    numeric = emp_df[spec['numeric']].assign(BusinessTravel=travel_codes(emp_df)) if 'BusinessTravel' in spec['numeric'] else emp_df[spec['numeric']]
+    k = len(spec['numeric'])
+    X[:, 1:k + 1] = (numeric.to_numpy(dtype='float64') - spec['mean']) / spec['std']
+
+    start = k + 1
+    for col, values in spec['categories'].items():
+        codes = pd.Categorical(emp_df[col].astype(str), categories=values).codes
+        X[:, start:start + len(values)] = codes[:, None] == np.arange(len(values))
+        start += len(values)
+    return X
+
+
+############################# LOGISTIC REGRESSION ############################
+
+# Chance of each row's outcome being 1
+def sigmoid(z):
+    return 1 / (1 + np.exp(-np.clip(z, -35, 35)))
+
+
+# X @ w a block of rows at a time - X may be a memory-mapped file
+def linear_scores(X, w):
+    return np.concatenate([X[start:start + BLOCK_ROWS] @ w for start in range(0, len(X), BLOCK_ROWS)]) if len(X) else np.zeros(0)
+
+
+# Fit an L2-regularized logistic regression by Newton's method (IRLS) - converges in ~10 passes over the rows
+# weights = weight of each row in the loss (0 leaves a row out, i.e. a cross-validation fold held out - no copy of the rows is made)
+# l2 = penalty on the squared coefficients (not the intercept), relative to the average loss per row
+def fit_logistic(X, y, weights, l2, max_iter=50, tol=1e-6):
+    k = X.shape[1]
+    penalty = np.full(k, l2)
+    penalty[0] = 0
+    total = weights.sum()
+    w = np.zeros(k)
+    for _ in range(max_iter):
+        gradient = penalty * w
+        hessian = np.diag(penalty)
+        for start in range(0, len(X), BLOCK_ROWS):
+            block = np.asarray(X[start:start + BLOCK_ROWS], dtype='float64')
+            rows = slice(start, start + len(block))
+            p = sigmoid(block @ w)
+            gradient += block.T @ (weights[rows] * (p - y[rows])) / total
+            hessian += (block * (weights[rows] * p * (1 - p))[:, None]).T @ block / total
+        step = np.linalg.solve(hessian + 1e-10 * np.eye(k), gradient)
+        w -= step
+        if np.abs(step).max() < tol:
+            break
+    return w
+
+
+# Row weights for the loss - 'balanced' weighs leavers & stayers equally overall (attrition is ~16% of rows)
+def class_weights(y, balanced):
+    if not balanced:
+        return np.ones(len(y))
+    positives = y.sum()
+    return np.where(y == 1, len(y) / (2 * positives), len(y) / (2 * (len(y) - positives)))
+
+
+# Area under the ROC curve - the chance a random leaver scores higher than a random stayer (ties count half)
+def roc_auc(y, p):
+    positives = y.sum()
+    negatives = len(y) - positives
+    if not positives or not negatives:
+        return float('nan')
+    ranks = pd.Series(p).rank().to_numpy()
+    return float((ranks[y == 1].sum() - positives * (positives + 1) / 2) / (positives * negatives))
+
+
+# Average log loss - lower is better
+def log_loss(y, p):
+    p = np.clip(p, 1e-15, 1 - 1e-15)
+    return float(-np.mean(y * np.log(p) + (1 - y) * np.log(1 - p)))
+
+
+############################## CROSS-VALIDATION ##############################
+
+# Hyperparameter grid - every combination is cross-validated
+PARAM_GRID = {'l2': [1e-4, 1e-3, 1e-2, 1e-1], 'balanced': [False, True]}
+
+# Training rows of the worker process - memory-mapped from the files the trainer saved, so every worker shares one copy
+TRAINING = {}
+
+
+# Assign each row to a fold - leavers & stayers are spread evenly over the folds (stratified)
+def make_folds(y, folds, seed=0):
+    rng = np.random.default_rng(seed)
+    fold = np.empty(len(y), dtype='int8')
+    for outcome in (0, 1):
+        rows = np.flatnonzero(y == outcome)
+        rng.shuffle(rows)
+        fold[rows] = np.arange(len(rows)) % folds
+    return fold
+
+
+# Process pool initializer - map the training rows saved by train_model
+def load_training_data(folder):
+    for name in ('X', 'y', 'fold'):
+        TRAINING[name] = np.load(os.path.join(folder, f'{name}.npy'), mmap_mode='r')
+
+
+# Fit on every fold but one & score the held-out fold - one task in the process pool
+def cross_validate_fold(params, fold):
+    X, y, folds = TRAINING['X'], np.asarray(TRAINING['y']), np.asarray(TRAINING['fold'])
+    held_out = folds == fold
+    w = fit_logistic(X, y, class_weights(y, params['balanced']) * ~held_out, params['l2'])
+    p = sigmoid(linear_scores(X, w)[held_out])
+    return {'params': params, 'fold': fold, 'auc': roc_auc(y[held_out], p), 'log_loss': log_loss(y[held_out], p)}
+
+
+# Every combination of the grid's values - i.e. {'l2': 0.01, 'balanced': True}
+def grid_params(grid):
+    return [dict(zip(grid, values)) for values in itertools.product(*grid.values())]
+
+
+# Cross-validate every grid combination - the (combination, fold) fits run across a process pool, one per core by default
+# Returns one summary per combination, best (highest mean AUC) first
+def cross_validate(X, y, folds=5, grid=PARAM_GRID, workers=None, seed=0):
+    fold = make_folds(y, folds, seed)
+    tasks = [(params, f) for params in grid_params(grid) for f in range(folds)]
+    with tempfile.TemporaryDirectory() as folder:
+        for name, values in (('X', X), ('y', y), ('fold', fold)):
+            np.save(os.path.join(folder, f'{name}.npy'), values)
+        with ProcessPoolExecutor(max_workers=workers, initializer=load_training_data, initargs=(folder,)) as pool:
+            results = list(pool.map(cross_validate_fold, *zip(*tasks)))
+
+    summaries = []
+    for params in grid_params(grid):
+        scores = [result for result in results if result['params'] == params]
+        aucs = [result['auc'] for result in scores]
+        summaries.append({'params': params, 'auc_mean': float(np.mean(aucs)), 'auc_std': float(np.std(aucs)),
+                          'log_loss': float(np.mean([result['log_loss'] for result in scores]))})
+    return sorted(summaries, key=lambda summary: -summary['auc_mean'])
+
+
+################################ TRAIN & SAVE ################################
+
+# Read the export plus its delta batches (see ingest.list_deltas) - the same rows the dashboard shows
+def read_training_rows(path):
+    emp_df = read_dataset(path)
+    deltas = list_deltas(path)
+    for name in deltas:
+        added, removed = read_delta(os.path.join(delta_dir(path), name))
+        emp_df = merge_rows(emp_df, added, removed)
+    return emp_df, source_version(path) + (f'+{len(deltas)}' if deltas else '')
+
+
+# Train the attrition risk model - cross-validate the grid, refit the best combination on every row & save it as a new version
+def train_model(path=DATASET_PATH, model_dir=MODEL_DIR, folds=5, grid=PARAM_GRID, workers=None, seed=0):
+    started = time.time()
+    emp_df, data_version = read_training_rows(path)
+    spec = feature_spec(emp_df)
+    X = encode_features(emp_df, spec)
+    y = emp_df['Attrition'].to_numpy(dtype='float64')
+    del emp_df
+
+    summaries = cross_validate(X, y, folds, grid, workers, seed)
+    best = summaries[0]['params']
+    w = fit_logistic(X, y, class_weights(y, best['balanced']), best['l2'])
+
+    model = {
+        'version': model_version(),
+        'kind': 'logistic_regression',
+        'dataset': {'path': path, 'version': data_version, 'rows': len(y), 'leavers': int(y.sum())},
+        'features': spec,
+        'weights': dict(zip(feature_names(spec), w.tolist())),
+        'params': best,
+        'cross_validation': {'folds': folds, 'seed': seed, 'results': summaries},
+        'train_seconds': round(time.time() - started, 1),
+    }
+    save_model(model, model_dir)
+    return model
+
+
+# New model version - the time it was trained, plus a random suffix so two runs in the same second don't share a version
+def model_version():
+    return time.strftime('%Y%m%dT%H%M%S') + '-' + uuid.uuid4().hex[:8]
+
+
+# Save a model as <model_dir>/attrition-risk-<version>.json & point LATEST at it
+# Earlier versions are kept (never overwritten), so a model can be rolled back by pointing LATEST at an older file
+def save_model(model, model_dir=MODEL_DIR):
+    os.makedirs(model_dir, exist_ok=True)
+    name = f'attrition-risk-{model["version"]}.json'
+    if os.path.exists(os.path.join(model_dir, name)):
+        raise FileExistsError(f'Model version {model["version"]} is already saved in {model_dir}')
+    for file_name, text in ((name, json.dumps(model, indent=2)), ('LATEST', name)):
+        tmp_path = os.path.join(model_dir, f'{file_name}.{os.getpid()}.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, os.path.join(model_dir, file_name))
+    return os.path.join(model_dir, name)
+
+
+# Load a saved model - the one LATEST points at unless a version is given
+def load_model(model_dir=MODEL_DIR, version=None):
+    if version is None:
+        with open(os.path.join(model_dir, 'LATEST'), encoding='utf-8') as f:
+            name = f.read().strip()
+    else:
+        name = f'attrition-risk-{version}.json'
+    with open(os.path.join(model_dir, name), encoding='utf-8') as f:
+        return json.load(f)
+
+
+# Chance of attrition for each prepared row (see data.prepare_dataset)
+def predict_risk(model, emp_df):
+    spec = model['features']
+    return sigmoid(encode_features(emp_df, spec, dtype='float64') @ np.array([model['weights'][name] for name in feature_names(spec)]))
+
+
+# Nightly training step - run from the project root (uses every core):
+#   python -m emp_attrition.model [path/to/export.csv]
+if __name__ == '__main__':
+    trained = train_model(sys.argv[1] if len(sys.argv) > 1 else DATASET_PATH, os.environ.get('MODEL_DIR', MODEL_DIR))
+    print(f'{trained["version"]}: {trained["dataset"]["rows"]} rows, {trained["params"]} '
+          f'AUC {trained["cross_validation"]["results"][0]["auc_mean"]:.3f} in {trained["train_seconds"]}s')
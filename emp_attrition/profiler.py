@@ -0,0 +1,197 @@
+############################# IMPORT DEPENDENCIES ############################
+
+import collections
+import functools
+import hmac
+import math
+import os
+import sys
+import threading
+import time
+
+import flask
+
+
+############################## SAMPLING PROFILER ##############################
+
+# On-demand profiler for a live worker - a thread samples the other threads' stacks (sys._current_frames) at an interval
+# Nothing runs until a profile is asked for on /admin/profile, so it's safe to leave in production
+# Output is the collapsed-stack format flamegraph.pl & speedscope read - "root;caller;callee <samples>" per line
+
+# Limits that keep the profiler's cost bounded
+# Longest profile, shortest & longest interval, deepest stack recorded, most distinct stacks kept (the rest are counted as [other])
+# MAX_OVERHEAD - share of the profiled time the sampler may use - the interval doubles whenever it's exceeded (up to MAX_INTERVAL)
+PROFILE_LIMITS = {'MAX_SECONDS': 60, 'MIN_INTERVAL': 0.001, 'MAX_INTERVAL': 1.0, 'MAX_DEPTH': 128, 'MAX_STACKS': 10000, 'MAX_OVERHEAD': 0.05}
+
+# Settings - filled in from the Flask config by init_profiler
+# TOKEN - admin token the profile endpoint needs (the endpoint answers 404 until one is set)
+PROFILER_CONFIG = {'TOKEN': None}
+
+# Current or last profile of this worker - {'mode': 'seconds' | 'callbacks', 'stacks': Counter, 'done': Event, ...}
+PROFILE = {'session': None}
+PROFILE_LOCK = threading.Lock()
+
+# Threads running a Dash callback while a callbacks profile is on - {thread id: chart label}
+ACTIVE_CALLBACKS = {}
+
+
+# Start a profile on a new sampler thread - for a number of seconds, or until the next N callbacks have finished
+# Returns the new session, or None if a profile is already running in this worker
+def start_profile(seconds=10, interval=0.01, callbacks=None):
+    with PROFILE_LOCK:
+        session = PROFILE['session']
+        if session is not None and not session['done'].is_set():
+            return None
+        session = {
+            'mode': 'callbacks' if callbacks else 'seconds',
+            'callbacks_left': callbacks or 0,
+            'interval': min(max(interval, PROFILE_LIMITS['MIN_INTERVAL']), PROFILE_LIMITS['MAX_INTERVAL']),
+            'deadline': time.monotonic() + min(seconds, PROFILE_LIMITS['MAX_SECONDS']),
+            'started': time.time(),
+            'finished': None,
+            'samples': 0,
+            'sampler_seconds': 0.0,
+            'stacks': collections.Counter(),
+            'done': threading.Event(),
+        }
+        PROFILE['session'] = session
+    threading.Thread(target=run_sampler, args=(session,), name='profiler', daemon=True).start()
+    return session
+
+
+# One stack as "root;outermost;...;innermost" - each frame is function (file:first line), so samples in one function merge
+def collapse_stack(root, frame):
+    names = []
+    while frame is not None and len(names) < PROFILE_LIMITS['MAX_DEPTH']:
+        code = frame.f_code
+        path = code.co_filename.replace('\\', '/').split('/')
+        names.append(f'{code.co_name} ({"/".join(path[-2:])}:{code.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join([root] + names[::-1])
+
+
+# Sampler thread - records the stacks of the other threads each interval until the profile's deadline (or its callbacks are done)
+def run_sampler(session):
+    me = threading.get_ident()
+    stacks = session['stacks']
+    started = time.perf_counter()
+    while not session['done'].is_set() and time.monotonic() < session['deadline']:
+        sample_started = time.perf_counter()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == me:
+                continue
+            if session['mode'] == 'callbacks':
+                label = ACTIVE_CALLBACKS.get(thread_id)
+                if label is None:
+                    continue
+                root = f'callback:{label}'
+            else:
+                root = names.get(thread_id, f'thread-{thread_id}')
+            stack = collapse_stack(root, frame)
+            if stack in stacks or len(stacks) < PROFILE_LIMITS['MAX_STACKS']:
+                stacks[stack] += 1
+            else:
+                stacks[f'{root};[other]'] += 1
+        session['samples'] += 1
+        session['sampler_seconds'] += time.perf_counter() - sample_started
+
+        # Keep the sampler's share of the time under MAX_OVERHEAD - sample less often if a sample got expensive (i.e. many threads)
+        if session['sampler_seconds'] > PROFILE_LIMITS['MAX_OVERHEAD'] * (time.perf_counter() - started):
+            session['interval'] = min(session['interval'] * 2, PROFILE_LIMITS['MAX_INTERVAL'])
+
+        # Never sleep past the deadline - the profile ends on time whatever the interval
+        session['done'].wait(max(min(session['interval'], session['deadline'] - time.monotonic()), 0))
+
+    session['finished'] = time.time()
+    session['done'].set()
+
+
+# Wrap a callback so a callbacks profile samples it while it runs - costs one dict lookup when no profile is running
+def track_callback(label, func):
+    @functools.wraps(func)
+    def wrapper(*args):
+        session = PROFILE['session']
+        if session is None or session['mode'] != 'callbacks' or session['done'].is_set():
+            return func(*args)
+        thread_id = threading.get_ident()
+        ACTIVE_CALLBACKS[thread_id] = label
+        try:
+            return func(*args)
+        finally:
+            ACTIVE_CALLBACKS.pop(thread_id, None)
+            with PROFILE_LOCK:
+                session['callbacks_left'] -= 1
+                if session['callbacks_left'] <= 0:
+                    session['done'].set()
+    return wrapper
+
+
+# Collapsed stacks of a profile - most sampled first
+def collapsed_stacks(session):
+    return ''.join(f'{stack} {count}\n' for stack, count in session['stacks'].most_common())
+
+
+############################## /admin/profile ################################
+
+# True if the request carries the admin token - Authorization: Bearer <token> or X-Admin-Token: <token>
+def is_admin(request):
+    token = PROFILER_CONFIG['TOKEN']
+    if not token:
+        return False
+    sent = request.headers.get('X-Admin-Token') or request.headers.get('Authorization', '').replace('Bearer ', '', 1)
+    return hmac.compare_digest(sent.encode('utf-8'), token.encode('utf-8'))
+
+
+# Profile response - the collapsed stacks, with the worker & the sampler's cost in the headers
+def profile_response(session):
+    response = flask.Response(collapsed_stacks(session), mimetype='text/plain')
+    elapsed = (session['finished'] or time.time()) - session['started']
+    response.headers['X-Profile-Pid'] = str(os.getpid())
+    response.headers['X-Profile-Mode'] = session['mode']
+    response.headers['X-Profile-Samples'] = str(session['samples'])
+    response.headers['X-Profile-Overhead'] = f'{session["sampler_seconds"] / elapsed:.4f}' if elapsed > 0 else '0'
+    response.cache_control.no_store = True
+    return response
+
+
+# POST starts a profile of this worker - ?seconds=10 (&interval=0.01) samples every thread for that long,
+# ?callbacks=5 (&seconds=60 as the limit) samples the next 5 Dash callbacks only; &wait=1 answers with the result when it's done
+# GET returns the last profile's collapsed stacks (202 while it's still running)
+# Each gunicorn worker profiles itself - X-Profile-Pid says which one answered
+def serve_profile():
+    request = flask.request
+    if not is_admin(request):
+        flask.abort(404)  # Looks like no endpoint to anyone without the token
+
+    if request.method == 'POST':
+        args = request.args
+        try:
+            seconds = float(args.get('seconds', 10 if 'callbacks' not in args else PROFILE_LIMITS['MAX_SECONDS']))
+            interval = float(args.get('interval', 0.01))
+            callbacks = int(args['callbacks']) if 'callbacks' in args else None
+        except ValueError:
+            return flask.jsonify(error='seconds & interval must be numbers, callbacks a whole number'), 400
+        # nan & inf parse as floats but would never end (or never sleep) - only finite, positive values are taken
+        if not (math.isfinite(seconds) and math.isfinite(interval) and seconds > 0 and interval > 0):
+            return flask.jsonify(error='seconds & interval must be finite numbers above 0'), 400
+        session = start_profile(seconds, interval, callbacks)
+        if session is None:
+            return flask.jsonify(error='A profile is already running in this worker', pid=os.getpid()), 409
+        if args.get('wait'):
+            session['done'].wait(min(seconds, PROFILE_LIMITS['MAX_SECONDS']) + 1)
+            return profile_response(session)
+        return flask.jsonify(pid=os.getpid(), mode=session['mode'], seconds=min(seconds, PROFILE_LIMITS['MAX_SECONDS'])), 202
+
+    session = PROFILE['session']
+    if session is None:
+        return flask.jsonify(error='No profile has been taken in this worker', pid=os.getpid()), 404
+    if not session['done'].is_set():
+        return flask.jsonify(status='running', pid=os.getpid(), samples=session['samples']), 202
+    return profile_response(session)
+
+
+# Add the profile endpoint to the Flask server - called by create_app
+def init_profiler(app):
+    PROFILER_CONFIG['TOKEN'] = app.server.config['PROFILER_TOKEN']
+    app.server.add_url_rule('/admin/profile', 'admin_profile', serve_profile, methods=['GET', 'POST'])
@@ -1,18 +1,49 @@
-from flask import render_template, request
-from emp_attrition.dashboard import app
+from flask import Response, jsonify, render_template, request
 
+from emp_attrition.scoring import ARROW_MIMETYPE, get_model, read_records, prepare_records, score_records, arrow_scores
+from emp_attrition.tenants import check_tenant
 
-@app.server.route('/dashboard')
-def dashboard():
-	return app.index()
 
-@app.server.route('/')
-def home():
-	return render_template('index.html')
+# Add the page routes to the Flask server the Dash app runs on - called by create_app
+def init_routes(app):
 
-@app.server.route('/about')
-def about():
-	return render_template('about.html')
+	# Multi-tenant mode - ?tenant= or X-Tenant picks the business unit, an unknown one gets a 404 before the page asks for its layout
+	@app.server.route('/dashboard')
+	def dashboard():
+		check_tenant()
+		return app.index()
 
+	@app.server.route('/')
+	def home():
+		return render_template('index.html')
 
+	@app.server.route('/about')
+	def about():
+		return render_template('about.html')
 
+	# Attrition risk scores for one employee record or a batch - in the dataset's column schema, as JSON or an Arrow stream
+	# Returns {"model": version, "probabilities": [...]} (plus "employee_numbers" when the records have them), or Arrow when sent Arrow
+	@app.server.route('/api/score', methods=['POST'])
+	def score():
+		scoring = get_model()
+		if scoring['model'] is None:
+			return jsonify(error='No attrition risk model has been trained yet'), 503
+
+		records, error = read_records(request)
+		if error is None:
+			records, error = prepare_records(records, scoring['model']['features'])
+		if error is not None:
+			return jsonify(error=error), 400
+
+		probabilities, version = score_records(records)
+		employee_numbers = records['EmployeeNumber'].tolist() if 'EmployeeNumber' in records.columns else None
+
+		if request.mimetype == ARROW_MIMETYPE:
+			response = Response(arrow_scores(probabilities, employee_numbers), mimetype=ARROW_MIMETYPE)
+			response.headers['X-Model-Version'] = version
+			return response
+
+		body = {'model': version, 'probabilities': probabilities.tolist()}
+		if employee_numbers is not None:
+			body['employee_numbers'] = employee_numbers
+		return jsonify(body)
@@ -0,0 +1,207 @@
+############################# IMPORT DEPENDENCIES ############################
+
+import io
+import os
+import queue
+import threading
+
+import numpy as np
+import pandas as pd
+
+from emp_attrition.data import YES_NO_COLUMNS, TRAVEL_CODES
+from emp_attrition.model import MODEL_DIR, load_model, encode_features, feature_names, sigmoid
+
+# Arrow input & output need pyarrow - without it only JSON is accepted
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
+# Content type of Arrow IPC streams
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+
+
+############################### PRELOADED MODEL ###############################
+
+# Scoring settings - filled in from the Flask config by init_scoring
+# SCORE_BATCH_WAIT - seconds the batcher waits for more requests to join a batch (0 = only batch requests that are already waiting)
+# SCORE_BATCH_ROWS - most rows scored in one batch
+SCORING_CONFIG = {'MODEL_DIR': MODEL_DIR, 'SCORE_BATCH_WAIT': 0, 'SCORE_BATCH_ROWS': 10000, 'LOGGER': None}
+
+# Model used for scoring - {'model': saved model, 'weights': weights in feature order, 'mtime': LATEST's modified time when last read}
+# Loaded at startup & replaced as a whole when a newly trained version is saved (LATEST changes), without a restart
+SCORING_MODEL = {'model': None, 'weights': None, 'mtime': None}
+
+
+# Return the current model - reloaded if LATEST has changed since it was read, None if no model has been trained
+# A LATEST or model file that can't be loaded (i.e. edited by hand mid-rollback) is logged & the previous model keeps scoring,
+# until LATEST changes again
+def get_model():
+    global SCORING_MODEL
+    try:
+        mtime = os.path.getmtime(os.path.join(SCORING_CONFIG['MODEL_DIR'], 'LATEST'))
+    except OSError:
+        return SCORING_MODEL
+    if mtime != SCORING_MODEL['mtime']:
+        try:
+            model = load_model(SCORING_CONFIG['MODEL_DIR'])
+            SCORING_MODEL = {'model': model, 'weights': model_weights(model), 'mtime': mtime}
+        except (OSError, ValueError, KeyError, TypeError):
+            SCORING_CONFIG['LOGGER'].exception('Loading the attrition risk model failed - still scoring with version %s',
+                                               (SCORING_MODEL['model'] or {}).get('version'))
+            SCORING_MODEL = dict(SCORING_MODEL, mtime=mtime)
+    return SCORING_MODEL
+
+
+# Weights in the order of the model's features - a model whose weights don't match its features is refused
+def model_weights(model):
+    names = feature_names(model['features'])
+    missing = [name for name in names if name not in model['weights']]
+    if missing:
+        raise ValueError(f'Model {model.get("version")} has no weights for features: {", ".join(missing)}')
+    return np.array([model['weights'][name] for name in names])
+
+
+############################### RECORD PARSING ###############################
+
+# Turn a request body into a frame of records - JSON (one record, a list of records or {"records": [...]}) or an Arrow IPC stream
+# Returns (frame, error message)
+def read_records(request):
+    if request.mimetype == ARROW_MIMETYPE:
+        if pyarrow is None:
+            return None, 'Arrow input needs pyarrow installed on the server - send JSON instead'
+        try:
+            return pyarrow.ipc.open_stream(request.get_data()).read_all().to_pandas(), None
+        except pyarrow.ArrowInvalid:
+            return None, f'Body is not a valid Arrow IPC stream ({ARROW_MIMETYPE})'
+
+    body = request.get_json(silent=True)
+    if isinstance(body, dict):
+        body = body.get('records', [body])
+    if not isinstance(body, list) or not body or not all(isinstance(record, dict) for record in body):
+        return None, 'Send one employee record, a list of records or {"records": [...]} as JSON'
+    return pd.DataFrame.from_records(body), None
+
+
+# Recode records in the dataset's column schema the same way as data.prepare_dataset - whole columns at a time, no per-row loops
+# Only the columns the model uses are kept (built as arrays & put in one new frame) - returns (prepared frame, error message)
+def prepare_records(records, spec):
+    needed = spec['numeric'] + list(spec['categories'])
+    missing = [col for col in needed if col not in records.columns]
+    if missing:
+        return None, f'Missing columns: {", ".join(missing)}'
+
+    columns = {}
+    invalid = []
+    for col in spec['numeric']:
+        values = records[col].to_numpy()
+        if col == 'BusinessTravel':
+            if not np.isin(values, list(TRAVEL_CODES)).all():
+                return None, f'BusinessTravel must be one of: {", ".join(TRAVEL_CODES)}'
+        elif col in YES_NO_COLUMNS:
+            # "Yes"/"No" like the dataset, or already coded 1/0 - anything else would be silently scored as No
+            coded = values.dtype.kind in 'iub'
+            if not np.isin(values, [0, 1] if coded else ['Yes', 'No']).all():
+                return None, f'{col} must be Yes or No'
+            values = values.astype('int8') if coded else (values == 'Yes').astype('int8')
+        elif values.dtype.kind not in 'iub':
+            values = pd.to_numeric(records[col], errors='coerce').to_numpy(dtype='float64')
+            if np.isnan(values).any():
+                invalid.append(col)
+        columns[col] = values
+    if invalid:
+        return None, f'Columns need a number in every record: {", ".join(invalid)}'
+
+    # Text columns must hold a value the model was trained on - an unknown one would be scored like none of them
+    for col, values in spec['categories'].items():
+        column = records[col].astype(str).to_numpy()
+        if not np.isin(column, values).all():
+            return None, f'{col} must be one of: {", ".join(values)}'
+        columns[col] = column
+
+    if 'EmployeeNumber' in records.columns:
+        columns['EmployeeNumber'] = records['EmployeeNumber'].to_numpy()
+    return pd.DataFrame(columns), None
+
+
+############################### MICRO-BATCHING ###############################
+
+# Requests waiting to be scored - (prepared records, result holder) from each request thread
+SCORE_QUEUE = queue.Queue()
+
+# Process the batcher thread runs in - a thread started before gunicorn forks the workers doesn't run in them
+BATCHER = {'pid': None}
+BATCHER_LOCK = threading.Lock()
+
+
+# Score a frame of prepared records with the current model - one vectorized encode & matrix product
+def score_frame(records, scoring):
+    return sigmoid(encode_features(records, scoring['model']['features'], dtype='float64') @ scoring['weights'])
+
+
+# Batcher thread - takes every request waiting (up to SCORE_BATCH_ROWS rows), scores them as one frame & hands each its slice
+# Under load, requests that arrive while a batch is being scored are scored together in the next one
+def run_batcher():
+    while True:
+        batch = [SCORE_QUEUE.get()]
+        rows = len(batch[0][0])
+        while rows < SCORING_CONFIG['SCORE_BATCH_ROWS']:
+            try:
+                item = SCORE_QUEUE.get(timeout=SCORING_CONFIG['SCORE_BATCH_WAIT']) if SCORING_CONFIG['SCORE_BATCH_WAIT'] else SCORE_QUEUE.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+            rows += len(item[0])
+
+        try:
+            scoring = get_model()
+            probabilities = score_frame(pd.concat([records for records, _ in batch], ignore_index=True), scoring)
+            start = 0
+            for records, result in batch:
+                result.update(probabilities=probabilities[start:start + len(records)], version=scoring['model']['version'])
+                start += len(records)
+        except Exception as error:  # Hand the error to the waiting requests instead of stopping the thread
+            for _, result in batch:
+                result['error'] = error
+        for _, result in batch:
+            result['done'].set()
+
+
+# Score prepared records through the batcher - returns (probabilities, model version)
+def score_records(records):
+    if BATCHER['pid'] != os.getpid():
+        with BATCHER_LOCK:
+            if BATCHER['pid'] != os.getpid():
+                threading.Thread(target=run_batcher, daemon=True).start()
+                BATCHER['pid'] = os.getpid()
+
+    result = {'done': threading.Event()}
+    SCORE_QUEUE.put((records, result))
+    result['done'].wait()
+    if 'error' in result:
+        raise result['error']
+    return result['probabilities'], result['version']
+
+
+# Arrow IPC stream of the scores - for clients that sent Arrow
+def arrow_scores(probabilities, employee_numbers=None):
+    columns = {'probability': probabilities}
+    if employee_numbers is not None:
+        columns = {'EmployeeNumber': employee_numbers, **columns}
+    table = pyarrow.table(columns)
+    sink = io.BytesIO()
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+# Load the model before the first request & set up scoring - called by create_app
+def init_scoring(app):
+    config = app.server.config
+    SCORING_CONFIG['MODEL_DIR'] = config['MODEL_DIR']
+    SCORING_CONFIG['SCORE_BATCH_WAIT'] = config['SCORE_BATCH_WAIT']
+    SCORING_CONFIG['SCORE_BATCH_ROWS'] = config['SCORE_BATCH_ROWS']
+    SCORING_CONFIG['LOGGER'] = app.server.logger
+    if get_model()['model'] is None:
+        app.server.logger.warning('No attrition risk model in %s - run python -m emp_attrition.model to train one', config['MODEL_DIR'])
@@ -0,0 +1,210 @@
+############################# IMPORT DEPENDENCIES ############################
+
+import base64
+import gzip
+import hashlib
+import io
+import json
+import os
+import sys
+
+import brotli
+from flask import url_for
+from markupsafe import Markup, escape
+from PIL import Image, ImageFilter
+
+# AVIF needs Pillow 11.2+ or the pillow-avif-plugin package - without either, only WebP & JPEG variants are made
+try:
+    import pillow_avif  # noqa: F401 - registers the AVIF format with Pillow
+except ImportError:
+    pass
+
+
+############################# STATIC BUILD STEP ##############################
+
+# Folders served as static files - Flask's /static & Dash's /dashboard/assets
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_FOLDERS = [os.path.join(PACKAGE_DIR, 'static'), os.path.join(PACKAGE_DIR, 'assets')]
+
+# Text-like files worth precompressing - images like jpg/png/webp are already compressed
+PRECOMPRESS_EXTENSIONS = ('.css', '.js', '.html', '.json', '.svg', '.ico', '.txt', '.map')
+
+
+# Write Brotli (.br) & gzip (.gz) copies of a file next to it, at the highest compression levels
+# Done once at build time, so requests for the file don't pay for compressing it (see http_cache.precompressed_view)
+# A copy that wouldn't be smaller than the file isn't written (& an old one is removed, so it's never served in place of the file)
+def precompress_file(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    written = []
+    for suffix, compressed in (('.br', brotli.compress(data, quality=11)), ('.gz', gzip.compress(data, compresslevel=9))):
+        if len(compressed) < len(data):
+            with open(path + suffix, 'wb') as f:
+                f.write(compressed)
+            written.append(path + suffix)
+        elif os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    return written
+
+
+# Precompress every text-like file in the static folders
+def build_static_assets(folders=STATIC_FOLDERS):
+    written = []
+    for folder in folders:
+        for current, _, files in os.walk(folder):
+            for name in sorted(files):
+                if name.endswith(PRECOMPRESS_EXTENSIONS):
+                    written += precompress_file(os.path.join(current, name))
+    return written
+
+
+############################# RESPONSIVE IMAGES ##############################
+
+# Large images sent as responsive variants - {source path in static/: widths (px) to make}
+# Browsers pick the smallest variant that covers the space the image fills (srcset) instead of the full-size original
+RESPONSIVE_IMAGES = {
+    'images/pexels-fauxels-3182773.jpg': [480, 960, 1440, 1920, 2560],
+}
+
+# Variant formats - best compression first, the browser takes the first one it supports (JPEG works everywhere)
+IMAGE_FORMATS = [('avif', 'AVIF', {'quality': 50, 'speed': 6}), ('webp', 'WEBP', {'quality': 70, 'method': 6}), ('jpg', 'JPEG', {'quality': 75, 'optimize': True, 'progressive': True})]
+
+# Width of the blurred placeholder - small enough to inline in the page as a data URI
+PLACEHOLDER_WIDTH = 24
+
+# Generated variants go in static/build/ - the manifest maps each source image to its variants & placeholder
+BUILD_DIR = 'build'
+MANIFEST_PATH = os.path.join(STATIC_FOLDERS[0], BUILD_DIR, 'images.json')
+
+# Manifest loaded by the templates - {'mtime': ..., 'images': {...}}, re-read when the build step rewrites it
+IMAGE_MANIFEST = {'mtime': None, 'images': {}}
+
+
+# Formats this Pillow build can write
+def image_formats():
+    Image.init()
+    return [(ext, name, options) for ext, name, options in IMAGE_FORMATS if name in Image.SAVE]
+
+
+# Save an image under a content-hashed name (i.e. build/images/pexels-960.3f2a9c1b04de.webp) - returns the path relative to static/
+def save_hashed(image, stem, ext, pil_format, options):
+    buffer = io.BytesIO()
+    image.save(buffer, pil_format, **options)
+    data = buffer.getvalue()
+    relative = f'{BUILD_DIR}/images/{stem}.{hashlib.sha1(data).hexdigest()[:12]}.{ext}'
+    path = os.path.join(STATIC_FOLDERS[0], relative)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return relative
+
+
+# Tiny blurred copy of an image as a data URI - shown straight away while the real image loads
+def placeholder_uri(image):
+    small = image.resize((PLACEHOLDER_WIDTH, max(1, round(image.height * PLACEHOLDER_WIDTH / image.width))), Image.LANCZOS)
+    buffer = io.BytesIO()
+    small.filter(ImageFilter.GaussianBlur(1)).save(buffer, 'JPEG', quality=60)
+    return 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+# Make the variants of one image - every width (no larger than the original) in every format, plus the placeholder
+def build_responsive_image(source, widths):
+    with open(os.path.join(STATIC_FOLDERS[0], source), 'rb') as f:
+        data = f.read()
+    image = Image.open(io.BytesIO(data)).convert('RGB')
+    stem = os.path.splitext(os.path.basename(source))[0]
+
+    variants = {}
+    for width in sorted({min(width, image.width) for width in widths}):
+        resized = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+        for ext, pil_format, options in image_formats():
+            variants.setdefault(ext, []).append([width, save_hashed(resized, f'{stem}-{width}', ext, pil_format, options)])
+
+    return {
+        'source_hash': hashlib.sha1(data).hexdigest(),
+        'width': image.width,
+        'height': image.height,
+        'placeholder': placeholder_uri(image),
+        'variants': variants,
+    }
+
+
+# Build the variants of every responsive image - images whose source hasn't changed since the last build are skipped
+def build_responsive_images(images=RESPONSIVE_IMAGES):
+    manifest = read_manifest()
+    for source, widths in images.items():
+        with open(os.path.join(STATIC_FOLDERS[0], source), 'rb') as f:
+            source_hash = hashlib.sha1(f.read()).hexdigest()
+        entry = manifest.get(source)
+        if entry and entry['source_hash'] == source_hash and all(os.path.isfile(os.path.join(STATIC_FOLDERS[0], path)) for files in entry['variants'].values() for _, path in files):
+            continue
+        manifest[source] = build_responsive_image(source, widths)
+
+    # Remove variants left over from earlier builds - their content-hashed names are no longer referenced
+    current = {os.path.basename(path) for entry in manifest.values() for files in entry['variants'].values() for _, path in files}
+    images_dir = os.path.join(STATIC_FOLDERS[0], BUILD_DIR, 'images')
+    for name in os.listdir(images_dir):
+        if name not in current:
+            os.remove(os.path.join(images_dir, name))
+
+    os.makedirs(os.path.dirname(MANIFEST_PATH), exist_ok=True)
+    tmp_path = f'{MANIFEST_PATH}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, MANIFEST_PATH)
+    return manifest
+
+
+# Read the image manifest - empty if the build step hasn't been run
+def read_manifest():
+    try:
+        with open(MANIFEST_PATH, encoding='utf-8') as f:
+            return json.load(f)
+    except OSError:
+        return {}
+
+
+# Manifest entry for an image - None until the build step has made its variants
+def image_entry(source):
+    try:
+        mtime = os.path.getmtime(MANIFEST_PATH)
+    except OSError:
+        return None
+    if mtime != IMAGE_MANIFEST['mtime']:
+        IMAGE_MANIFEST['images'] = read_manifest()
+        IMAGE_MANIFEST['mtime'] = mtime
+    return IMAGE_MANIFEST['images'].get(source)
+
+
+# Template helper - a <picture> with a srcset per format & the blurred placeholder behind it
+# i.e. {{ responsive_image('images/pexels-fauxels-3182773.jpg', sizes='100vw', class_='hero-image-picture') }}
+# Falls back to a plain <img> of the original until the build step has been run
+def responsive_image(source, alt='', sizes='100vw', class_='', loading='eager'):
+    entry = image_entry(source)
+    if entry is None:
+        return Markup(f'<img src="{escape(url_for("static", filename=source))}" alt="{escape(alt)}" class="{escape(class_)}">')
+
+    def srcset(files):
+        return ', '.join(f'{url_for("static", filename=path)} {width}w' for width, path in files)
+
+    sources = [f'<source type="image/{"jpeg" if ext == "jpg" else ext}" srcset="{escape(srcset(files))}" sizes="{escape(sizes)}">'
+               for ext, files in entry['variants'].items() if ext != 'jpg']
+    fallback = entry['variants']['jpg']
+    img = (f'<img src="{escape(url_for("static", filename=fallback[len(fallback) // 2][1]))}" srcset="{escape(srcset(fallback))}" sizes="{escape(sizes)}" '
+           f'width="{entry["width"]}" height="{entry["height"]}" alt="{escape(alt)}" loading="{escape(loading)}" decoding="async" '
+           f'style="background-image: url({entry["placeholder"]}); background-size: cover;">')
+    return Markup(f'<picture class="{escape(class_)}">{"".join(sources)}{img}</picture>')
+
+
+# Make responsive_image available in the templates - called by create_app
+def init_static_assets(app):
+    app.server.add_template_global(responsive_image)
+
+
+# Build step - run after changing anything in static/ or assets/ (the Procfile runs it before starting the web server):
+#   python -m emp_attrition.static_assets [folder ...]
+if __name__ == '__main__':
+    for source, entry in build_responsive_images().items():
+        print(f'{source} -> {sum(len(files) for files in entry["variants"].values())} variants')
+    for path in build_static_assets(sys.argv[1:] or STATIC_FOLDERS):
+        print(path)
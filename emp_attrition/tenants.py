@@ -0,0 +1,135 @@
+############################# IMPORT DEPENDENCIES ############################
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlsplit
+
+import flask
+
+
+############################## TENANT REGISTRY ###############################
+
+# Optional mode (TENANTS_PATH) - one deployment serves many business units, each with its own dataset
+# The registry is a JSON file of {tenant: dataset path} (paths relative to the project root, like DATASET_PATH)
+# Each request picks its tenant by ?tenant=, an X-Tenant header or the tenant of the page it came from (see request_tenant)
+
+# Settings - filled in from the Flask config by init_tenants
+# REGISTRY_PATH - the registry file (None = single dataset, tenant selection is off)
+# CACHE_SIZE - tenants kept loaded per process, the least recently used is dropped first
+# FIGURE_CACHE_SIZE - callback figures cached per loaded tenant
+TENANT_CONFIG = {'REGISTRY_PATH': None, 'CACHE_SIZE': 32, 'FIGURE_CACHE_SIZE': 32}
+
+# Query parameter & header that select the tenant
+TENANT_PARAM = 'tenant'
+TENANT_HEADER = 'X-Tenant'
+
+# Page routes (routes.py) whose links carry the tenant on to the next page
+TENANT_ENDPOINTS = {'home', 'about', 'dashboard'}
+
+# Registry as last read - re-read when the file's modified time changes, so units can be added without a restart
+REGISTRY = {'mtime': None, 'tenants': {}}
+
+# Loaded tenants - {tenant: dashboard}, most recently used last
+TENANT_DASHBOARDS = OrderedDict()
+TENANT_LOCK = threading.Lock()
+
+# One lock per tenant - a tenant's first requests wait for one load instead of each loading it
+TENANT_LOAD_LOCKS = {}
+
+
+# True if the deployment serves several tenants
+def multi_tenant():
+    return bool(TENANT_CONFIG['REGISTRY_PATH'])
+
+
+# {tenant: dataset path} - the registry file is only read again once it changes
+def tenant_registry():
+    path = TENANT_CONFIG['REGISTRY_PATH']
+    mtime = os.stat(path).st_mtime_ns
+    if mtime != REGISTRY['mtime']:
+        with open(path, encoding='utf-8') as f:
+            tenants = json.load(f)
+        REGISTRY.update(tenants=tenants, mtime=mtime)
+    return REGISTRY['tenants']
+
+
+# Dataset of a tenant - unknown tenants get a 404 (only paths in the registry are ever read)
+def tenant_path(tenant):
+    path = tenant_registry().get(tenant)
+    if path is None:
+        flask.abort(404)
+    return path
+
+
+# Tenant the current request is for - None outside multi-tenant mode, outside a request or when none is given
+# Dash's layout & callback requests go to fixed URLs, so the tenant of the page they come from is read from the Referer
+def request_tenant():
+    if not multi_tenant() or not flask.has_request_context():
+        return None
+    request = flask.request
+    tenant = request.args.get(TENANT_PARAM) or request.headers.get(TENANT_HEADER)
+    if not tenant and request.referrer:
+        tenant = parse_qs(urlsplit(request.referrer).query).get(TENANT_PARAM, [None])[0]
+    return tenant or None
+
+
+# Tenant the request must be served for - None when tenants aren't configured (or outside a request)
+# Once they are, a request that names no tenant gets a 404 - the DATASET_PATH data is never shown in its place
+def required_tenant():
+    if not multi_tenant() or not flask.has_request_context():
+        return None
+    tenant = request_tenant()
+    if tenant is None:
+        flask.abort(404)
+    return tenant
+
+
+# 404 for a missing tenant or one that isn't in the registry - for the pages, which don't load the tenant's data themselves
+def check_tenant():
+    tenant = required_tenant()
+    if tenant is not None:
+        tenant_path(tenant)
+
+
+# Keep the tenant in links between the pages (url_for('home'), url_for('dashboard'), ...)
+def add_tenant(endpoint, values):
+    if endpoint in TENANT_ENDPOINTS and multi_tenant() and flask.has_request_context() and TENANT_PARAM not in values:
+        tenant = flask.request.args.get(TENANT_PARAM)
+        if tenant:
+            values[TENANT_PARAM] = tenant
+
+
+############################### LOADED TENANTS ###############################
+
+# A loaded tenant's dashboard, marked as just used - None if it isn't loaded
+def cached_tenant(tenant):
+    with TENANT_LOCK:
+        dashboard = TENANT_DASHBOARDS.get(tenant)
+        if dashboard is not None:
+            TENANT_DASHBOARDS.move_to_end(tenant)
+        return dashboard
+
+
+# Keep a tenant's dashboard - the coldest tenants are dropped once more than CACHE_SIZE are loaded (read again on their next request)
+def store_tenant(tenant, dashboard):
+    with TENANT_LOCK:
+        TENANT_DASHBOARDS[tenant] = dashboard
+        TENANT_DASHBOARDS.move_to_end(tenant)
+        while len(TENANT_DASHBOARDS) > TENANT_CONFIG['CACHE_SIZE']:
+            TENANT_DASHBOARDS.popitem(last=False)
+
+
+def tenant_lock(tenant):
+    with TENANT_LOCK:
+        return TENANT_LOAD_LOCKS.setdefault(tenant, threading.Lock())
+
+
+# Read the tenant settings & keep ?tenant= in page links - called by create_app
+def init_tenants(app):
+    config = app.server.config
+    TENANT_CONFIG['REGISTRY_PATH'] = config['TENANTS_PATH']
+    TENANT_CONFIG['CACHE_SIZE'] = config['TENANT_CACHE_SIZE']
+    TENANT_CONFIG['FIGURE_CACHE_SIZE'] = config['TENANT_FIGURE_CACHE_SIZE']
+    app.server.url_defaults(add_tenant)
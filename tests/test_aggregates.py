@@ -0,0 +1,49 @@
+import os
+
+import pandas as pd
+import pytest
+
+from emp_attrition import dashboard  # Registers the satisfaction pivot the charts read
+from emp_attrition.aggregates import build_aggregates, build_aggregates_from_chunks, update_aggregates
+from emp_attrition.correlation import pearson_matrix
+from emp_attrition.data import read_dataset_chunks
+from emp_attrition.ingest import read_dataset
+
+
+DATASET = os.path.join(os.path.dirname(__file__), '..', 'ibm_emp_att_dataset.csv')
+
+
+@pytest.fixture(scope='module')
+def emp_df():
+    return read_dataset(DATASET)
+
+
+# Table as plain columns - the chunks' text columns aren't always category dtype, which doesn't change what the charts draw
+def plain(table):
+    table = table.reset_index()
+    return table.astype({col: object for col in table.columns if table[col].dtype == 'category'})
+
+
+# Every table the charts read must be the same - cube tables, pivot slices & the heatmap's correlations
+def assert_same_aggregates(actual, expected):
+    assert actual['cube'].keys() == expected['cube'].keys()
+    for dim, table in expected['cube'].items():
+        pd.testing.assert_frame_equal(plain(actual['cube'][dim]), plain(table), check_dtype=False, obj=f'cube {dim}')
+    assert actual['pivots'].keys() == expected['pivots'].keys()
+    for name, slices in expected['pivots'].items():
+        for value, table in slices.items():
+            pd.testing.assert_frame_equal(plain(actual['pivots'][name][value]), plain(table), check_dtype=False, obj=f'pivot {name} {value}')
+    pd.testing.assert_frame_equal(pearson_matrix(actual['correlation']), pearson_matrix(expected['correlation']), atol=1e-9)
+
+
+# Streaming mode (DATASET_CHUNKSIZE) - counts added up chunk by chunk must equal counts of the whole frame
+@pytest.mark.parametrize('chunksize', [100, 1000, 100000])
+def test_streamed_aggregates_match_whole_dataset(emp_df, chunksize):
+    assert_same_aggregates(build_aggregates_from_chunks(read_dataset_chunks(DATASET, chunksize)), build_aggregates(emp_df))
+
+
+# Delta batches - rows added to, then taken back out of, a snapshot give back the snapshot's tables
+def test_delta_batch_round_trip(emp_df):
+    base, batch = emp_df.iloc[:1000], emp_df.iloc[1000:]
+    assert_same_aggregates(update_aggregates(build_aggregates(base), batch, batch.iloc[:0]), build_aggregates(emp_df))
+    assert_same_aggregates(update_aggregates(build_aggregates(emp_df), batch.iloc[:0], batch), build_aggregates(base))
@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+from emp_attrition import create_app, dashboard
+from emp_attrition.aggregates import attrition_totals, build_aggregates
+from emp_attrition.ingest import read_dataset
+
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+DATASET = os.path.join(ROOT, 'ibm_emp_att_dataset.csv')
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(dashboard, 'DASHBOARD', None)  # Each test starts from a fresh process' state - nothing loaded
+    app = create_app({'DATASET_PATH': DATASET, 'DEBUG': False, 'TESTING': True})
+    return app.server.test_client()
+
+
+# Props of a component in a layout, by id
+def find_props(node, component_id):
+    if isinstance(node, dict):
+        if node.get('props', {}).get('id') == component_id:
+            return node['props']
+        node = list(node.values())
+    if isinstance(node, list):
+        for child in node:
+            props = find_props(child, component_id)
+            if props is not None:
+                return props
+    return None
+
+
+# create_app reads nothing - the data is loaded by the first dashboard request
+def test_dashboard_loads_on_first_use(client):
+    assert dashboard.DASHBOARD is None
+    response = client.get('/')
+    assert response.status_code == 200
+    assert dashboard.DASHBOARD is None
+
+    response = client.get('/dashboard/_dash-layout')
+    assert response.status_code == 200
+    assert dashboard.DASHBOARD is not None
+
+
+# The lazily loaded layout shows the same numbers as aggregates counted straight from the dataset
+def test_layout_matches_dataset(client):
+    totals = attrition_totals(build_aggregates(read_dataset(DATASET)))
+    layout = client.get('/dashboard/_dash-layout').get_json()
+    assert find_props(layout, 'card_text_1')['children'] == [totals['employees']]
+
+
+# A request keeps the snapshot it first read - a version swapped in meanwhile is only seen by the next request
+def test_request_reads_one_snapshot(client):
+    client.get('/dashboard/_dash-layout')
+    with client.application.test_request_context():
+        first = dashboard.get_dashboard()
+        dashboard.swap_dashboard(dashboard.load_dashboard())
+        assert dashboard.get_dashboard() is first
+    with client.application.test_request_context():
+        assert dashboard.get_dashboard() is dashboard.DASHBOARD is not first
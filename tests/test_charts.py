@@ -0,0 +1,29 @@
+import os
+
+import pytest
+
+from emp_attrition import dashboard  # Registers the satisfaction pivot the charts read
+from emp_attrition.aggregates import build_aggregates
+from emp_attrition import charts
+from emp_attrition.charts import check_parity
+from emp_attrition.ingest import read_dataset
+
+
+DATASET = os.path.join(os.path.dirname(__file__), '..', 'ibm_emp_att_dataset.csv')
+
+
+@pytest.fixture(scope='module')
+def aggregates():
+    return build_aggregates(read_dataset(DATASET))
+
+
+# The fast builder must draw what Plotly Express draws for every fast chart & selection (same check as python -m emp_attrition.charts)
+def test_fast_figures_match_plotly_express(aggregates):
+    problems = check_parity(aggregates)
+    assert not problems, '\n'.join(f'{chart_id} {selection}: {differences[:3]}' for (chart_id, selection), differences in problems.items())
+
+
+# The check must catch a fast figure that drifts from px - here the fast builder gives out colors in another order
+def test_parity_check_finds_differences(aggregates, monkeypatch):
+    monkeypatch.setattr(charts, 'COLOR_SEQUENCE', charts.COLOR_SEQUENCE[::-1])
+    assert check_parity(aggregates)
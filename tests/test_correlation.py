@@ -0,0 +1,58 @@
+import os
+
+import numpy as np
+import pytest
+
+from emp_attrition.correlation import add_stats, correlation_frame, correlation_stats, pearson_matrix, spearman_matrix
+from emp_attrition.ingest import read_dataset
+
+
+DATASET = os.path.join(os.path.dirname(__file__), '..', 'ibm_emp_att_dataset.csv')
+
+SELECTIONS = [None, {'Department': ['Sales']}, {'Department': ['Sales', 'Human Resources']}]
+
+
+@pytest.fixture(scope='module')
+def emp_df():
+    return read_dataset(DATASET)
+
+
+# Rows a selection keeps, as a mask
+def selection_mask(emp_df, selections):
+    mask = np.ones(len(emp_df), dtype=bool)
+    for dim, values in (selections or {}).items():
+        mask &= emp_df[dim].isin(values).to_numpy()
+    return mask
+
+
+def assert_same_matrix(actual, expected):
+    assert list(actual.columns) == list(expected.columns)
+    np.testing.assert_allclose(actual.to_numpy(), expected.to_numpy(), atol=1e-9, equal_nan=True)
+
+
+# Pearson summed from the per-Department statistics must equal pandas' corr of the selected rows
+@pytest.mark.parametrize('selections', SELECTIONS)
+def test_pearson_matches_pandas(emp_df, selections):
+    expected = correlation_frame(emp_df)[selection_mask(emp_df, selections)].corr()
+    assert_same_matrix(pearson_matrix(correlation_stats(emp_df), selections), expected)
+
+
+# Spearman read off the cached sort orders must equal pandas' rank correlation of the selected rows
+@pytest.mark.parametrize('selections', SELECTIONS)
+def test_spearman_matches_pandas(emp_df, selections):
+    mask = selection_mask(emp_df, selections)
+    expected = correlation_frame(emp_df)[mask].corr(method='spearman')
+    assert_same_matrix(spearman_matrix(emp_df, 'test', mask), expected)
+
+
+# Statistics added a block at a time (streaming) or with a block taken back out (delta batches) match statistics of the rows counted at once
+def test_stats_add_up(emp_df):
+    first, second, third = emp_df.iloc[:500], emp_df.iloc[500:1000], emp_df.iloc[1000:]
+    stats = None
+    for part in (first, second, third):
+        stats = add_stats(stats, correlation_stats(part))
+    assert_same_matrix(pearson_matrix(stats), pearson_matrix(correlation_stats(emp_df)))
+
+    stats = add_stats(stats, correlation_stats(second), sign=-1)
+    expected = correlation_frame(emp_df).drop(index=second.index).corr()
+    assert_same_matrix(pearson_matrix(stats), expected)